@@ -2,6 +2,7 @@ import collections
 import io
 import logging
 import queue
+import sys
 import threading
 import typing
 import wave
@@ -10,70 +11,36 @@ from io import BytesIO
 import pyaudio
 import webrtcvad
 from faster_whisper import WhisperModel
-import jieba
 
 logging.basicConfig(level=logging.INFO,
                     format='%(name)s - %(levelname)s - %(message)s')
 
 
-# 動物與蔬菜關鍵詞表
-VEGETABLE_WORDS = set([
-   "高麗菜", "大白菜", "地瓜", "洋蔥", "玉米", "青花菜", "苦瓜", "南瓜", "馬鈴薯", "茄子", "番薯", "山藥",
-    "菠菜", "白蘿蔔", "胡蘿蔔", "大蒜", "青椒", "甜椒", "辣椒","魔鬼椒", "香菇", "芋頭", "杏鮑菇", "花椰菜","黑豆",
-    "空心菜", "地瓜葉", "絲瓜", "蓮藕", "金針菇", "洋菇", "黑木耳", "四季豆", "蔥","青蔥", "秋葵", "朝天椒",
-    "韭菜", "蘆筍", "茭白筍", "冬瓜", "毛豆", "竹筍", "芹菜", "紅蔥頭", "豆芽菜", "小白菜","胡瓜","海帶",
-    "青江菜", "萵苣", "美生菜", "蘿蔓萵苣", "大陸妹", "油菜", "韭黃", "芥菜", "芥藍", "莧菜","大黃瓜","紫菜",
-    "茼蒿", "西洋菜", "落葵", "川七", "山蘇", "龍鬚菜", "水蓮", "紅鳳菜", "綠豆", "牛蒡", "A菜","海藻","山葵",
-    "山藥", "玉米筍", "山苦瓜", "豇豆", "豌豆", "皇帝豆", "四角豆", "黃豆", "紫高麗菜", "羽衣甘藍","九層塔",
-    "甜菜根", "甜菜", "馬齒莧", "鴻喜菇", "秀珍菇", "草菇", "猴頭菇", "佛手瓜", "瓠瓜", "紅豆", "雪裡紅", "馬蘭頭",
-    "香椿", "慈菇", "荸薺", "球芽甘藍", "芝麻葉", "苜蓿芽", "大頭菜", "小黃瓜", "娃娃菜", "牛皮菜","迷迭香",
-    "金針花", "蠶豆", "蕨菜", "菊芋", "蒜苗", "麻竹筍", "綠竹筍", "孟宗竹筍", "桂竹筍", "箭竹筍", "松露",
-])
-ANIMAL_WORDS = set([
-    "貓", "鼠","老鼠", "大象", "獅子", "虎","老虎", "台灣獼猴","猴","猴子", "馬", "牛", "羊","犀牛","無尾熊","豹","獵豹","花豹","黑豹",
-    "豬", "兔子", "兔", "狐狸", "狼", "駱駝", "袋鼠", "熊", "熊貓", "松鼠", "鼴鼠", "天竺鼠", "荷蘭豬","鬥牛",
-    "浣熊", "豪豬", "刺蝟", "斑馬", "綿羊", "山羊", "羚羊", "山豬", "土撥鼠", "水牛", "蝙蝠", "白虎",
-    "馴鹿", "北極熊" , "台灣黑熊" , "棕熊", "黑猩猩", "狒狒","猩猩", "金絲猴", "金剛", "狸貓", "鼬", "水獺", "山貓",
+# 類別詞庫與後端共用 backend/lexicon/category_lexicon.json（同義詞歸到同一標準詞）
+# 與後端相同以模組名稱直接匯入，執行前把 backend 加入 PYTHONPATH（見 assets/Terminal_Commands.txt）
+try:
+    from category_lexicon import load_lexicon
+except ImportError:
+    sys.exit("找不到 backend 的 category_lexicon：請先設定 PYTHONPATH=backend 再執行")
 
-    "狗", "柴犬", "哈士奇", "黃金獵犬", "拉布拉多", "吉娃娃", "臘腸狗", "牧羊犬" , "邊牧", "鬥牛犬", "博美", "薩摩耶", "獒犬","藏獒",
-    "鬣狗","斑鬣狗",
-
-    "鳥", "雞", "鴨", "鵝", "貓頭鷹" , "老鷹" , "遊隼", "孔雀", "鸚鵡", "鴿子", "鴛鴦", "喜鵲", "夜鶯", "啄木鳥",
-    "燕子", "麻雀", "烏鴉", "企鵝", "皇帝企鵝", "國王企鵝", "駝鳥", "雉雞", "野雞", "白鷺鷥","海鷗",
-
-    "蛇", "雨傘節" , "百步蛇" , "龜殼花" , "眼鏡蛇" , "青竹絲" , "響尾蛇" , "鎖鏈蛇", "烏龜", "蜥蜴", "變色龍", "青蛙", "蟾蜍","壁虎",
-    "科莫多龍","科莫多巨蜥",
-    
-
-    "甲蟲", "獨角仙", "鍬形蟲", "大兜蟲", "蜜蜂", "虎頭蜂", "螞蟻", "紅火蟻", "白蟻" , "行軍蟻" , "軍蟻" , "子彈蟻" , "蜜蟻" , "切葉蟻", "白蟻", "蜻蜓", "水蠆", "蒼蠅", 
-    "孑孓","蚊子", "螢火蟲", "瓢蟲","蝗蟲", "蚱蜢", "螳螂","蜘蛛", "蟋蟀", "蚯蚓", "蠍子", "跳蛛", "幽靈蛛", "獵人蛛", "蝴蝶", 
-    "鳳蝶", "紋白蝶", "禪", "螽斯","蟈蟈","米蟲", "蜈蚣", "蟑螂","蟒蛇", "黃金蟒","蚰蜒",
-
-    "魚", "鯨魚", "鯊魚", "章魚", "海豚", "水母", "海馬", "河馬", "海星", "海豹", "海獅", "海龜", "海狗", "魟", "垃圾魚", "清道夫",
-    "鱷魚", "白鯨" , "藍鯨", "虎鯨", "殺人鯨", "沙丁魚", "比目魚", "鱔魚", "蝦子", "龍蝦", "熱帶魚",
-    "螃蟹" , "寄居蟹", "水蛭", "海兔",
-
-    "鸚鵡螺", "小熊貓", "蝸牛", "蛞蝓", "食蟻獸", "福壽螺",
-])
+LEXICON = load_lexicon()
 
 
 def choose_category():
+    categories = list(LEXICON.categories.values())
+    menu = " ".join(f"({number}){category.label}" for number, category in enumerate(categories, start=1))
     while True:
-        cat = input("請選擇測驗類別 (1)蔬菜 (2)動物：")
-        if cat == "1":
-            print("你選擇了蔬菜。")
-            return VEGETABLE_WORDS, "蔬菜"
-        elif cat == "2":
-            print("你選擇了動物。")
-            return ANIMAL_WORDS, "動物"
-        else:
-            print("請輸入1或2。")
-
-
-def count_unique_keywords(text, keyword_set, answered_set):
-    # jieba 分詞
-    words = set(jieba.cut(text))
-    found = {w for w in words if w in keyword_set and w not in answered_set}
+        choice = input(f"請選擇測驗類別 {menu}：")
+        if choice.isdigit() and 1 <= int(choice) <= len(categories):
+            category = categories[int(choice) - 1]
+            print(f"你選擇了{category.label}。")
+            return category, category.label
+        print(f"請輸入 1 到 {len(categories)}。")
+
+
+def count_unique_keywords(text, category, answered_set):
+    # 以詞庫比對（最左最長，同義詞算同一個答案）；與後端相同只計精確命中，近音命中不計分
+    found = set(category.concept_hits(text)) - answered_set
     answered_set.update(found)
     return len(answered_set), found
 
@@ -207,7 +174,7 @@ class AudioRecorder(threading.Thread):
 def main():
     try:
         # 1. 選擇測驗類別
-        KEYWORDS, cat_name = choose_category()
+        category, cat_name = choose_category()
         answered_set = set()
 
         # 2. 啟動錄音與語音辨識
@@ -220,7 +187,7 @@ def main():
                 while True:
                     text = Queues.text.get()
                     if text:
-                        total, found = count_unique_keywords(text, KEYWORDS, answered_set)
+                        total, found = count_unique_keywords(text, category, answered_set)
                         if found:
                             print(f"\n辨識到新{cat_name}名稱：{'、'.join(found)}")
                         print(f"目前累計唯一{cat_name}名稱數量：{total}\n")
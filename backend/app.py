@@ -1,11 +1,11 @@
 import os
+import hmac
 import json
 import datetime
 import threading
 import subprocess
-from io import BytesIO
-from collections import defaultdict
-from typing import Dict, List, Tuple, Any, Set, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+from typing import Dict, List, Tuple, Any, Optional
 
 import numpy as np
 from flask import Flask, request, jsonify, abort
@@ -17,12 +17,24 @@ from dotenv import load_dotenv
 from werkzeug.exceptions import HTTPException
 from urllib.parse import quote_plus
 
-from model import predict_with_probability, load_trained_model
+from model import (
+    PREDICTION_TABLE_ENABLED, predict_batch_with_probability, predict_with_probability, load_trained_model,
+    model_registry, prediction_cache,
+)
+from prediction_table import TABLE_FIELD_ORDER
+from ttl_cache import TTLCache
+from category_lexicon import ConceptScores, load_lexicon
+from running_score import RunningScoreRegistry
+from password_hashing import PasswordHashingBusy, PasswordHashingPool, load_hasher_from_env
 from guest_routes import guest_blueprint
 from jwt_helper import guest_or_user_required
-from faster_whisper import WhisperModel
-import torch
-import jieba
+from whisper_profile import create_whisper_model, load_profile_from_env
+from transcription_pool import DEFAULT_POOL_SIZE, TranscriptionPoolSaturated, TranscriptionWorkerPool
+from transcription_batcher import MicroBatchTranscriber
+from audio_decode import StageTimings, StreamDecodeError, StreamDecoderRegistry, decode_standalone
+from streaming_recognizer import StreamingSessionRegistry, TimedWord
+from session_store import RecordingTooLarge, create_session_store
+from speech_vad import SpeechActivityTrimmer, VadSavingsTracker
 import binascii
 import logging
 import traceback
@@ -74,6 +86,15 @@ else:
     )
 
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# 連線池：固定大小 + 尖峰溢出上限；pool_pre_ping 在借出前確認連線仍有效（資料庫重啟、閒置斷線），
+# pool_recycle 定期汰換長壽連線，避開 SQL Server / 防火牆的閒置逾時
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", "5")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+    "pool_pre_ping": True,
+}
 
 db = SQLAlchemy(app)
 jwt = JWTManager(app)
@@ -107,87 +128,38 @@ class ScoreView(db.Model):
 # =========================
 # Faster-Whisper 初始化 & 詞庫
 # =========================
+# 延遲載入：faster_whisper / 模型權重都在第一次使用（或 /speech_warmup）時才載入，
+# import app 與 /login、/predict 不再等待語音模型。
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"使用裝置：{'GPU ' + torch.cuda.get_device_name() if torch.cuda.is_available() else 'CPU'}")
-
-speech_model = WhisperModel(
-    model_size_or_path="medium",
-    device=device,
-    compute_type="float16",  # 在 4060 上用 FP16
-)
-
-vegetables: Set[str] = {
-    # 葉菜類
-    "高麗菜", "包心菜", "大白菜", "菠菜", "空心菜", "通菜", "地瓜葉", "青江菜", "萵苣", "美生菜", "蘿蔓萵苣", "大陸妹", "油菜", "韭黃",
-    "芥菜", "芥藍", "莧菜", "茼蒿", "西洋菜", "落葵", "川七", "山蘇", "龍鬚菜", "水蓮", "紅鳳菜", "A菜", "雪裡紅",
-    "馬蘭頭", "牛皮菜", "芝麻葉",
-
-    # 菇類
-    "香菇", "杏鮑菇", "金針菇", "洋菇", "黑木耳", "鴻喜菇", "秀珍菇", "草菇", "猴頭菇", "松露","白玉菇","蘑菇",
-
-    # 澱粉類 / 根莖類
-    "地瓜", "番薯", "馬鈴薯", "洋芋", "山藥", "玉米", "甜玉米", "南瓜", "胡蘿蔔", "紅蘿蔔", "白蘿蔔", "蓮藕", "芋頭", "牛蒡", "山苦瓜",
-    "甜菜根", "甜菜", "馬齒莧", "菊芋", "紅豆", "綠豆", "黃豆", "黑豆", "皇帝豆", "豌豆", "蠶豆", "豇豆", "四角豆",
-
-    # 瓜果類
-    "茄子", "矮瓜", "青花菜", "綠花椰菜", "白花椰菜", "花椰菜", "苦瓜", "胡瓜", "黃瓜", "大黃瓜", "小黃瓜", "冬瓜", "絲瓜", "佛手瓜", "瓠瓜",
+# 模型設定檔：WHISPER_PROFILE（auto / gpu-fp16 / gpu-int8 / cpu-int8 / cpu-fp32 …），
+# 個別欄位可用 WHISPER_MODEL_SIZE / WHISPER_DEVICE / WHISPER_COMPUTE_TYPE / WHISPER_CPU_THREADS / WHISPER_NUM_WORKERS 覆寫。
+# auto 時 GPU 用 float16、CPU 用 int8。
+whisper_profile = load_profile_from_env()
 
-    # 椒類
-    "青椒", "甜椒", "彩椒", "柿子椒", "辣椒", "朝天椒", "魔鬼椒",
 
-    # 蔥蒜類
-    "大蒜", "蒜頭", "蒜苗", "蔥", "青蔥", "大蔥", "紅蔥頭",
+def _create_whisper_model(num_workers: int) -> Any:
+    """建立一份模型 replica；num_workers 讓同一份權重可被多個 worker 同時呼叫。"""
+    resolved = whisper_profile.resolved()
+    app.logger.info(f"Loading Whisper model: {resolved!r}")
+    return create_whisper_model(resolved, num_workers)
 
-    # 芽菜類
-    "豆芽菜", "黃豆芽", "綠豆芽", "苜蓿芽",
 
-    # 筍類
-    "竹筍", "麻竹筍", "綠竹筍", "孟宗竹筍", "桂竹筍", "箭竹筍", "茭白筍", "筊白筍", "玉米筍",
-
-    # 海藻類
-    "海帶", "紫菜", "海苔", "海藻",
-
-    # 香草/香料
-    "九層塔", "羅勒", "迷迭香", "香椿", "金針花", "薄荷", "香菜", "芫荽", "莞荽",
-
-    # 其他
-    "四季豆", "菜豆", "秋葵", "羊角豆", "韭菜", "芹菜", "西洋芹", "球芽甘藍", "大頭菜", "娃娃菜", "慈菇", "荸薺", "馬蘭頭", "蕨菜",
-    "番茄", "小番茄", "蕃茄", "西紅柿",
-}
+# 取代單一 transcribe_lock：可設定大小的 worker pool + 有上限的佇列 + 依 recording 輪詢
+transcription_pool = TranscriptionWorkerPool(
+    model_factory=_create_whisper_model,
+    size=int(os.getenv("SPEECH_POOL_SIZE", str(DEFAULT_POOL_SIZE))),
+    replicas=int(os.getenv("SPEECH_POOL_REPLICAS", "1")),
+    max_pending=int(os.getenv("SPEECH_POOL_MAX_PENDING", "64")),
+)
 
-animals: Set[str] = {
-    # 常見哺乳類
-    "貓", "家貓", "鼠", "老鼠", "耗子", "大象", "象", "獅子", "獅", "虎", "老虎", "台灣獼猴", "獼猴", "猴", "猴子", "馬", "駿馬", "牛", "黃牛", "乳牛", "羊", "犀牛", "無尾熊", "考拉", "豹", "獵豹", "花豹", "黑豹",
-    "豬", "家豬", "山豬", "兔子", "兔", "家兔", "狐狸", "狼", "駱駝", "袋鼠", "熊", "熊貓", "松鼠", "鼴鼠", "天竺鼠", "荷蘭豬", "豚鼠", "鬥牛", '安哥拉兔',
-    "浣熊", "豪豬", "刺蝟", "斑馬", "綿羊", "山羊", "羚羊", "土撥鼠", "水牛", "蝙蝠", "白虎", '垂耳兔','侏儒兔',
-    "馴鹿", "北極熊", "台灣黑熊", "棕熊", "黑猩猩", "狒狒", "猩猩", "金絲猴", "大猩猩", "金剛", "狸貓", "鼬", "水獺", "山貓",
-
-    # 狗的品種
-    "狗", "犬", "柴犬", "哈士奇", "西伯利亞哈士奇", "黃金獵犬", "拉布拉多", "吉娃娃", "臘腸狗", "臘腸犬", "牧羊犬", "邊牧", "邊境牧羊犬", "鬥牛犬", "博美", "薩摩耶", "獒犬", "藏獒",
-    "鬣狗", "斑鬣狗",
-
-    # 鳥類
-    "鳥", "小鳥", "雞", "公雞", "母雞", "小雞", "鴨", "鵝", "貓頭鷹", "老鷹", "鷹", "遊隼", "孔雀", "鸚鵡", "鸚哥", "鴿子", "白鴿", "鴛鴦", "喜鵲", "夜鶯", "啄木鳥",
-    "燕子", "麻雀", "烏鴉", "企鵝", "皇帝企鵝", "國王企鵝", "鴕鳥", "雉雞", "野雞", "白鷺鷥", "白鷺", "海鷗", "白頭翁", "渡鴉", "綠繡眼",
-
-    # 爬蟲與兩棲
-    "蛇", "雨傘節", "百步蛇", "龜殼花", "眼鏡蛇", "青竹絲", "響尾蛇", "鎖鏈蛇", "烏龜", "甲魚", "王八", "鱷龜", "蜥蜴", "變色龍", "守宮", "青蛙", "蛙", "蟾蜍", "壁虎",
-    "科莫多龍", "科莫多巨蜥","陸龜","地圖龜","巴西龜",
-
-    # 昆蟲與無脊椎
-    "甲蟲", "獨角仙", "鍬形蟲", "大兜蟲", "蜜蜂", "蜂", "虎頭蜂", "螞蟻", "紅火蟻", "白蟻", "行軍蟻", "軍蟻", "子彈蟻", "蜜蟻", "切葉蟻", "蜻蜓", "水蠆", "蒼蠅", "家蠅",
-    "孑孓", "蚊子", "蚊", "螢火蟲", "瓢蟲", "七星瓢蟲", "蝗蟲", "蚱蜢", "螳螂", "刀螂", "蜘蛛", "蟋蟀", "蚯蚓", "蠍子", "跳蛛", "幽靈蛛", "獵人蛛", "蝴蝶",
-    "鳳蝶", "紋白蝶", "蟬", "知了", "螽斯", "蟈蟈", "米蟲", "蜈蚣", "百足", "蟑螂", "小強", "蟒蛇", "黃金蟒", "蚰蜒",
-
-    # 水生動物
-    "魚", "鮭魚", "鮪魚", "鯖魚", "鯛魚", "鱸魚", "鯰魚", "鰻魚", "鯉魚", "鯽魚", "羅非魚", "吳郭魚", "鯨魚", "鯊魚", "大白鯊", "格陵蘭鯊", "雙髻鯊", "虎鯨", "殺人鯨", "藍鯨", "白鯨",
-    "章魚", "八爪魚", "海豚", "水母", "海馬", "河馬", "海星", "海豹", "海獅", "海狗", "海龜", "玳瑁", "魟", "鬼蝠魟", "垃圾魚", "清道夫", "沙丁魚", "比目魚", "鱔魚", "蝦子", "蝦", "草蝦", "白蝦", "龍蝦", "熱帶魚",
-    "螃蟹", "大閘蟹", "寄居蟹", "水蛭", "海兔", "垂頭鯊",
-
-    # 其他
-    "鸚鵡螺", "小熊貓", "紅熊貓", "蝸牛", "田螺", "福壽螺", "螺", "蛞蝓", "食蟻獸", "渦蟲", "藤壺"
-}
+# 微批次：同時到達的 PCM chunk 合併為一次 batched inference。預設停用，SPEECH_BATCH_MAX_SIZE>1 才開啟；
+# 批次結果未通過 transcribe() 的品質門檻時，該 chunk 改走一般 transcribe（含溫度 fallback）
+speech_batcher = MicroBatchTranscriber(
+    transcription_pool,
+    max_batch_size=int(os.getenv("SPEECH_BATCH_MAX_SIZE", "1")),
+    max_wait_ms=float(os.getenv("SPEECH_BATCH_WAIT_MS", "10")),
+)
+speech_batcher.start()
 
 REQUIRED_FIELDS_IN_ORDER: list[str] = [
     "CDR_SUM",
@@ -200,22 +172,61 @@ REQUIRED_FIELDS_IN_ORDER: list[str] = [
     "CDR_GLOB",
     "CDR_MEMORY",
 ]
+if PREDICTION_TABLE_ENABLED and REQUIRED_FIELDS_IN_ORDER != TABLE_FIELD_ORDER:
+    # 查表以固定欄位順序建立；兩邊不一致時查到的會是錯的格子，寧可啟動失敗
+    raise RuntimeError("REQUIRED_FIELDS_IN_ORDER 與 prediction_table.TABLE_FIELD_ORDER 不一致")
 
-for vocab in vegetables | animals:
-    jieba.add_word(vocab)
+# 計分用的類別詞庫（lexicon/category_lexicon.json）：啟動時編譯一次，每個類別一個 Aho-Corasick 自動機。
+# 測驗類型即詞庫中的類別名稱（vegetables / animals …），新增類別不需改程式。
+lexicon = load_lexicon()
+
+# 即時計分：上傳時帶 type 的錄音，每個 chunk 轉錄完成就比對，finalize 只需讀結果（見 running_score.py）
+running_scores = RunningScoreRegistry()
 
 # =========================
 # 逐 chunk 推論：修正 InvalidDataError
 # =========================
 # 問題說明：MediaRecorder 產生的 webm/opus 分段，後續片段常缺乏容器頭，
-# PyAV(av.open) 會丟 InvalidDataError。解法：先用 FFmpeg 把分段「解碼成 PCM」再丟入模型。
-# （WhisperModel 支援 numpy float32 + sampling_rate）
+# PyAV(av.open) 會丟 InvalidDataError。解法：先把分段「解碼成 16 kHz PCM」再丟入模型。
+# 每個 chunk 只開一次容器：解碼 → 重取樣 → numpy float32 → WhisperModel，模型不再重複 demux。
 
 FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")  # 可用環境變數指定 ffmpeg 路徑（Windows 友善）
 
-audio_chunks: Dict[str, Dict[int, bytes]] = {}
-partial_text_store: Dict[str, Dict[int, str]] = defaultdict(dict)
-transcribe_lock = threading.Lock()
+# 每個 recording 一組常駐 PyAV 解碼器：header-less 分段在行程內接續解碼，ffmpeg 子行程僅作最後備援
+stream_decoders = StreamDecoderRegistry(target_hz=16000)
+speech_timings = StageTimings()  # decode / inference 分開計時
+
+# 推論前 VAD：靜音 chunk 不進模型、裁掉前後靜音；省下的音訊秒數逐錄音回報（SPEECH_SERVER_VAD=0 停用）
+SPEECH_SERVER_VAD = os.getenv("SPEECH_SERVER_VAD", "1") == "1"
+speech_trimmer = SpeechActivityTrimmer(aggressiveness=int(os.getenv("SPEECH_VAD_AGGRESSIVENESS", "2")))
+vad_savings = VadSavingsTracker()
+
+# 原始 chunk bytes 與已轉錄文字：單一錄音上限 + 閒置 TTL（背景 sweeper）
+# SPEECH_SESSION_BACKEND：memory（單一行程，含全域預算與磁碟搬移）/ sqlite（同機多 worker）/ redis（多台 replica）
+SPEECH_SESSION_BACKEND = os.getenv("SPEECH_SESSION_BACKEND", "memory")
+_session_store_options: Dict[str, Any] = {
+    "max_bytes_per_recording": int(float(os.getenv("SPEECH_STORE_MAX_RECORDING_MB", "50")) * 1024 * 1024),
+    "idle_ttl_seconds": float(os.getenv("SPEECH_STORE_IDLE_TTL_SECONDS", "1800")),
+    "sweep_interval_seconds": float(os.getenv("SPEECH_STORE_SWEEP_SECONDS", "60")),
+}
+if SPEECH_SESSION_BACKEND == "memory":
+    _session_store_options.update(
+        max_total_bytes=int(float(os.getenv("SPEECH_STORE_MAX_TOTAL_MB", "1024")) * 1024 * 1024),
+        spill_dir=os.getenv("SPEECH_STORE_SPILL_DIR") or None,
+        spill_after_seconds=float(os.getenv("SPEECH_STORE_SPILL_AFTER_SECONDS", "120")),
+    )
+elif SPEECH_SESSION_BACKEND == "sqlite":
+    _session_store_options["path"] = os.getenv("SPEECH_SESSION_SQLITE_PATH", os.path.join(current_dir, "speech_sessions.db"))
+elif SPEECH_SESSION_BACKEND == "redis":
+    _session_store_options["url"] = os.getenv("SPEECH_SESSION_REDIS_URL", "redis://localhost:6379/0")
+recording_store = create_session_store(SPEECH_SESSION_BACKEND, **_session_store_options)
+recording_store.start_sweeper()
+
+# 行程內狀態：常駐解碼器、串流 session、即時計分與背景轉錄的 Future / 狀態都是本行程的物件
+# （libav codec context、LocalAgreement 緩衝、concurrent.futures），無法放進 SQLite / Redis。
+# 共享後端代表同一錄音的請求會落在不同 worker，這些功能只在 memory 後端（單一行程）啟用；
+# 共享後端時每個 chunk 獨立解碼（前端每段都是自含容器），finalize 一律以 store 內的文字整段比對。
+SPEECH_SINGLE_WORKER = SPEECH_SESSION_BACKEND == "memory"
 
 
 class ChunkTranscribeOptions:
@@ -225,17 +236,6 @@ class ChunkTranscribeOptions:
         self.use_vad = use_vad
 
 
-def _decode_with_pyav_or_raise(audio_bytes: bytes) -> Optional[bytes]:
-    """若 bytes 可被 PyAV 直接打開，回傳原 bytes；否則回 None。單一職責，最小作用域。"""
-    try:
-        # 只測試能否被 av.open 解；若可解，就直接回傳 bytes 給 whisper 使用。
-        import av  # 延遲載入，避免環境沒有 PyAV 時影響啟動
-        with av.open(BytesIO(audio_bytes), mode="r", metadata_errors="ignore"):
-            return audio_bytes
-    except Exception:
-        return None
-
-
 def _decode_to_pcm_f32_bytes(audio_bytes: bytes, target_hz: int = 16000, channels: int = 1) -> bytes:
     """用 FFmpeg 將任意容器/編碼解成 float32 PCM，回傳裸資料（f32le）。
     - 優點：不依賴分段是否自含 header；FFmpeg 解析力較強。
@@ -270,40 +270,93 @@ def _pcm_bytes_to_float32_array(pcm_f32_bytes: bytes) -> np.ndarray:
     return arr  # 單聲道 f32le
 
 
-def transcribe_chunk_bytes(audio_bytes: bytes, options: ChunkTranscribeOptions) -> str:
-    # Early return：太短的 chunk 直接略過
-    if len(audio_bytes) < 1024:
-        return ""
+def _run_whisper(recording_id: str, audio: Any, options: ChunkTranscribeOptions, **extra: Any) -> str:
+    """把一次 transcribe 排入 worker pool 並等待文字結果；segments 為 generator，須在 worker 內取完。"""
+    def job(model: Any) -> str:
+        segments, _ = model.transcribe(
+            audio,
+            language=options.language,
+            beam_size=options.beam_size,
+            vad_filter=options.use_vad,
+            vad_parameters={"min_silence_duration_ms": 1000},
+            word_timestamps=False,
+            **extra,
+        )
+        return "".join(seg.text for seg in segments)
 
-    # 路徑 A：可被 PyAV 直接解的情況，維持原先走法（較快）
-    direct = _decode_with_pyav_or_raise(audio_bytes)
-    if direct is not None:
-        with transcribe_lock:
-            segments, _ = speech_model.transcribe(
-                BytesIO(direct),
+    return transcription_pool.run(recording_id, job)
+
+
+def _word_transcriber(recording_id: str, options: ChunkTranscribeOptions):
+    """串流 session 用：在 worker pool 內以 initial_prompt 解碼 buffer，回傳帶時間戳的詞。"""
+    def transcribe_words(audio: np.ndarray, prompt: str) -> List[TimedWord]:
+        def job(model: Any) -> List[TimedWord]:
+            segments, _ = model.transcribe(
+                audio,
                 language=options.language,
                 beam_size=options.beam_size,
                 vad_filter=options.use_vad,
                 vad_parameters={"min_silence_duration_ms": 1000},
-                word_timestamps=False,
+                word_timestamps=True,
+                initial_prompt=prompt or None,
             )
-        return "".join(seg.text for seg in segments)
+            return [TimedWord(w.start, w.end, w.word) for seg in segments for w in (seg.words or [])]
+
+        return transcription_pool.run(recording_id, job)
+
+    return transcribe_words
+
+
+def decode_chunk_samples(audio_bytes: bytes, recording_id: str = "", chunk_index: Optional[int] = None) -> np.ndarray:
+    """
+    統一解碼階段：每個 chunk 只開一次容器，直接得到 16 kHz mono float32 陣列。
+    - 有 recording_id 時走該錄音的常駐解碼器（可接續 header-less 分段）
+    - PyAV 解不出來才啟動 ffmpeg 子行程作最後備援
+    """
+    try:
+        if recording_id and SPEECH_SINGLE_WORKER:
+            return stream_decoders.get(recording_id).decode(audio_bytes, chunk_index)
+        return decode_standalone(audio_bytes, target_hz=16000)
+    except StreamDecodeError as ex:
+        app.logger.info(f"PyAV decode fallback to ffmpeg: recording_id={recording_id}, chunk_index={chunk_index}, reason={ex}")
 
-    # 路徑 B：PyAV 失敗 → FFmpeg 解碼為 PCM → numpy → 直接給 Whisper（最穩）
     pcm_bytes = _decode_to_pcm_f32_bytes(audio_bytes, target_hz=16000, channels=1)
-    samples = _pcm_bytes_to_float32_array(pcm_bytes)
+    return _pcm_bytes_to_float32_array(pcm_bytes)
 
-    with transcribe_lock:
-        segments, _ = speech_model.transcribe(
-            samples,
-            sampling_rate=16000,
-            language=options.language,
-            beam_size=options.beam_size,
-            vad_filter=options.use_vad,
-            vad_parameters={"min_silence_duration_ms": 1000},
-            word_timestamps=False,
-        )
-    return "".join(seg.text for seg in segments)
+
+def _apply_server_vad(samples: np.ndarray, recording_id: str, chunk_index: Optional[int] = None) -> np.ndarray:
+    """回傳裁切後的音訊；整段靜音時回傳空陣列。省下的秒數依 chunk 索引記錄，補轉錄不重複計算。"""
+    if not SPEECH_SERVER_VAD:
+        return samples
+    with speech_timings.measure("vad"):
+        result = speech_trimmer.trim(samples)
+    vad_savings.record(recording_id, result, chunk_index)
+    return result.samples
+
+
+def transcribe_chunk_bytes(
+    audio_bytes: bytes,
+    options: ChunkTranscribeOptions,
+    recording_id: str = "",
+    chunk_index: Optional[int] = None,
+) -> str:
+    # Early return：太短的 chunk 直接略過
+    if len(audio_bytes) < 1024:
+        return ""
+
+    with speech_timings.measure("decode"):
+        samples = decode_chunk_samples(audio_bytes, recording_id, chunk_index)
+
+    samples = _apply_server_vad(samples, recording_id, chunk_index)
+    if not len(samples):
+        return ""  # 整段靜音：不進模型
+
+    with speech_timings.measure("inference"):
+        if speech_batcher.is_batchable(samples, options):
+            text = speech_batcher.transcribe(recording_id, samples, options)
+            if text is not None:
+                return text
+        return _run_whisper(recording_id, samples, options)
 
 def parse_and_validate_features(request_json: dict) -> list[float]:
     """
@@ -330,14 +383,98 @@ def parse_and_validate_features(request_json: dict) -> list[float]:
     return feature_values
 
 
+PREDICT_BATCH_MAX_ROWS = int(os.getenv("PREDICT_BATCH_MAX_ROWS", "10000"))
+
+
+def _column_to_float(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    單欄轉 float，回傳 (數值陣列, 格式錯誤 mask)；None 視為格式錯誤（與單筆 /predict 一致）。
+    - 先整欄向量化轉型；只有整欄失敗時才逐筆找出壞值。
+    """
+    is_none = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    try:
+        return np.asarray(values, dtype=float), is_none
+    except (TypeError, ValueError):
+        pass
+
+    column = np.full(len(values), np.nan)
+    invalid = is_none.copy()
+    for row_index, value in enumerate(values):
+        if is_none[row_index]:
+            continue
+        try:
+            column[row_index] = float(value)
+        except (TypeError, ValueError):
+            invalid[row_index] = True
+    return column, invalid
+
+
+def parse_feature_batch(request_json: Any) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    解析批次輸入，回傳 (特徵矩陣, 每列錯誤訊息)。
+    - 支援 {"records": [{欄位: 值}, ...]}（或直接給 list）與 {"columns": {欄位: [值, ...]}} 兩種格式
+    - 驗證以整欄 NumPy 運算完成；錯誤逐列收集，不因單列錯誤拒絕整批
+    - 整體格式錯誤（非 list/dict、欄長不一、超過上限）直接 400
+    """
+    if isinstance(request_json, list):
+        request_json = {"records": request_json}
+    if not isinstance(request_json, dict) or ("records" in request_json) == ("columns" in request_json):
+        abort(400, description="請提供 records（列格式）或 columns（欄格式）其中之一")
+
+    if "records" in request_json:
+        records = request_json["records"]
+        if not isinstance(records, list):
+            abort(400, description="records 必須為陣列")
+        row_count = len(records)
+        is_object = np.fromiter((isinstance(record, dict) for record in records), dtype=bool, count=row_count)
+        safe_records = [record if isinstance(record, dict) else {} for record in records]
+        columns = {field: [record.get(field) for record in safe_records] for field in REQUIRED_FIELDS_IN_ORDER}
+        present = {
+            field: np.fromiter((field in record for record in safe_records), dtype=bool, count=row_count)
+            for field in REQUIRED_FIELDS_IN_ORDER
+        }
+    else:
+        raw_columns = request_json["columns"]
+        if not isinstance(raw_columns, dict):
+            abort(400, description="columns 必須為物件")
+        lengths = {len(values) for values in raw_columns.values() if isinstance(values, list)}
+        if len(lengths) > 1 or any(not isinstance(values, list) for values in raw_columns.values()):
+            abort(400, description="columns 內每個欄位都必須是等長陣列")
+        row_count = lengths.pop() if lengths else 0
+        is_object = np.ones(row_count, dtype=bool)
+        columns = {field: raw_columns.get(field, [None] * row_count) for field in REQUIRED_FIELDS_IN_ORDER}
+        present = {field: np.full(row_count, field in raw_columns) for field in REQUIRED_FIELDS_IN_ORDER}
+
+    if row_count == 0:
+        abort(400, description="批次內沒有任何資料列")
+    if row_count > PREDICT_BATCH_MAX_ROWS:
+        abort(400, description=f"單次最多 {PREDICT_BATCH_MAX_ROWS} 筆，收到 {row_count} 筆")
+
+    matrix = np.empty((row_count, len(REQUIRED_FIELDS_IN_ORDER)), dtype=float)
+    errors: List[List[str]] = [[] if is_object[row] else ["資料列必須為 JSON 物件"] for row in range(row_count)]
+    for column_index, field_name in enumerate(REQUIRED_FIELDS_IN_ORDER):
+        column, invalid = _column_to_float(columns[field_name])
+        matrix[:, column_index] = column
+        missing = ~present[field_name] & is_object
+        not_numeric = present[field_name] & invalid
+        is_nan = present[field_name] & ~invalid & np.isnan(column)
+        for row in np.flatnonzero(missing):
+            errors[row].append(f"缺少欄位: {field_name}")
+        for row in np.flatnonzero(not_numeric):
+            errors[row].append(f"欄位格式錯誤: {field_name} 必須為數值")
+        for row in np.flatnonzero(is_nan):
+            errors[row].append(f"欄位 {field_name} 為 NaN，請提供完整數值")
+
+    return matrix, errors
+
+
 def validate_feature_count_against_model(feature_values: list[float]) -> None:
     """
     檢查輸入特徵數是否符合模型訓練時設定。
     - 單一職責：只負責比對數量；若不合則拋 ValueError（由上層決定回應）。
     """
-    model = load_trained_model()
-    if hasattr(model, "n_features_in_"):
-        expected_feature_count = int(model.n_features_in_)
+    expected_feature_count = load_trained_model().n_features_in_
+    if expected_feature_count is not None:
         actual_feature_count = len(feature_values)
         if actual_feature_count != expected_feature_count:
             raise ValueError(
@@ -358,37 +495,117 @@ def make_prediction_response(predicted_label: int, positive_probability: float)
 # =========================
 # 認證：登入 API（保持原行為）
 # =========================
+# 病患基本資料與分數以一次 outer join、只取需要的欄位查回（原本兩次 ORM 查詢、各載入完整 entity）。
+# 門診開始時常有一波登入，查回的資料放進小型 TTL 快取；資料異動時以 invalidate_patient_profile 依病患 ID 清除。
+# 密碼欄位（雜湊或尚未改存的明文）不進快取：每次登入都以主鍵重新查詢，改密碼或改存雜湊立即生效。
+patient_profile_cache = TTLCache(
+    maxsize=int(os.getenv("PATIENT_PROFILE_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("PATIENT_PROFILE_CACHE_TTL_SECONDS", "300")),
+)
+
+
+def fetch_patient_profile(patient_id: str) -> Optional[dict]:
+    """
+    回傳 {"password": ..., "user": 登入回應的 user 物件}；查無此人回傳 None（不快取，避免新建帳號要等 TTL）。
+    - 單一職責：只負責查詢與組裝，不做密碼比對。
+    - 快取命中時只多查一次密碼欄位；快取內只有 user 物件。
+    """
+    cached = patient_profile_cache.get(patient_id)
+    if cached is not None:
+        row = db.session.query(Patient.password).filter(Patient.Patient_ID == patient_id).first()
+        if row is None:
+            invalidate_patient_profile(patient_id)
+            return None
+        return {"password": row.password, "user": cached}
+
+    row = (
+        db.session.query(
+            Patient.password,
+            Patient.Name,
+            Patient.Gender,
+            Patient.Birthyr,
+            ScoreView.CDR_SUM,
+            ScoreView.MMSE_Score,
+            ScoreView.MEMORY,
+            ScoreView.CDRGLOB,
+        )
+        .outerjoin(ScoreView, ScoreView.Patient_ID == Patient.Patient_ID)
+        .filter(Patient.Patient_ID == patient_id)
+        .first()
+    )
+    if row is None:
+        return None
+
+    # 沒有分數資料時 outer join 的分數欄位皆為 None，與原本「查無 ScoreView」的回應相同
+    user = {
+        "name": row.Name,
+        "gender": row.Gender,
+        "birth_year": row.Birthyr,
+        "CDR_SUM": row.CDR_SUM,
+        "MMSE_Score": row.MMSE_Score,
+        "MEMORY": row.MEMORY,
+        "CDRGLOB": row.CDRGLOB,
+    }
+    patient_profile_cache.set(patient_id, user)
+    return {"password": row.password, "user": user}
+
+
+def invalidate_patient_profile(patient_id: str) -> None:
+    patient_profile_cache.pop(patient_id)
+
+
+# 密碼雜湊：PASSWORD_HASH_SCHEME（auto / argon2 / bcrypt / scrypt）與成本參數見 password_hashing.py，
+# 數值用 bench_password_hashing.py 挑選。舊的明文密碼在該病患下次登入成功時改存為雜湊。
+password_pool = PasswordHashingPool(
+    load_hasher_from_env(),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")),
+)
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv("PASSWORD_HASH_TIMEOUT_SECONDS", "10"))
+
+
+def dummy_password_hash() -> str:
+    """
+    查無帳號時仍驗一次假雜湊，讓回應時間不洩漏帳號是否存在；第一次用到才計算（見 PasswordHashingPool.dummy_hash）。
+    計算同樣經過 password_pool（有上限、可逾時），忙碌時拋 PasswordHashingBusy。
+    """
+    return password_pool.dummy_hash(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+
+
+def rehash_patient_password(patient_id: str, password: str) -> None:
+    """把明文或舊參數的密碼改存為目前設定的雜湊；失敗只記錄，不影響本次登入。"""
+    try:
+        new_hash = password_pool.hash(password, timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+        Patient.query.filter_by(Patient_ID=patient_id).update({"password": new_hash})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception("Password rehash failed for a patient; will retry on next login")
+
+
 @api.route("/login")
 class Login(Resource):
     def post(self):
         data = request.get_json()
         username = data.get("username")
         password = data.get("password")
+        if not isinstance(password, str):
+            abort(401, description="帳號或密碼錯誤")
 
-        user = Patient.query.filter_by(Patient_ID=username).first()
-        if not user or user.password != password:
+        profile = fetch_patient_profile(username) if username else None
+        try:
+            stored_password = profile["password"] if profile else dummy_password_hash()
+            verified = password_pool.verify(stored_password, password, timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+        except PasswordHashingBusy:
+            abort(503, description="登入人數眾多，請稍後再試")
+        if not profile or not verified:
             abort(401, description="帳號或密碼錯誤")
 
-        score = ScoreView.query.filter_by(Patient_ID=username).first()
-        if not score:
-            scores = {"CDR_SUM": None, "MMSE_Score": None, "MEMORY": None, "CDRGLOB": None}
-        else:
-            scores = {
-                "CDR_SUM": score.CDR_SUM,
-                "MMSE_Score": score.MMSE_Score,
-                "MEMORY": score.MEMORY,
-                "CDRGLOB": score.CDRGLOB,
-            }
-
-        user_data = {
-            "name": user.Name,
-            "gender": user.Gender,
-            "birth_year": user.Birthyr,
-            **scores,
-        }
+        if password_pool.hasher.needs_rehash(stored_password):
+            rehash_patient_password(username, password)
 
         access_token = create_access_token(identity=username)
-        return {"token": access_token, "user": user_data}
+        return {"token": access_token, "user": dict(profile["user"])}
 
 # =========================
 # 上傳分段：立即嘗試轉錄並暫存文字（穩定版）
@@ -397,6 +614,145 @@ class Login(Resource):
 def hexdump_prefix(b: bytes, n: int = 8) -> str:
     return binascii.hexlify(b[:n]).decode('ascii')
 
+# =========================
+# 非同步收件：上傳只存 bytes 並排入背景工作，由背景 executor 回填 recording_store 的文字
+# =========================
+# SPEECH_ASYNC_INGEST=1 預設走非同步；單次請求可用表單欄位 async=1/0 覆寫。
+SPEECH_ASYNC_INGEST = os.getenv("SPEECH_ASYNC_INGEST", "0") == "1"
+SPEECH_FINALIZE_WAIT_SECONDS = float(os.getenv("SPEECH_FINALIZE_WAIT_SECONDS", "120"))
+
+# 串流辨識：SPEECH_STREAMING_MODE=1 時，同一錄音的 chunk 共用上下文，依 LocalAgreement 提交文字
+SPEECH_STREAMING_MODE = os.getenv("SPEECH_STREAMING_MODE", "0") == "1"
+streaming_sessions = StreamingSessionRegistry(
+    max_buffer_seconds=float(os.getenv("SPEECH_STREAMING_MAX_BUFFER_SECONDS", "28")),
+    prompt_chars=int(os.getenv("SPEECH_STREAMING_PROMPT_CHARS", "200")),
+)
+
+ingest_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SPEECH_INGEST_WORKERS", "4")),
+    thread_name_prefix="speech-ingest",
+)
+chunk_jobs: Dict[str, Dict[int, Future]] = {}      # {recording_id: {index: Future}}
+chunk_status: Dict[str, Dict[int, str]] = {}       # {recording_id: {index: queued/done/busy/decode_failed}}
+chunk_jobs_lock = threading.Lock()
+
+if not SPEECH_SINGLE_WORKER and (SPEECH_ASYNC_INGEST or SPEECH_STREAMING_MODE):
+    # 背景工作的狀態與串流 session 只存在收件的 worker，其他 worker 的 finalize 看不到，寧可啟動失敗
+    raise RuntimeError(
+        f"SPEECH_ASYNC_INGEST / SPEECH_STREAMING_MODE 只支援單一行程（SPEECH_SESSION_BACKEND=memory），"
+        f"目前為 {SPEECH_SESSION_BACKEND}"
+    )
+
+
+def _set_chunk_status(recording_id: str, chunk_index: int, status: str) -> None:
+    with chunk_jobs_lock:
+        chunk_status.setdefault(recording_id, {})[chunk_index] = status
+
+
+def _feed_streaming_session(recording_id: str, chunk_index: int, audio_bytes: bytes, options: ChunkTranscribeOptions) -> str:
+    """串流模式：解碼後送入該錄音的 session，回傳本次新提交的文字。"""
+    session = streaming_sessions.get(recording_id)
+    if len(audio_bytes) < 1024:
+        session.skip(chunk_index)
+        return ""
+    try:
+        with speech_timings.measure("decode"):
+            samples = decode_chunk_samples(audio_bytes, recording_id, chunk_index)
+    except Exception:
+        session.skip(chunk_index)  # 避免後續 chunk 等待這個缺號
+        raise
+
+    samples = _apply_server_vad(samples, recording_id, chunk_index)
+    if not len(samples):
+        session.skip(chunk_index)
+        return ""
+    with speech_timings.measure("inference"):
+        return session.feed(chunk_index, samples, _word_transcriber(recording_id, options))
+
+
+def _ingest_chunk(recording_id: str, chunk_index: int, audio_bytes: bytes) -> str:
+    """
+    轉錄單一 chunk 並寫入 recording_store，回傳狀態字串。
+    - 同步與非同步路徑共用；失敗不拋出，存空字串讓 finalize 補轉錄。
+    """
+    try:
+        options = ChunkTranscribeOptions(language='zh', beam_size=1, use_vad=False)
+        if SPEECH_STREAMING_MODE:
+            chunk_text = _feed_streaming_session(recording_id, chunk_index, audio_bytes, options)
+        else:
+            chunk_text = transcribe_chunk_bytes(audio_bytes, options, recording_id, chunk_index)  # 經 worker pool 排程，含常駐解碼器
+        recording_store.put_text(recording_id, chunk_index, chunk_text)
+        _score_chunk(recording_id, chunk_index, chunk_text)
+        status = 'done'
+    except TranscriptionPoolSaturated:
+        # 佇列已滿：不阻塞請求，保留 bytes 讓 finalize 補轉錄
+        app.logger.warning(f"Transcription pool saturated: recording_id={recording_id}, chunk_index={chunk_index}")
+        recording_store.put_text(recording_id, chunk_index, '')
+        status = 'busy'
+    except Exception:
+        app.logger.exception(
+            f"Chunk transcribe failed: recording_id={recording_id}, chunk_index={chunk_index}"
+        )
+        recording_store.put_text(recording_id, chunk_index, '')  # 降級：保留索引，避免 finalize KeyError
+        status = 'decode_failed'
+
+    _set_chunk_status(recording_id, chunk_index, status)
+    return status
+
+
+def _score_chunk(recording_id: str, chunk_index: int, chunk_text: str) -> None:
+    """把剛轉錄完成的文字送入即時計分；沒有帶 type 上傳的錄音不計分。"""
+    score = running_scores.find(recording_id)
+    if score is None:
+        return
+    if SPEECH_STREAMING_MODE:
+        session = streaming_sessions.find(recording_id)
+        if session is not None:
+            score.sync_text(session.committed_text)
+    else:
+        score.feed_chunk(chunk_index, chunk_text)
+
+
+def _start_running_score(recording_id: str) -> None:
+    if not SPEECH_SINGLE_WORKER:
+        return  # 其他 worker 收到的 chunk 不會送進本行程的計分，結果會缺詞
+    test_type = request.form.get('type')
+    if test_type in lexicon.categories:
+        running_scores.get(recording_id, lexicon.categories[test_type])
+
+
+def _enqueue_chunk(recording_id: str, chunk_index: int, audio_bytes: bytes) -> None:
+    _set_chunk_status(recording_id, chunk_index, 'queued')
+    future = ingest_executor.submit(_ingest_chunk, recording_id, chunk_index, audio_bytes)
+    with chunk_jobs_lock:
+        chunk_jobs.setdefault(recording_id, {})[chunk_index] = future
+
+
+def _chunk_state(recording_id: str, chunk_index: int) -> Optional[str]:
+    with chunk_jobs_lock:
+        return chunk_status.get(recording_id, {}).get(chunk_index)
+
+
+def _outstanding_jobs(recording_id: str) -> List[Future]:
+    with chunk_jobs_lock:
+        return [future for future in chunk_jobs.get(recording_id, {}).values() if not future.done()]
+
+
+def _pop_recording_jobs(recording_id: str) -> None:
+    with chunk_jobs_lock:
+        chunk_jobs.pop(recording_id, None)
+        chunk_status.pop(recording_id, None)
+
+
+def _wants_async_ingest() -> bool:
+    if not SPEECH_SINGLE_WORKER:
+        return False  # 單次請求也不可覆寫：多 worker 下 finalize 無法等待其他行程的背景工作
+    flag = request.form.get('async')
+    if flag is None:
+        return SPEECH_ASYNC_INGEST
+    return flag in ('1', 'true', 'yes')
+
+
 # ---- 在 /speech_upload_chunk 內部調整 ----
 @api.route('/speech_upload_chunk')
 class SpeechUploadChunk(Resource):
@@ -406,14 +762,19 @@ class SpeechUploadChunk(Resource):
         chunk_index = int(request.form['chunk_index'])
         audio_file = request.files['audio_chunk']
 
+        _start_running_score(recording_id)
         audio_bytes = audio_file.read()
         if not audio_bytes:
+            _score_chunk(recording_id, chunk_index, '')  # 不存的索引也要補上，即時計分才不會卡在缺號
             return {'ok': False, 'skipped': True, 'reason': 'empty_chunk'}, 200
 
-        # 緩存原始 bytes（finalize 可備援用）
-        if recording_id not in audio_chunks:
-            audio_chunks[recording_id] = {}
-        audio_chunks[recording_id][chunk_index] = audio_bytes
+        # 緩存原始 bytes（finalize 可備援用）；單一錄音超過上限即拒收
+        try:
+            recording_store.put_chunk(recording_id, chunk_index, audio_bytes)
+        except RecordingTooLarge:
+            app.logger.warning(f"Recording too large: recording_id={recording_id}, chunk_index={chunk_index}")
+            _score_chunk(recording_id, chunk_index, '')
+            return {'ok': False, 'skipped': True, 'reason': 'recording_too_large'}, 413
 
         # 診斷資訊
         app.logger.info(
@@ -421,22 +782,197 @@ class SpeechUploadChunk(Resource):
             f"mimetype={audio_file.mimetype} head={hexdump_prefix(audio_bytes)}"
         )
 
-        # 每個 chunk 都嘗試轉錄；失敗不炸 server，存空字串即可
+        # 非同步：只排入背景工作，立即回應
+        if _wants_async_ingest():
+            _enqueue_chunk(recording_id, chunk_index, audio_bytes)
+            return {'ok': True, 'queued': True}, 202
+
+        # 同步：每個 chunk 都嘗試轉錄；失敗不炸 server，存空字串即可
+        status = _ingest_chunk(recording_id, chunk_index, audio_bytes)
+        if status != 'done':
+            return {'ok': False, 'skipped': True, 'reason': status}, 200
+        return {'ok': True, 'text_len': len(recording_store.get_text(recording_id, chunk_index))}
+
+
+# =========================
+# 轉錄進度：回報每個 chunk 的狀態（支援 long-poll）
+# =========================
+@api.route('/speech_chunk_status')
+class SpeechChunkStatus(Resource):
+    @guest_or_user_required
+    def get(self):
+        recording_id = request.args.get('recording_id')
+        if not recording_id:
+            abort(400, description="缺少參數: recording_id")
+        if not SPEECH_SINGLE_WORKER:
+            abort(409, description="多 worker 模式（共享 session 後端）不提供逐 chunk 轉錄狀態")
+
+        # wait>0：long-poll，直到沒有未完成工作或逾時
         try:
-            options = ChunkTranscribeOptions(language='zh', beam_size=1, use_vad=False)
-            chunk_text = transcribe_chunk_bytes(audio_bytes, options)  # 內含 transcribe_lock 與 ffmpeg fallback
-            if recording_id not in partial_text_store:
-                partial_text_store[recording_id] = {}
-            partial_text_store[recording_id][chunk_index] = chunk_text
-            return {'ok': True, 'text_len': len(chunk_text)}
-        except Exception:
-            app.logger.exception(
-                f"Chunk transcribe failed: recording_id={recording_id}, chunk_index={chunk_index}"
-            )
-            if recording_id not in partial_text_store:
-                partial_text_store[recording_id] = {}
-            partial_text_store[recording_id][chunk_index] = ''  # 降級：保留索引，避免 finalize KeyError
-            return {'ok': False, 'skipped': True, 'reason': 'decode_failed'}, 200
+            wait_seconds = min(float(request.args.get('wait', 0)), 30.0)
+        except ValueError:
+            abort(400, description="參數錯誤: wait 必須為數值")
+        outstanding = _outstanding_jobs(recording_id)
+        if wait_seconds > 0 and outstanding:
+            futures_wait(outstanding, timeout=wait_seconds)
+
+        with chunk_jobs_lock:
+            statuses = dict(chunk_status.get(recording_id, {}))
+        pending = sum(1 for status in statuses.values() if status == 'queued')
+        return {
+            'recording_id': recording_id,
+            'chunks': {str(idx): status for idx, status in sorted(statuses.items())},
+            'pending': pending,
+            'completed': len(statuses) - pending,
+        }
+
+
+# =========================
+# 即時計分進度：上傳期間目前已答出的類別詞（前端可邊錄邊顯示）
+# =========================
+@api.route('/speech_progress')
+class SpeechProgress(Resource):
+    @guest_or_user_required
+    def get(self):
+        recording_id = request.args.get('recording_id')
+        if not recording_id:
+            abort(400, description="缺少參數: recording_id")
+        if not SPEECH_SINGLE_WORKER:
+            abort(409, description="多 worker 模式（共享 session 後端）不提供即時計分")
+
+        score = running_scores.find(recording_id)
+        if score is None:
+            abort(404, description="沒有這段錄音的即時計分（上傳時需帶 type）")
+        return {'recording_id': recording_id, **score.snapshot()}
+
+
+# =========================
+# 暖機 / 就緒檢查：POST 觸發背景載入，GET 回報載入狀態（供 load balancer readiness probe）
+# =========================
+# 載入模型很吃記憶體與 CPU：POST 需帶 X-Speech-Warmup-Token，與 SPEECH_WARMUP_TOKEN 相符；
+# 未設定 token 時停用，改用 SPEECH_EAGER_WARMUP=1 在啟動時暖機。GET 只讀狀態，不需授權。
+SPEECH_WARMUP_TOKEN = os.getenv("SPEECH_WARMUP_TOKEN", "")
+
+
+def _warm_up_speech() -> None:
+    try:
+        transcription_pool.start()
+    except Exception:
+        app.logger.exception("Speech warm-up failed")
+
+
+def speech_readiness() -> dict:
+    return {
+        'ready': transcription_pool.ready,
+        'speech_model': transcription_pool.load_status(),
+        'profile': whisper_profile.resolved().to_dict(),
+    }
+
+
+@api.route('/speech_warmup')
+class SpeechWarmup(Resource):
+    def get(self):
+        readiness = speech_readiness()
+        return readiness, (200 if readiness['ready'] else 503)
+
+    def post(self):
+        supplied_token = request.headers.get("X-Speech-Warmup-Token", "")
+        if not SPEECH_WARMUP_TOKEN or not hmac.compare_digest(supplied_token, SPEECH_WARMUP_TOKEN):
+            abort(403, description="未授權的暖機請求")
+        if not transcription_pool.ready:
+            threading.Thread(target=_warm_up_speech, name="speech-warmup", daemon=True).start()
+        return speech_readiness(), 202
+
+
+if os.getenv("SPEECH_EAGER_WARMUP", "0") == "1":
+    # 啟動時就在背景暖機，但不阻塞 import
+    threading.Thread(target=_warm_up_speech, name="speech-warmup", daemon=True).start()
+
+
+# =========================
+# 監控：轉錄管線的即時指標
+# =========================
+@api.route('/speech_metrics')
+class SpeechMetrics(Resource):
+    @guest_or_user_required
+    def get(self):
+        return {
+            'pool': transcription_pool.stats(),
+            'batcher': speech_batcher.stats(),
+            'timings': speech_timings.snapshot(),
+            'active_decoders': len(stream_decoders),
+            'streaming_sessions': len(streaming_sessions),
+            'running_scores': len(running_scores),
+            'single_worker': SPEECH_SINGLE_WORKER,
+            'fuzzy_match': all(category.phonetic is not None for category in lexicon.categories.values()),
+            'store': recording_store.stats(),
+            'vad': {'backend': speech_trimmer.backend, 'enabled': SPEECH_SERVER_VAD, **vad_savings.totals()},
+        }
+
+
+def _release_recording(recording_id: str) -> None:
+    """清除單一錄音在各處的暫存狀態。"""
+    recording_store.discard(recording_id)
+    _pop_recording_jobs(recording_id)
+    stream_decoders.discard(recording_id)
+    streaming_sessions.discard(recording_id)
+    running_scores.discard(recording_id)
+    vad_savings.pop(recording_id)
+
+
+def _on_recording_evicted(recording_id: str, reason: str) -> None:
+    """store 因 TTL / 預算淘汰錄音時，一併釋放解碼器與串流 session。"""
+    app.logger.info(f"Recording evicted: recording_id={recording_id}, reason={reason}")
+    _release_recording(recording_id)
+
+
+recording_store.add_eviction_listener(_on_recording_evicted)
+
+
+def _join_chunk_texts(recording_id: str, transcribe_options: ChunkTranscribeOptions) -> Tuple[str, int]:
+    """逐 chunk 模式：依索引串接已轉錄文字；空字串的 chunk 以原始 bytes 補轉錄一次。"""
+    # 既有的「已轉錄文字」與「原始 bytes 」
+    texts_map = recording_store.get_texts(recording_id)           # {index: text or ''}
+    chunks_map = recording_store.get_chunks(recording_id)         # {index: bytes}
+
+    # 以索引聯集為準，確保每個片段都被處理
+    ordered_indices = sorted(set(texts_map.keys()) | set(chunks_map.keys()))
+
+    full_text_parts = []
+    for idx in ordered_indices:
+        # 先用已存在的文字；若是空字串，再用 bytes 轉錄一次
+        chunk_text = texts_map.get(idx, "")
+        if not chunk_text and _chunk_state(recording_id, idx) != 'done':  # 已成功轉錄但無語音者不重做
+            audio_bytes = chunks_map.get(idx)
+            if audio_bytes:
+                try:
+                    chunk_text = transcribe_chunk_bytes(audio_bytes, transcribe_options, recording_id, idx)
+                except Exception:
+                    app.logger.exception(
+                        f"Finalize transcribe failed: recording_id={recording_id}, chunk_index={idx}"
+                    )
+                    chunk_text = ""  # 失敗就跳過該片段
+        full_text_parts.append(chunk_text)
+
+    return "".join(full_text_parts), len(ordered_indices)
+
+
+def _finish_running_score(recording_id: str, test_type: str) -> Optional[Tuple[ConceptScores, int]]:
+    """
+    逐 chunk 模式：所有 chunk 都已成功轉錄並送入即時計分時，直接取結果，回傳 (scores, chunk_count)。
+    - 有 chunk 失敗（finalize 要補轉錄）、缺號或類型不符時回傳 None，改走整段重新比對
+    """
+    score = running_scores.find(recording_id)
+    if score is None or score.category is not lexicon.categories[test_type]:
+        return None
+    with chunk_jobs_lock:
+        statuses = dict(chunk_status.get(recording_id, {}))
+    if not statuses or any(status != 'done' for status in statuses.values()):
+        return None
+    if not score.is_complete(max(statuses) + 1):
+        return None
+    result = score.finish()
+    return ConceptScores(result['detail'], result['fuzzy']), len(statuses)
 
 
 # =========================
@@ -449,50 +985,67 @@ class SpeechTestFinalize(Resource):
         recording_id = request.form["recording_id"]
         test_type = request.form.get("type")
 
-        if test_type not in ("vegetables", "animals"):
+        if test_type not in lexicon.categories:
             abort(400, description="參數錯誤：未知的測驗類型")
 
-        # 既有的「已轉錄文字」與「原始 bytes 」
-        texts_map = partial_text_store.get(recording_id, {})          # {index: text or ''}
-        chunks_map = audio_chunks.get(recording_id, {})               # {index: bytes}
+        transcribe_options = ChunkTranscribeOptions(language="zh", beam_size=1, use_vad=False)
 
-        # 兩者都沒有就早退
-        if not texts_map and not chunks_map:
+        # 非同步模式：只等待仍在執行的工作，已完成者直接使用
+        outstanding = _outstanding_jobs(recording_id)
+        if outstanding:
+            _, not_done = futures_wait(outstanding, timeout=SPEECH_FINALIZE_WAIT_SECONDS)
+            if not_done:
+                app.logger.warning(f"Finalize timed out waiting for {len(not_done)} chunk job(s): recording_id={recording_id}")
+
+        # 串流模式：文字已逐段提交，只需 flush 最後的假設
+        category = lexicon.categories[test_type]
+        score = running_scores.find(recording_id)
+        session = streaming_sessions.find(recording_id)
+        scores: Optional[ConceptScores] = None
+        if session is not None:
+            try:
+                full_text = session.flush(_word_transcriber(recording_id, transcribe_options))
+            except Exception:
+                app.logger.exception(f"Finalize streaming flush failed: recording_id={recording_id}")
+                full_text = session.committed_text
+            chunk_count = session.chunk_count
+            if score is not None and score.category is category:
+                # 已提交的文字只會往後接，即時計分補上 flush 出來的尾巴即可
+                score.sync_text(full_text)
+                result = score.finish()
+                scores = ConceptScores(result['detail'], result['fuzzy'])
+        else:
+            running = _finish_running_score(recording_id, test_type)
+            if running is not None:
+                scores, chunk_count = running
+            else:
+                full_text, chunk_count = _join_chunk_texts(recording_id, transcribe_options)
+
+        if chunk_count == 0:
+            _release_recording(recording_id)
             return {"total": 0, "detail": {}, "chunks": 0}
 
-        # 以索引聯集為準，確保每個片段都被處理
-        ordered_indices = sorted(set(texts_map.keys()) | set(chunks_map.keys()))
-
-        full_text_parts = []
-        transcribe_options = ChunkTranscribeOptions(language="zh", beam_size=1, use_vad=False)
-
-        for idx in ordered_indices:
-            # 先用已存在的文字；若是空字串，再用 bytes 轉錄一次
-            chunk_text = texts_map.get(idx, "")
-            if not chunk_text:
-                audio_bytes = chunks_map.get(idx)
-                if audio_bytes:
-                    try:
-                        chunk_text = transcribe_chunk_bytes(audio_bytes, transcribe_options)
-                    except Exception as ex:
-                        app.logger.exception(
-                            f"Finalize transcribe failed: recording_id={recording_id}, chunk_index={idx}"
-                        )
-                        chunk_text = ""  # 失敗就跳過該片段
-            full_text_parts.append(chunk_text)
-
-        full_text = "".join(full_text_parts)
-
-        keywords = vegetables if test_type == "vegetables" else animals
-        word_set = set(jieba.lcut(full_text))
-        detail = {w: 1 for w in word_set if w in keywords}
+        if scores is None:
+            # 沒有即時計分可用：一次線性掃描找出不重複的類別詞（最左最長），同義詞歸到標準詞後去重；
+            # 啟用拼音比對時，精確命中之間再做近音比對，結果只放在 fuzzy，不計入 total
+            scores = category.concept_scores(full_text)
+        detail = scores.detail
         total = len(detail)
 
+        # VAD 省下的推論量（逐錄音）
+        vad_report = vad_savings.pop(recording_id)
+        if vad_report:
+            app.logger.info(f"VAD savings: recording_id={recording_id}, {vad_report}")
+
         # 清理暫存
-        partial_text_store.pop(recording_id, None)
-        audio_chunks.pop(recording_id, None)
+        _release_recording(recording_id)
 
-        return {"total": total, "detail": detail, "chunks": len(ordered_indices)}
+        response = {"total": total, "detail": detail, "chunks": chunk_count}
+        if scores.fuzzy:
+            response["fuzzy"] = scores.fuzzy
+        if vad_report:
+            response["vad"] = vad_report
+        return response
 
 
 # =========================
@@ -532,6 +1085,83 @@ class Predict(Resource):
             abort(500, description="推論失敗：服務端錯誤，請聯繫系統管理員。")
 
 
+# =========================
+# 模型熱重載：GET 回報目前版本，POST 重新讀檔並原子替換（不需重啟 worker）
+# =========================
+# POST 需帶 X-Model-Reload-Token，與 MODEL_RELOAD_TOKEN 相符；未設定 token 時停用。
+# 多個 gunicorn worker 各自持有模型，POST 只影響接到請求的 worker；
+# 要全部更新請改用 MODEL_RELOAD_POLL_SECONDS 讓每個 worker 自行監看檔案。
+MODEL_RELOAD_TOKEN = os.getenv("MODEL_RELOAD_TOKEN", "")
+model_registry.start_watcher()
+
+
+def model_status() -> dict:
+    status = model_registry.status()
+    status['prediction_cache'] = prediction_cache.stats()
+    if status['loaded']:
+        predictor = load_trained_model()
+        status['engine'] = predictor.engine_name
+        status['prediction_table'] = predictor.table.status() if predictor.table is not None else None
+    return status
+
+
+@api.route('/model_reload')
+class ModelReload(Resource):
+    def get(self):
+        return model_status()
+
+    def post(self):
+        supplied_token = request.headers.get("X-Model-Reload-Token", "")
+        if not MODEL_RELOAD_TOKEN or not hmac.compare_digest(supplied_token, MODEL_RELOAD_TOKEN):
+            abort(403, description="未授權的模型重載請求")
+        try:
+            model_registry.reload(force=True)
+        except Exception as ex:
+            logging.error("Model reload failed, keeping version %s: %r", model_registry.version, ex)
+            abort(500, description="模型重載失敗，仍使用原本的模型版本")
+        return model_status()
+
+
+@api.route('/predict_batch')
+class PredictBatch(Resource):
+    @guest_or_user_required
+    def post(self):
+        if not request.is_json:
+            abort(400, description="Content-Type 必須是 application/json")
+
+        request_json = request.get_json(silent=True)
+        if request_json is None:
+            abort(400, description="缺少或無法解析 JSON 內容")
+
+        feature_matrix, row_errors = parse_feature_batch(request_json)
+        try:
+            validate_feature_count_against_model(list(feature_matrix[0]))
+        except ValueError as ve:
+            abort(400, description=str(ve))
+
+        valid_rows = np.flatnonzero(np.fromiter((not errors for errors in row_errors), dtype=bool, count=len(row_errors)))
+        results: List[dict] = [{"row": row, "errors": errors} for row, errors in enumerate(row_errors)]
+
+        # 合格的列一次推論
+        if len(valid_rows):
+            try:
+                predicted_labels, positive_probabilities = predict_batch_with_probability(feature_matrix[valid_rows])
+            except FileNotFoundError:
+                abort(500, description="模型檔案不存在，請聯繫系統管理員")
+            except Exception as ex:
+                logging.error("Batch inference failed with exception: %r", ex)
+                logging.error("Traceback:\n%s", traceback.format_exc())
+                abort(500, description="推論失敗：服務端錯誤，請聯繫系統管理員。")
+            for row, label, probability in zip(valid_rows, predicted_labels, positive_probabilities):
+                results[row] = {"row": int(row), **make_prediction_response(label, probability)}
+
+        return {
+            "count": len(row_errors),
+            "valid_count": int(len(valid_rows)),
+            "results": results,
+        }
+
+
 # =========================
 # 錯誤處理
 # =========================
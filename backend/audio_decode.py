@@ -0,0 +1,210 @@
+import threading
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+# =========================
+# 常駐解碼器：每個 recording_id 保留一組 libav 解碼狀態，不再為每個 chunk 啟動 ffmpeg
+# =========================
+# MediaRecorder 的 webm 分段：第一段帶 EBML header + Tracks（init segment），
+# 後續若以 timeslice 切段則只有 Cluster 資料、沒有容器頭，av.open 無法直接開啟。
+# 作法：
+#   1) 記住該錄音的 init segment（EBML 起點到第一個 Cluster 之前的 bytes）
+#   2) header-less 分段 = init segment + 上一段尚未結束的 Cluster 尾巴 + 本段 → 交給 PyAV demux
+#   3) 以同一個 codec context / resampler 解碼，輸出 16 kHz mono float32；已輸出過的 pts 略過
+#   4) 串流結束（close）時送 None 給 codec 與 resampler，取出仍緩衝在其中的最後一小段樣本
+# 全程在行程內完成，不產生子行程。
+# 自含容器的分段（webm 首段、ogg、mp4…）同樣只 av.open 一次，直接解成模型要的 16 kHz float32 陣列。
+
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+MATROSKA_CLUSTER_ID = b"\x1f\x43\xb6\x75"
+# 接續用的 Cluster 尾巴上限：分段裡沒有新的 Cluster 時尾巴會一段段累積，每段都得重新 demux 整條尾巴
+MAX_CLUSTER_TAIL_BYTES = 1024 * 1024
+
+
+class StreamDecodeError(RuntimeError):
+    """分段無法以常駐解碼器解出（例如沒有可用的 init segment）。呼叫端可改走 ffmpeg 備援。"""
+
+
+class RecordingStreamDecoder:
+    """單一錄音的解碼狀態；所有方法以 lock 保護，同一錄音的分段依序處理。"""
+
+    def __init__(self, target_hz: int = 16000) -> None:
+        self.target_hz = target_hz
+        self._lock = threading.Lock()
+        self._init_segment: Optional[bytes] = None
+        self._cluster_tail = b""          # 上一段最後一個（可能未完整的）Cluster
+        self._last_chunk_index: Optional[int] = None
+        self._last_pts: Optional[int] = None
+        self._codec = None
+        self._resampler = None
+
+    # ---------- 狀態維護 ----------
+    def _start_new_stream(self, audio_bytes: bytes) -> None:
+        """遇到自含 header 的分段：視為新的串流，重設 codec 與拼接狀態。"""
+        cluster_pos = audio_bytes.find(MATROSKA_CLUSTER_ID)
+        self._init_segment = audio_bytes[:cluster_pos] if cluster_pos > 0 else None
+        self._cluster_tail = b""
+        self._last_pts = None
+        self._codec = None
+        self._resampler = None
+
+    # ---------- 解碼 ----------
+    def decode(self, audio_bytes: bytes, chunk_index: Optional[int] = None) -> np.ndarray:
+        with self._lock:
+            if audio_bytes.startswith(EBML_MAGIC) or self._init_segment is None:
+                # 自含 header（或非 webm 容器）：當作新串流一次解完
+                self._start_new_stream(audio_bytes)
+                payload = audio_bytes
+                spliced = b""
+            else:
+                # 分段不連續（亂序或遺失）時，上一段尾巴無法接續，只拼 init segment
+                is_continuation = (
+                    chunk_index is not None
+                    and self._last_chunk_index is not None
+                    and chunk_index == self._last_chunk_index + 1
+                )
+                if not is_continuation:
+                    self._cluster_tail = b""
+                    self._last_pts = None
+                spliced = self._cluster_tail + audio_bytes
+                payload = self._init_segment + spliced
+
+            samples = self._demux_and_decode(payload)
+
+            # 記住最後一個 Cluster 起點之後的 bytes，供下一段接續；超過上限就放棄接續（下一段改走 ffmpeg 備援）
+            tail_source = spliced if spliced else audio_bytes
+            last_cluster = tail_source.rfind(MATROSKA_CLUSTER_ID)
+            tail = tail_source[last_cluster:] if last_cluster >= 0 else b""
+            self._cluster_tail = tail if len(tail) <= MAX_CLUSTER_TAIL_BYTES else b""
+            self._last_chunk_index = chunk_index
+            return samples
+
+    def close(self) -> np.ndarray:
+        """串流結束：flush codec 與 resampler（resample(None)），回傳其中剩下的樣本並釋放解碼狀態。"""
+        with self._lock:
+            pieces: List[np.ndarray] = []
+            if self._codec is not None:
+                try:
+                    for frame in self._codec.decode(None):
+                        pieces.extend(self._resample(frame))
+                    pieces.extend(self._resample(None))
+                except Exception:
+                    pass  # 尾端緩衝解不出來不影響已輸出的樣本
+            self._start_new_stream(b"")
+            if not pieces:
+                return np.zeros(0, dtype=np.float32)
+            return np.concatenate(pieces).astype(np.float32, copy=False)
+
+    def _resample(self, frame) -> List[np.ndarray]:
+        """frame 為 None 時 flush resampler。"""
+        return [resampled.to_ndarray().reshape(-1) for resampled in self._resampler.resample(frame)]
+
+    def _demux_and_decode(self, payload: bytes) -> np.ndarray:
+        import av  # 延遲載入，避免環境沒有 PyAV 時影響啟動
+
+        pieces: List[np.ndarray] = []
+        try:
+            with av.open(BytesIO(payload), mode="r", metadata_errors="ignore") as container:
+                stream = next((s for s in container.streams if s.type == "audio"), None)
+                if stream is None:
+                    raise StreamDecodeError("容器內沒有音訊串流")
+
+                if self._codec is None:
+                    self._codec = av.CodecContext.create(stream.codec_context.name, "r")
+                    if stream.codec_context.extradata:
+                        self._codec.extradata = stream.codec_context.extradata
+                    self._resampler = av.AudioResampler(format="flt", layout="mono", rate=self.target_hz)
+
+                for packet in container.demux(stream):
+                    if packet.size == 0:
+                        continue
+                    # 拼接時上一段尾巴會被重新 demux：已輸出過的封包跳過
+                    if packet.pts is not None and self._last_pts is not None and packet.pts <= self._last_pts:
+                        continue
+                    for frame in self._codec.decode(packet):
+                        pieces.extend(self._resample(frame))
+                    if packet.pts is not None:
+                        self._last_pts = packet.pts
+        except StreamDecodeError:
+            raise
+        except Exception as ex:
+            raise StreamDecodeError(f"PyAV 串流解碼失敗: {ex!r}") from ex
+
+        if not pieces:
+            raise StreamDecodeError("分段內沒有可解碼的音訊")
+        return np.concatenate(pieces).astype(np.float32, copy=False)
+
+
+def decode_standalone(audio_bytes: bytes, target_hz: int = 16000) -> np.ndarray:
+    """沒有 recording 脈絡時：以一次性的解碼器把自含容器解成 float32 PCM（含 flush 出的尾端樣本）。"""
+    decoder = RecordingStreamDecoder(target_hz)
+    samples = decoder.decode(audio_bytes)
+    tail = decoder.close()
+    return np.concatenate([samples, tail]) if len(tail) else samples
+
+
+class StageTimings:
+    """
+    累計各階段耗時（例如 decode 與 inference 分開計），供監控端點讀取。
+    - 單一職責：只負責計時與彙總，不做任何判斷。
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+            self._counts[stage] = self._counts.get(stage, 0) + 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                stage: {
+                    "count": self._counts[stage],
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total * 1000 / self._counts[stage], 3),
+                }
+                for stage, total in self._totals.items()
+            }
+
+
+class StreamDecoderRegistry:
+    """recording_id → RecordingStreamDecoder；finalize / 淘汰時 discard 會 close 解碼器，釋放 libav 狀態。"""
+
+    def __init__(self, target_hz: int = 16000) -> None:
+        self.target_hz = target_hz
+        self._decoders: Dict[str, RecordingStreamDecoder] = {}
+        self._lock = threading.Lock()
+
+    def get(self, recording_id: str) -> RecordingStreamDecoder:
+        with self._lock:
+            decoder = self._decoders.get(recording_id)
+            if decoder is None:
+                decoder = RecordingStreamDecoder(self.target_hz)
+                self._decoders[recording_id] = decoder
+            return decoder
+
+    def discard(self, recording_id: str) -> None:
+        with self._lock:
+            decoder = self._decoders.pop(recording_id, None)
+        if decoder is not None:
+            decoder.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._decoders)
@@ -0,0 +1,57 @@
+"""
+隨機森林推論基準測試：比較 sklearn predict_proba 與 forest_compiler 攤平陣列推論的延遲與數值一致性。
+
+用法：
+    python backend/bench_forest_inference.py
+    python backend/bench_forest_inference.py --batch-sizes 1 100 10000 --runs 50
+
+預設載入 model/random_forest_model.pgz；輸入列以固定種子產生（與一致性檢查相同的分佈）。
+"""
+import argparse
+import statistics
+import time
+
+from forest_compiler import CompiledForest, max_parity_error, parity_sample
+from model import load_estimator_from_pickle
+
+
+def time_call(fn, X, runs: int) -> float:
+    fn(X)  # 暖機
+    elapsed = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn(X)
+        elapsed.append(time.perf_counter() - started)
+    return statistics.median(elapsed)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 100, 10000])
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    estimator = load_estimator_from_pickle()
+    compile_started = time.perf_counter()
+    compiled = CompiledForest.from_estimator(estimator)
+    compile_seconds = time.perf_counter() - compile_started
+    n_features = compiled.n_features_in_ or int(compiled.feature.max()) + 1
+
+    print(
+        f"樹數 {compiled.n_trees}，節點 {len(compiled.feature)}，最大深度 {compiled.max_depth}，"
+        f"編譯 {compile_seconds * 1000:.1f} ms"
+    )
+    print(f"{'batch':>8}{'sklearn(ms)':>14}{'compiled(ms)':>14}{'speedup':>10}{'max|Δp|':>12}")
+    for batch_size in args.batch_sizes:
+        X = parity_sample(n_features, rows=batch_size, seed=batch_size)
+        sklearn_seconds = time_call(estimator.predict_proba, X, args.runs)
+        compiled_seconds = time_call(compiled.predict_proba, X, args.runs)
+        error = max_parity_error(compiled, estimator, X)
+        print(
+            f"{batch_size:>8}{sklearn_seconds * 1000:>14.3f}{compiled_seconds * 1000:>14.3f}"
+            f"{sklearn_seconds / compiled_seconds:>9.1f}x{error:>12.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
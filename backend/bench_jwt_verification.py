@@ -0,0 +1,82 @@
+"""
+Token 驗證微基準：比較舊版 guest_or_user_required（PyJWT decode 失敗再交給 flask_jwt_extended 重新 decode）
+與目前的單次 decode + claims 快取，量測每個請求的驗證開銷。
+
+用法：
+    python backend/bench_jwt_verification.py
+    python backend/bench_jwt_verification.py --requests 20000
+
+只建立最小的 Flask app，不需要資料庫或模型檔。
+"""
+import argparse
+import time
+
+import jwt
+from flask import Flask, abort, g, request
+from flask_jwt_extended import JWTManager, create_access_token, get_jwt_identity, verify_jwt_in_request
+
+from jwt_helper import claims_cache, create_jwt, decode_jwt, guest_or_user_required
+
+
+def legacy_guest_or_user_check() -> None:
+    """改版前 guest_or_user_required 的驗證邏輯（不含呼叫 view）。"""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        abort(401)
+    token = auth_header.split(" ", 1)[1]
+    try:
+        payload = decode_jwt(token)
+        if payload.get("role") in ("guest", "user"):
+            g.current_role, g.current_identity = payload["role"], payload.get("sub")
+            return
+    except jwt.ExpiredSignatureError:
+        abort(401)
+    except jwt.InvalidTokenError:
+        pass
+    verify_jwt_in_request()
+    g.current_role, g.current_identity = "user", get_jwt_identity()
+
+
+@guest_or_user_required
+def current_check() -> None:
+    return None
+
+
+def time_per_request(app: Flask, token: str, check, requests: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    with app.test_request_context(headers=headers):
+        check()  # 暖機（也讓快取版填入快取）
+    started = time.perf_counter()
+    for _ in range(requests):
+        with app.test_request_context(headers=headers):
+            check()
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "benchmark-secret-key-with-enough-length"
+    JWTManager(app)
+    with app.app_context():
+        guest_token, _ = create_jwt("guest-session", "guest", 30)
+        user_token = create_access_token(identity="patient-001")
+
+    baseline = time_per_request(app, guest_token, lambda: None, args.requests)
+    print(f"空請求（只建立 request context）：{baseline:7.1f} µs")
+    print(f"{'token':<8}{'舊版(µs)':>10}{'新版(µs)':>10}{'快取停用(µs)':>14}")
+    for name, token in (("guest", guest_token), ("user", user_token)):
+        legacy = time_per_request(app, token, legacy_guest_or_user_check, args.requests) - baseline
+        cached = time_per_request(app, token, current_check, args.requests) - baseline
+        claims_cache.clear()
+        maxsize, claims_cache.maxsize = claims_cache.maxsize, 0
+        uncached = time_per_request(app, token, current_check, args.requests) - baseline
+        claims_cache.maxsize = maxsize
+        print(f"{name:<8}{legacy:>10.1f}{cached:>10.1f}{uncached:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+類別詞計分基準：比較 Aho-Corasick 比對器（KeywordMatcher）與舊的 jieba 分詞路徑的速度與結果一致性。
+
+用法：
+    python backend/bench_keyword_matching.py
+    python backend/bench_keyword_matching.py --transcripts transcripts.txt --category animals
+
+--transcripts 為每行一份逐字稿的文字檔；省略時以固定種子由詞庫與口語填充詞合成。
+jieba 路徑含詞典載入與 add_word 的一次性成本，分開列出。
+兩邊都以標準詞比較（同義詞歸併）；matcher 路徑含詞庫的擋字詞。
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from category_lexicon import load_lexicon
+from keyword_matcher import KeywordMatcher
+
+CATEGORIES = load_lexicon().categories
+FILLERS = ["嗯", "然後", "還有", "那個", "我想想", "對", "啊", "就是", "還有什麼", "好像", "吃", "看過", "家裡有"]
+
+
+def synthesize_transcripts(terms: set, count: int, seed: int = 20240601) -> list:
+    rng = random.Random(seed)
+    term_list = sorted(terms)
+    transcripts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(15, 60)):
+            parts.append(rng.choice(term_list) if rng.random() < 0.4 else rng.choice(FILLERS))
+        transcripts.append("".join(parts))
+    return transcripts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--category", default="vegetables", choices=sorted(CATEGORIES))
+    parser.add_argument("--transcripts", help="每行一份逐字稿；省略則使用合成資料")
+    parser.add_argument("--count", type=int, default=500, help="合成逐字稿份數")
+    args = parser.parse_args()
+
+    category = CATEGORIES[args.category]
+    terms = category.surfaces
+    if args.transcripts:
+        with open(args.transcripts, "r", encoding="utf-8") as file:
+            transcripts = [line.strip() for line in file if line.strip()]
+    else:
+        transcripts = synthesize_transcripts(terms, args.count)
+
+    started = time.perf_counter()
+    import jieba
+    jieba.initialize()
+    for category_terms in CATEGORIES.values():
+        for term in category_terms.surfaces:
+            jieba.add_word(term)
+    jieba_setup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    KeywordMatcher(category.matcher.terms)
+    matcher_setup = time.perf_counter() - started
+
+    started = time.perf_counter()
+    jieba_hits = [{category.surface_to_concept[word] for word in jieba.lcut(text) if word in terms} for text in transcripts]
+    jieba_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matcher_hits = [category.concept_hits(text) for text in transcripts]
+    matcher_seconds = time.perf_counter() - started
+
+    per_text = 1e3 / len(transcripts)
+    print(f"{len(transcripts)} 份逐字稿，平均 {sum(map(len, transcripts)) / len(transcripts):.0f} 字，類別 {args.category}")
+    print(f"{'':<12}{'初始化(ms)':>12}{'每份(ms)':>12}")
+    print(f"{'jieba':<12}{jieba_setup * 1e3:>12.1f}{jieba_seconds * per_text:>12.3f}")
+    print(f"{'matcher':<12}{matcher_setup * 1e3:>12.1f}{matcher_seconds * per_text:>12.3f}")
+
+    identical = sum(a == b for a, b in zip(jieba_hits, matcher_hits))
+    only_jieba = Counter(term for a, b in zip(jieba_hits, matcher_hits) for term in a - b)
+    only_matcher = Counter(term for a, b in zip(jieba_hits, matcher_hits) for term in b - a)
+    print(f"結果完全相同：{identical}/{len(transcripts)}（{identical / len(transcripts):.1%}）")
+    print(f"僅 jieba 命中（前 10）：{only_jieba.most_common(10)}")
+    print(f"僅 matcher 命中（前 10）：{only_matcher.most_common(10)}")
+
+
+if __name__ == "__main__":
+    main()
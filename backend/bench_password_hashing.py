@@ -0,0 +1,67 @@
+"""
+密碼雜湊成本基準測試：在部署機器上量測各組成本參數的單次雜湊時間，挑出不超過登入延遲預算的最強設定。
+
+用法：
+    python backend/bench_password_hashing.py
+    python backend/bench_password_hashing.py --scheme argon2 --target-ms 250 --runs 5
+
+輸出最後一行是建議的環境變數，直接貼進 .env 即可。雜湊在 PASSWORD_HASH_WORKERS 個 worker 中執行，
+尖峰時的登入延遲約為 單次時間 ×（同時登入數 / worker 數），預算請預留餘裕。
+"""
+import argparse
+import statistics
+import time
+
+from password_hashing import PasswordHasher, available_schemes
+
+# 由弱到強排列；每組為 (成本參數, 對應環境變數)
+CANDIDATES = {
+    "argon2": [
+        ({"time_cost": time_cost, "memory_cost": memory_kib, "parallelism": 1}, {
+            "PASSWORD_ARGON2_TIME_COST": time_cost,
+            "PASSWORD_ARGON2_MEMORY_KIB": memory_kib,
+            "PASSWORD_ARGON2_PARALLELISM": 1,
+        })
+        for memory_kib in (19456, 32768, 65536, 131072)
+        for time_cost in (2, 3, 4)
+    ],
+    "bcrypt": [({"rounds": rounds}, {"PASSWORD_BCRYPT_ROUNDS": rounds}) for rounds in range(10, 16)],
+    "scrypt": [({"n": 2 ** power, "r": 8, "p": 1}, {"PASSWORD_SCRYPT_N": 2 ** power}) for power in range(14, 19)],
+}
+
+
+def measure(hasher: PasswordHasher, runs: int) -> float:
+    stored = hasher.hash("benchmark-password")
+    elapsed = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        hasher.verify(stored, "benchmark-password")
+        elapsed.append(time.perf_counter() - started)
+    return statistics.median(elapsed) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scheme", default=available_schemes()[0], choices=available_schemes())
+    parser.add_argument("--target-ms", type=float, default=250.0, help="單次登入可接受的雜湊時間")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"演算法 {args.scheme}，延遲預算 {args.target_ms:.0f} ms，每組執行 {args.runs} 次（取中位數）")
+    chosen = None
+    for cost, env in CANDIDATES[args.scheme]:
+        median_ms = measure(PasswordHasher(args.scheme, **cost), args.runs)
+        within = median_ms <= args.target_ms
+        print(f"  {cost}  {median_ms:8.1f} ms  {'✓' if within else '超過預算'}")
+        if within:
+            chosen = env
+
+    if chosen is None:
+        print("沒有任何設定符合預算；請放寬預算或改用其他演算法。")
+        return
+    settings = " ".join(f"{key}={value}" for key, value in chosen.items())
+    print(f"建議設定：PASSWORD_HASH_SCHEME={args.scheme} {settings}")
+
+
+if __name__ == "__main__":
+    main()
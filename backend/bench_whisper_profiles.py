@@ -0,0 +1,86 @@
+"""
+Whisper profile 基準測試：對固定音檔量測各 profile 的 real-time factor（RTF = 推論秒數 / 音訊秒數）。
+
+用法：
+    python backend/bench_whisper_profiles.py
+    python backend/bench_whisper_profiles.py --audio sample.webm --profiles cpu-int8 cpu-fp32 --runs 5
+
+未指定 --audio 時使用固定種子合成的 20 秒測試訊號（可重現，但不含真實語音，解碼長度會偏短）；
+要比較實際辨識負載請以真實錄音執行。
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from whisper_profile import PRESET_PROFILES, create_whisper_model
+
+SAMPLE_RATE = 16000
+
+
+def synthesize_fixture(seconds: float = 20.0, seed: int = 20240601) -> np.ndarray:
+    """固定種子的類語音訊號：數個諧波疊加並以音節速率調幅，再加少量雜訊。"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    fundamental = 140 + 30 * np.sin(2 * np.pi * 0.3 * t)
+    voiced = sum(np.sin(2 * np.pi * k * np.cumsum(fundamental) / SAMPLE_RATE) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 3.0 * t), 0, None) * (rng.random(len(t)) > 0.0005)
+    signal = 0.2 * voiced * envelope + 0.01 * rng.standard_normal(len(t))
+    return signal.astype(np.float32)
+
+
+def load_fixture(path: str) -> np.ndarray:
+    from faster_whisper.audio import decode_audio
+    return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+def benchmark_profile(name: str, audio: np.ndarray, runs: int) -> dict:
+    profile = PRESET_PROFILES[name]
+    load_started = time.perf_counter()
+    model = create_whisper_model(profile, num_workers=1)
+    load_seconds = time.perf_counter() - load_started
+
+    def transcribe_once() -> float:
+        started = time.perf_counter()
+        segments, _ = model.transcribe(audio, language="zh", beam_size=1, vad_filter=False)
+        "".join(seg.text for seg in segments)  # segments 為 generator，取完才算完成推論
+        return time.perf_counter() - started
+
+    transcribe_once()  # 暖機
+    elapsed = [transcribe_once() for _ in range(runs)]
+    audio_seconds = len(audio) / SAMPLE_RATE
+    return {
+        "profile": name,
+        "resolved": profile.resolved().to_dict(),
+        "load_s": load_seconds,
+        "median_s": statistics.median(elapsed),
+        "rtf": statistics.median(elapsed) / audio_seconds,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", help="音檔路徑；省略則使用合成測試訊號")
+    parser.add_argument("--profiles", nargs="+", default=["cpu-int8", "cpu-fp32"], choices=sorted(PRESET_PROFILES))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    audio = load_fixture(args.audio) if args.audio else synthesize_fixture()
+    print(f"音訊長度：{len(audio) / SAMPLE_RATE:.1f} 秒，每個 profile 執行 {args.runs} 次（取中位數）")
+    print(f"{'profile':<16}{'device':<8}{'compute_type':<14}{'load(s)':>9}{'median(s)':>11}{'RTF':>8}")
+    for name in args.profiles:
+        try:
+            result = benchmark_profile(name, audio, args.runs)
+        except Exception as ex:  # 例如 CPU 節點上測 GPU profile
+            print(f"{name:<16}略過：{ex}")
+            continue
+        resolved = result["resolved"]
+        print(
+            f"{name:<16}{resolved['device']:<8}{resolved['compute_type']:<14}"
+            f"{result['load_s']:>9.2f}{result['median_s']:>11.2f}{result['rtf']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from keyword_matcher import KeywordMatcher
+from phonetic_matcher import FUZZY_MATCH_ENABLED, MIN_FUZZY_SYLLABLES, PhoneticMatcher, PinyinReader, load_pinyin_reader
+
+# =========================
+# 類別詞庫（資料驅動）
+# =========================
+# 詞庫放在 lexicon/category_lexicon.json，後端計分與 assets/code/local_voice.py 共用同一份，不再各自維護而逐漸不一致。
+# - 每個類別的 concepts：標準詞 → 同義詞／異體字（例如 番茄 ← 蕃茄、西紅柿），計分以標準詞去重
+# - 新增測驗類別只需在 JSON 加一個 category，不必改程式
+# - 每個類別載入時編譯一次 KeywordMatcher（所有表面詞），之後每份逐字稿線性掃描
+# - 比對沒有斷詞邊界：「馬上」「牛奶」「滑鼠」裡的馬、牛、鼠都會命中。blockers 列出這類含類別詞的一般詞，
+#   一起放進自動機參與最左最長比對；命中擋字詞的位置不計分（行為對齊舊的 jieba 斷詞）
+# - 啟用拼音比對時另建 PhoneticMatcher：精確命中之間的空白段再做同音／近音比對，命中帶信心值
+#   單字詞（熊、馬、魚…）不切分空白段：「無偉熊」的近音候選是「無尾熊」而不是「熊」
+# - 計分（detail / total）只看精確命中，與是否啟用拼音比對無關；近音命中另外放在 fuzzy，不計分
+
+LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicon", "category_lexicon.json")
+
+
+class ConceptHit(NamedTuple):
+    start: int
+    end: int
+    surface: str   # 逐字稿中實際出現的詞
+    concept: str   # 對應的標準詞；擋字詞為空字串
+    confidence: float = 1.0  # 精確比對 1.0；拼音近音比對 < 1.0
+
+
+class ConceptScores(NamedTuple):
+    detail: Dict[str, int]     # 精確命中的標準詞 → 1（計分，total = len(detail)）
+    fuzzy: Dict[str, float]    # 只有近音命中的標準詞 → 最高信心值（供複核，不計分）
+
+
+@lru_cache(maxsize=None)
+def _pinyin_reader() -> Optional[PinyinReader]:
+    return load_pinyin_reader() if FUZZY_MATCH_ENABLED else None
+
+
+class Category:
+    def __init__(self, name: str, label: str, concepts: Dict[str, List[str]], blockers: Iterable[str] = ()) -> None:
+        self.name = name
+        self.label = label
+        self.concepts = concepts
+        self.surface_to_concept: Dict[str, str] = {}
+        for concept, variants in concepts.items():
+            for surface in (concept, *variants):
+                existing = self.surface_to_concept.setdefault(surface, concept)
+                if existing != concept:
+                    raise ValueError(f"詞庫 {name}：「{surface}」同時屬於「{existing}」與「{concept}」")
+        self.blockers: Set[str] = set(blockers)
+        overlap = self.blockers & set(self.surface_to_concept)
+        if overlap:
+            raise ValueError(f"詞庫 {name}：「{'、'.join(sorted(overlap))}」同時是類別詞與擋字詞")
+        self.matcher = KeywordMatcher(set(self.surface_to_concept) | self.blockers)
+        # 即時計分的 lookahead 以自動機中最長的詞為準（含擋字詞：接上的文字可能讓擋字詞蓋掉前面的命中）
+        self.max_match_length = max((len(term) for term in self.matcher.terms), default=0)
+        reader = _pinyin_reader()
+        self.phonetic: Optional[PhoneticMatcher] = PhoneticMatcher(self.surface_to_concept, reader) if reader else None
+
+    @property
+    def surfaces(self) -> Set[str]:
+        return set(self.surface_to_concept)
+
+    def find_matches(self, text: str) -> List[ConceptHit]:
+        """逐字稿中所有（最左最長、不重疊的）命中，含擋字詞（concept 為空字串），依出現順序。"""
+        return [
+            ConceptHit(start, end, surface, self.surface_to_concept.get(surface, ""))
+            for start, end, surface in self.matcher.find_all(text)
+        ]
+
+    def find_concepts(self, text: str) -> List[ConceptHit]:
+        """計分的命中：find_matches 去掉擋字詞。"""
+        return [hit for hit in self.find_matches(text) if hit.concept]
+
+    def concept_hits(self, text: str) -> Set[str]:
+        """逐字稿中出現過的標準詞（同義詞只算一次）。"""
+        return {hit.concept for hit in self.find_concepts(text)}
+
+    def is_anchor(self, hit: ConceptHit) -> bool:
+        """切分空白段的精確命中；擋字詞不是，未啟用拼音比對時其餘命中都是。"""
+        return bool(hit.concept) and (self.phonetic is None or len(hit.surface) >= MIN_FUZZY_SYLLABLES)
+
+    def gap_hits(self, gap: str, offset: int = 0) -> List[ConceptHit]:
+        """
+        兩個 anchor 之間的一段文字：其中的單字精確命中，加上近音命中，依出現順序。
+        - 被較長近音命中包住的單字命中不計（「無偉熊」算「無尾熊」，不算「熊」）
+        - 擋字詞與多字精確命中不可與近音候選有任何重疊（包住也不行）；單字命中只會被整個包住，不必保護
+        """
+        matches = self.find_matches(gap)
+        exact = [hit for hit in matches if hit.concept]
+        if self.phonetic is None or not gap:
+            return [hit._replace(start=offset + hit.start, end=offset + hit.end) for hit in exact]
+        protected = [(hit.start, hit.end) for hit in matches if not hit.concept or hit.end - hit.start > 1]
+        fuzzy = [
+            ConceptHit(match.start, match.end, gap[match.start:match.end],
+                       self.surface_to_concept[match.surface], match.confidence)
+            for match in self.phonetic.find_all(gap, protected)
+        ]
+        kept = [hit for hit in exact if not any(f.start <= hit.start and hit.end <= f.end for f in fuzzy)]
+        return [
+            hit._replace(start=offset + hit.start, end=offset + hit.end)
+            for hit in sorted(kept + fuzzy, key=lambda hit: hit.start)
+        ]
+
+    def scored_hits(self, text: str) -> List[ConceptHit]:
+        """anchor 精確命中，加上每段空白中的單字與近音命中，依出現順序。"""
+        hits: List[ConceptHit] = []
+        position = 0
+        for hit in self.find_concepts(text):
+            if not self.is_anchor(hit):
+                continue
+            hits.extend(self.gap_hits(text[position:hit.start], position))
+            hits.append(hit)
+            position = hit.end
+        hits.extend(self.gap_hits(text[position:], position))
+        return hits
+
+    def concept_scores(self, text: str) -> ConceptScores:
+        """精確命中計入 detail；近音命中的標準詞若沒有精確答出，放進 fuzzy（同一個標準詞取最高信心值）。"""
+        detail = {hit.concept: 1 for hit in self.find_concepts(text)}
+        fuzzy: Dict[str, float] = {}
+        if self.phonetic is not None:
+            for hit in self.scored_hits(text):
+                if hit.confidence < 1.0 and hit.concept not in detail:
+                    fuzzy[hit.concept] = max(fuzzy.get(hit.concept, 0.0), hit.confidence)
+        return ConceptScores(detail, fuzzy)
+
+
+class Lexicon:
+    def __init__(self, version: int, categories: Dict[str, Category]) -> None:
+        self.version = version
+        self.categories = categories
+
+
+@lru_cache(maxsize=None)
+def load_lexicon(path: str = LEXICON_PATH) -> Lexicon:
+    """讀取並編譯詞庫；同一路徑只編譯一次。"""
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    categories = {
+        name: Category(name, spec.get("label", name), spec["concepts"], spec.get("blockers", ()))
+        for name, spec in data["categories"].items()
+    }
+    return Lexicon(int(data["version"]), categories)
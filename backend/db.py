@@ -1,17 +1,54 @@
-import psycopg2
+import csv
+import io
 import json
 import os
+import sys
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Sequence
+from uuid import uuid4
 
 current_dir = os.path.dirname(os.path.abspath(__file__))  # 取得目前檔案的絕對路徑
 config_path = os.path.join(current_dir, 'config.json')
 
-with open(config_path, 'r') as file:
-    config = json.load(file)
 
-# Database configuration
-db_config = config['postgres']
+@lru_cache(maxsize=1)
+def get_db_config() -> Dict[str, Any]:
+    """Database configuration；第一次連線時才讀 config.json，換成測試用連線池時不需要設定檔。"""
+    with open(config_path, 'r') as file:
+        config = json.load(file)
+    return config['postgres']
+
+# =========================
+# 連線池
+# =========================
+# 原本每次查詢都 psycopg2.connect → 查詢 → close，每筆都付一次 TCP + 認證握手。
+# 改為行程內共用 ThreadedConnectionPool（第一次使用才建立）：
+# - DB_POOL_MIN / DB_POOL_MAX 控制連線數；ThreadedConnectionPool 池滿時 getconn 會立刻拋 PoolError，
+#   因此借出前先取得號誌（容量 = 池的 maxconn），池滿時最多等 DB_POOL_WAIT_SECONDS，逾時才拋 TimeoutError
+# - 健康檢查：取出的連線若已關閉，或閒置超過 DB_POOL_PING_IDLE_SECONDS，先 SELECT 1 確認，失效就換新連線
+# - set_connection_pool() 可換成任何具備 getconn / putconn / closeall 的池（例如測試用 SQLite 連線池）
+# Flask app 的請求路徑走 Flask-SQLAlchemy（連線池參數見 app.py 的 SQLALCHEMY_ENGINE_OPTIONS），不經過這個模組；
+# 這裡的池與批次 / 健康檢查函式供匯入資料、維運腳本等直接使用 psycopg2 的程式。
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+DB_POOL_WAIT_SECONDS = float(os.getenv("DB_POOL_WAIT_SECONDS", "10"))
+
+_pool: Any = None
+_pool_lock = threading.Lock()
+_checkout_slots = threading.BoundedSemaphore(DB_POOL_MAX)  # 與 _pool 一起替換
+_last_used: Dict[int, float] = {}  # id(connection) → 最後歸還時間
+
 
 def get_db_connection():
+    """建立一條新的（非池化）連線；一般查詢請改用 pooled_connection()。"""
+    import psycopg2
+    db_config = get_db_config()
     connection = psycopg2.connect(
         host=db_config['host'],
         port=db_config['port'],
@@ -21,19 +58,217 @@ def get_db_connection():
     )
     return connection
 
+
+def get_connection_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import psycopg2.pool
+                db_config = get_db_config()
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=db_config['host'],
+                    port=db_config['port'],
+                    database=db_config['database'],
+                    user=db_config['user'],
+                    password=db_config['password'],
+                )
+    return _pool
+
+
+def set_connection_pool(pool: Any) -> None:
+    """
+    替換連線池（關閉舊的）；pool 需提供 getconn() / putconn(conn, close=False) / closeall()，
+    有 maxconn 屬性時以它作為同時借出的上限，否則用 DB_POOL_MAX。
+    """
+    global _pool, _checkout_slots
+    with _pool_lock:
+        previous, _pool = _pool, pool
+        _checkout_slots = threading.BoundedSemaphore(getattr(pool, "maxconn", DB_POOL_MAX))
+        _last_used.clear()
+    if previous is not None and previous is not pool:
+        previous.closeall()
+
+
+def _is_connection_alive(connection: Any) -> bool:
+    if getattr(connection, "closed", 0):
+        return False
+    if time.monotonic() - _last_used.get(id(connection), 0.0) < DB_POOL_PING_IDLE_SECONDS:
+        return True
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        cursor.close()
+        connection.rollback()  # 不留下未結束的交易
+        return True
+    except Exception:
+        return False
+
+
+def _checkout_healthy_connection(pool: Any) -> Any:
+    """取出可用連線；最多換 DB_POOL_MAX 次，避免整池失效時無限重試。"""
+    for _ in range(max(1, DB_POOL_MAX)):
+        connection = pool.getconn()
+        if _is_connection_alive(connection):
+            return connection
+        logging.warning("Discarding a dead pooled database connection")
+        _last_used.pop(id(connection), None)
+        pool.putconn(connection, close=True)
+    return pool.getconn()
+
+
+@contextmanager
+def pooled_connection() -> Iterator[Any]:
+    """
+    從池中借一條連線：區塊正常結束即 commit，發生例外則 rollback 後再拋出；最後一定歸還。
+    連線本身已失效（例如資料庫重啟）時直接關閉，不放回池中。
+    池中連線都借出時等待至多 DB_POOL_WAIT_SECONDS，逾時拋 TimeoutError。
+    """
+    pool = get_connection_pool()
+    slots = _checkout_slots  # 歸還到借出時的那組號誌（期間池可能被替換）
+    if not slots.acquire(timeout=DB_POOL_WAIT_SECONDS):
+        raise TimeoutError(f"No pooled database connection available within {DB_POOL_WAIT_SECONDS}s")
+    try:
+        connection = _checkout_healthy_connection(pool)
+    except BaseException:
+        slots.release()
+        raise
+    broken = False
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        try:
+            connection.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        broken = broken or bool(getattr(connection, "closed", 0))
+        if broken:
+            _last_used.pop(id(connection), None)
+        else:
+            _last_used[id(connection)] = time.monotonic()
+        pool.putconn(connection, close=broken)
+        slots.release()
+
+
+def _execute(cursor: Any, query: str, params: Any) -> None:
+    # 沒有參數時不傳 None：sqlite3 等 DB-API 驅動不接受 None 作為參數
+    if params is None:
+        cursor.execute(query)
+    else:
+        cursor.execute(query, params)
+
+
 def read_from_db(query, params=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    result = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _execute(cursor, query, params)
+        result = cursor.fetchall()
+        cursor.close()
     return result
 
+
 def write_to_db(query, params=None):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute(query, params)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        _execute(cursor, query, params)
+        cursor.close()
+
+
+# =========================
+# 批次讀寫
+# =========================
+def _is_psycopg2_connection(connection: Any) -> bool:
+    return type(connection).__module__.split(".")[0] == "psycopg2"
+
+
+def _placeholder(connection: Any) -> str:
+    """依連線所屬 DB-API 模組的 paramstyle 回傳參數佔位符（sqlite3 為 ?，psycopg2 為 %s）。"""
+    module = sys.modules.get(type(connection).__module__.split(".")[0])
+    return "?" if getattr(module, "paramstyle", "format") == "qmark" else "%s"
+
+
+def write_many_to_db(query: str, rows: Iterable[Sequence[Any]], page_size: int = 500) -> None:
+    """
+    同一條 SQL 套用多組參數，單一交易。
+    psycopg2 連線用 execute_batch（每 page_size 組合併成一次往返），其他 DB-API 連線退回 executemany。
+    """
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        if _is_psycopg2_connection(conn):
+            import psycopg2.extras
+            psycopg2.extras.execute_batch(cursor, query, rows, page_size=page_size)
+        else:
+            cursor.executemany(query, rows)
+        cursor.close()
+
+
+def copy_rows_to_table(table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    大量寫入，回傳寫入筆數；單一交易。
+    psycopg2 連線以 COPY FROM STDIN（CSV，None 寫成 NULL）一次送完；其他 DB-API 連線退回 executemany INSERT。
+    table / columns 由程式端指定，不接受使用者輸入。
+    """
+    rows = list(rows)
+    column_list = ", ".join(f'"{column}"' for column in columns)
+    with pooled_connection() as conn:
+        cursor = conn.cursor()
+        if _is_psycopg2_connection(conn):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(["\\N" if value is None else value for value in row])
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY "{table}" ({column_list}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer)
+        else:
+            placeholders = ", ".join([_placeholder(conn)] * len(columns))
+            cursor.executemany(f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})', rows)
+        cursor.close()
+    return len(rows)
+
+
+def read_in_batches(query: str, params: Any = None, batch_size: int = 1000) -> Iterator[List[tuple]]:
+    """
+    大量讀取時分批取回，避免一次把整個結果集載入記憶體。
+    psycopg2 連線使用具名（server-side）cursor；其他連線以 fetchmany 分批。
+    產生器取用完畢（或被關閉）才歸還連線。
+    """
+    with pooled_connection() as conn:
+        if _is_psycopg2_connection(conn):
+            cursor = conn.cursor(name=f"read_in_batches_{uuid4().hex}")
+            cursor.itersize = batch_size
+        else:
+            cursor = conn.cursor()
+        try:
+            _execute(cursor, query, params)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+
+
+# =========================
+# 健康檢查
+# =========================
+def check_db_health() -> Dict[str, Any]:
+    """以池中連線執行 SELECT 1，回報是否可用與往返時間（供 readiness probe 或維運腳本）。"""
+    started = time.perf_counter()
+    try:
+        read_from_db("SELECT 1")
+    except Exception as ex:
+        return {"ok": False, "error": repr(ex)}
+    pool = get_connection_pool()
+    return {
+        "ok": True,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "pool_min": getattr(pool, "minconn", None),
+        "pool_max": getattr(pool, "maxconn", None),
+    }
@@ -0,0 +1,35 @@
+"""
+把 model/random_forest_model.pgz 匯出為 mmap 可直接載入的 .npy 格式（model/compiled_forest/）。
+
+用法：
+    python backend/export_forest_artifact.py
+    python backend/export_forest_artifact.py --keep 3
+
+匯出前會與 sklearn 比對機率；完成後切換 CURRENT 指標。執行中的服務若設定
+MODEL_RELOAD_POLL_SECONDS，或呼叫 POST /model_reload，即會換上新版本，不需重啟 worker。
+"""
+import argparse
+import json
+import os
+
+from forest_compiler import MANIFEST_FILENAME
+from model import export_compiled_artifact
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", type=int, default=2, help="保留的版本目錄數（含新版本）")
+    args = parser.parse_args()
+
+    artifact_dir = export_compiled_artifact(keep=max(1, args.keep))
+    with open(os.path.join(artifact_dir, MANIFEST_FILENAME), "r", encoding="utf-8") as file:
+        manifest = json.load(file)
+    print(f"已匯出：{artifact_dir}")
+    print(
+        f"樹數 {manifest['n_trees']}，節點 {manifest['n_nodes']}，最大深度 {manifest['max_depth']}，"
+        f"與 sklearn 最大機率誤差 {manifest['max_parity_error']:.2e}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# =========================
+# 編譯式隨機森林推論
+# =========================
+# sklearn 的 RandomForestClassifier.predict_proba 對單筆輸入有大量 Python / joblib 分派成本，
+# 這部分主宰了 /predict 的延遲。這裡把所有樹攤平成連續的 NumPy 陣列：
+#   feature / threshold / left / right / missing_left / leaf_proba
+# 所有樹的節點串在同一組陣列裡（children 已加上 offset），葉節點的左右子節點指向自己，
+# 因此所有列、所有樹可以同步走 max_depth 步，以向量化索引完成遍歷。
+# 比較規則與 sklearn 相同：X 先轉 float32，再與 float64 門檻比較（<= 走左）。
+
+_ROW_BLOCK = 4096  # 大批次分塊，避免 (rows × trees × classes) 暫存過大
+
+# 匯出格式：每個陣列一個 .npy + manifest.json（最後寫入，代表匯出完成）
+ARTIFACT_FORMAT_VERSION = 1
+ARRAY_FIELDS = ("feature", "threshold", "left", "right", "missing_left", "leaf_proba", "roots")
+MANIFEST_FILENAME = "manifest.json"
+
+
+class CompiledForest:
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        missing_left: np.ndarray,
+        leaf_proba: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        classes: np.ndarray,
+        n_features_in_: Optional[int],
+        manifest: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in_
+        self.manifest = manifest or {}  # load() 時保存匯出資訊（來源雜湊等）
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_estimator(cls, estimator: Any) -> "CompiledForest":
+        """由已訓練的 RandomForestClassifier（或同樣有 estimators_[i].tree_ 的模型）建立。"""
+        trees = [tree.tree_ for tree in getattr(estimator, "estimators_", [])]
+        if not trees:
+            raise TypeError("模型沒有 estimators_[i].tree_，無法編譯")
+        if any(tree.n_outputs != 1 for tree in trees):
+            raise TypeError("僅支援單一輸出的分類森林")
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        features, thresholds, lefts, rights, missing_lefts, probas = [], [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            # sklearn >= 1.3 支援缺值；舊版沒有此屬性時缺值一律走右（與 NaN <= t 為 False 一致）
+            missing_go_to_left = getattr(tree, "missing_go_to_left", None)
+            missing_lefts.append(
+                np.zeros(tree.node_count, dtype=bool) if missing_go_to_left is None
+                else np.asarray(missing_go_to_left, dtype=bool)
+            )
+            values = tree.value[:, 0, :].astype(np.float64)
+            normalizer = values.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(values / normalizer)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            missing_left=np.concatenate(missing_lefts),
+            leaf_proba=np.concatenate(probas),
+            roots=offsets.astype(np.intp),
+            max_depth=max(int(tree.max_depth) for tree in trees),
+            classes=np.asarray(estimator.classes_),
+            n_features_in_=int(estimator.n_features_in_) if hasattr(estimator, "n_features_in_") else None,
+        )
+
+    def _predict_block(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            values = X[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(values), self.missing_left[nodes], values <= self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.leaf_proba[nodes].sum(axis=1) / self.n_trees
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)  # 與 sklearn 相同：比較前先轉 float32
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) <= _ROW_BLOCK:
+            return self._predict_block(X)
+        return np.concatenate([self._predict_block(X[i:i + _ROW_BLOCK]) for i in range(0, len(X), _ROW_BLOCK)])
+
+    def split_thresholds(self, feature_index: int) -> np.ndarray:
+        """某個特徵在整片森林中用到的所有分岔門檻（排序、去重）。"""
+        is_split = (self.left != np.arange(len(self.left))) & (self.feature == feature_index)
+        return np.unique(self.threshold[is_split])
+
+    def predict(self, X: Any) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+    # ---------- 匯出 / 載入 ----------
+    def save(self, directory: str, extra_manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """寫出 .npy 陣列與 manifest；manifest 以暫存檔 + os.replace 最後寫入，讀取端不會看到半套檔案。"""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_FIELDS:
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "classes": self.classes_.tolist(),
+            "n_features_in": self.n_features_in_,
+            "max_depth": self.max_depth,
+            "n_trees": self.n_trees,
+            "n_nodes": int(len(self.feature)),
+            **(extra_manifest or {}),
+        }
+        manifest_path = os.path.join(directory, MANIFEST_FILENAME)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return manifest
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "CompiledForest":
+        """
+        讀回 save() 的輸出。mmap=True 時陣列以唯讀 memory map 開啟：
+        多個 worker 行程透過 OS page cache 共用同一份實體頁面，載入幾乎不花時間。
+        """
+        with open(os.path.join(directory, MANIFEST_FILENAME), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"不支援的模型匯出格式版本：{manifest.get('format_version')}")
+
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+            for name in ARRAY_FIELDS
+        }
+        return cls(
+            **arrays,
+            max_depth=int(manifest["max_depth"]),
+            classes=np.asarray(manifest["classes"]),
+            n_features_in_=manifest["n_features_in"],
+            manifest=manifest,
+        )
+
+
+def parity_sample(n_features: int, rows: int = 512, seed: int = 0) -> np.ndarray:
+    """比對用的固定種子樣本：涵蓋 0 附近與較大數值，讓大部分分岔兩側都被走到。"""
+    rng = np.random.default_rng(seed)
+    scale = rng.choice([1.0, 5.0, 30.0, 300.0], size=(rows, n_features))
+    return np.abs(rng.standard_normal((rows, n_features))) * scale
+
+
+def max_parity_error(compiled: CompiledForest, estimator: Any, X: np.ndarray) -> float:
+    """回傳編譯版與 sklearn predict_proba 的最大絕對誤差。"""
+    return float(np.max(np.abs(compiled.predict_proba(X) - estimator.predict_proba(X))))
+
+
+def compile_with_parity_check(estimator: Any, tolerance: float = 1e-9) -> CompiledForest:
+    """編譯並以固定樣本比對 sklearn；誤差超過 tolerance 時拋 ValueError，呼叫端應退回 sklearn。"""
+    compiled = CompiledForest.from_estimator(estimator)
+    n_features = compiled.n_features_in_ or int(compiled.feature.max()) + 1
+    error = max_parity_error(compiled, estimator, parity_sample(n_features))
+    if error > tolerance:
+        raise ValueError(f"編譯版森林與 sklearn 結果不一致（max abs error={error:.3g}）")
+    return compiled
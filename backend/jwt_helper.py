@@ -1,13 +1,24 @@
+import hashlib
 import os
+import time
 from datetime import datetime, timedelta, timezone
 from functools import wraps
-import os
-from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 import jwt
 from flask import abort, current_app, g, request
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from ttl_cache import TTLCache
+
+# =========================
+# Token 驗證快取
+# =========================
+# 每段錄音會上傳數十個 chunk，每個請求都要驗 token。驗證只 decode 一次（PyJWT）：
+#   - 有 role（guest / user）→ 本模組 create_jwt 簽發的 token
+#   - type == "access" → flask_jwt_extended 的 create_access_token（登入），視為 user
+# 通過驗證的 claims 以 token 的 SHA-256 為 key 快取到 exp 為止（有上限的 LRU），
+# 同一 token 之後的請求不再做簽章驗證。JWT_CLAIMS_CACHE_SIZE=0 停用。
+claims_cache = TTLCache(maxsize=int(os.getenv("JWT_CLAIMS_CACHE_SIZE", "4096")), ttl_seconds=0)
 
 
 def _get_secret() -> str:
@@ -28,6 +39,40 @@ def decode_jwt(token: str) -> Dict[str, Any]:
     return jwt.decode(token, _get_secret(), algorithms=["HS256"])
 
 
+def _role_and_identity(payload: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    role = payload.get("role")
+    if role in ("guest", "user"):
+        return role, payload.get("sub")
+    if payload.get("type") == "access":
+        identity_claim = current_app.config.get("JWT_IDENTITY_CLAIM", "sub")
+        return "user", payload.get(identity_claim)
+    return None
+
+
+def verify_bearer_token(token: str) -> Tuple[str, Any]:
+    """回傳 (role, identity)；token 無效或過期時直接 abort(401)。"""
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = claims_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        payload = decode_jwt(token)
+    except jwt.ExpiredSignatureError:
+        abort(401, description="Token has expired")
+    except jwt.InvalidTokenError:
+        abort(401, description="Unauthorized")
+
+    claims = _role_and_identity(payload)
+    if claims is None:
+        abort(401, description="Unauthorized")
+
+    expires_at = payload.get("exp")
+    if isinstance(expires_at, (int, float)):
+        claims_cache.set(cache_key, claims, ttl_seconds=expires_at - time.time())
+    return claims
+
+
 def guest_or_user_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
@@ -35,25 +80,7 @@ def guest_or_user_required(fn):
         if not auth_header.startswith("Bearer "):
             abort(401, description="Authorization header missing or invalid")
 
-        token = auth_header.split(" ", 1)[1]
-        try:
-            payload = decode_jwt(token)
-            role = payload.get("role")
-            if role in ("guest", "user"):
-                g.current_role = role
-                g.current_identity = payload.get("sub")
-                return fn(*args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            abort(401, description="Token has expired")
-        except jwt.InvalidTokenError:
-            payload = None
-
-        try:
-            verify_jwt_in_request()
-            g.current_role = "user"
-            g.current_identity = get_jwt_identity()
-            return fn(*args, **kwargs)
-        except Exception:
-            abort(401, description="Unauthorized")
+        g.current_role, g.current_identity = verify_bearer_token(auth_header.split(" ", 1)[1])
+        return fn(*args, **kwargs)
 
     return wrapper
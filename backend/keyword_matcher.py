@@ -0,0 +1,74 @@
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+# =========================
+# 類別詞比對（Aho-Corasick）
+# =========================
+# 取代「jieba.lcut 全文 → 與詞庫取交集」：
+# - 不需載入 jieba 詞典，也不必對每個詞 jieba.add_word
+# - 詞庫建一次自動機，之後每份逐字稿只線性掃描一遍
+# - 重疊時採最左最長（leftmost-longest）：「小番茄」不會再另算「番茄」，「台灣黑熊」不會再另算「熊」
+
+
+class KeywordMatcher:
+    def __init__(self, terms: Iterable[str]) -> None:
+        self.terms: Set[str] = {term for term in terms if term}
+        # 節點以整數編號；_goto[node] 為子節點表，_lengths[node] 為以該節點結尾的所有詞長度（含 fail 鏈上的）
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._lengths: List[Tuple[int, ...]] = [()]
+        for term in self.terms:
+            self._insert(term)
+        self._build_fail_links()
+
+    def _insert(self, term: str) -> None:
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._lengths.append(())
+            node = next_node
+        self._lengths[node] = (len(term),)
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # 合併 fail 鏈上的輸出，掃描時不必再沿鏈回溯
+                self._lengths[child] = tuple(sorted(set(self._lengths[child] + self._lengths[self._fail[child]]), reverse=True))
+                queue.append(child)
+
+    def _all_matches(self, text: str) -> List[Tuple[int, int]]:
+        """所有（可能重疊的）命中，回傳 (start, end)。"""
+        matches = []
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length in self._lengths[node]:
+                matches.append((end - length, end))
+        return matches
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """不重疊的最左最長命中，依出現順序回傳 (start, end, term)。"""
+        selected = []
+        last_end = 0
+        for start, end in sorted(self._all_matches(text), key=lambda match: (match[0], -match[1])):
+            if start >= last_end:
+                selected.append((start, end, text[start:end]))
+                last_end = end
+        return selected
+
+    def unique_hits(self, text: str) -> Set[str]:
+        return {term for _, _, term in self.find_all(text)}
@@ -1,25 +1,75 @@
 # -*- coding: UTF-8 -*-
 import os
 import gzip
+import time
+import shutil
 import pickle
+import hashlib
 from typing import Tuple, Sequence
-from functools import lru_cache
+import logging
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.pipeline import Pipeline
 from typing import Any, Optional
 
+from forest_compiler import MANIFEST_FILENAME, CompiledForest, compile_with_parity_check, max_parity_error, parity_sample
+from model_registry import ModelRegistry
+from prediction_table import MANIFEST_FILENAME as TABLE_MANIFEST_FILENAME, PredictionTable
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
 # 將所有與模型相關的常數集中管理，命名具體清楚
 MODEL_RELATIVE_PATH = os.path.join('model', 'random_forest_model.pgz')
+# 匯出格式（export_forest_artifact.py 產生）：model/compiled_forest/<版本目錄>/*.npy + manifest.json，
+# CURRENT 檔記錄目前使用的版本目錄名稱（以 os.replace 原子切換）
+MODEL_ARTIFACT_RELATIVE_DIR = os.path.join('model', 'compiled_forest')
+ARTIFACT_POINTER_FILENAME = 'CURRENT'
+# auto：有匯出格式就用（mmap 載入），否則讀 .pgz；pickle / npy 強制指定其中一種
+MODEL_ARTIFACT_FORMAT = os.getenv("MODEL_ARTIFACT_FORMAT", "auto")
 POSITIVE_LABEL = 1  # 若你的陽性標籤不是 1，請在此處明確指定
+# 設為 1 時改用 forest_compiler 的攤平陣列推論（需通過與 sklearn 的一致性檢查，否則自動退回）
+COMPILED_INFERENCE_ENABLED = os.getenv("MODEL_COMPILED_INFERENCE", "0") == "1"
+# 離散網格查表（build_prediction_table.py 產生）；設為 1 時 /predict 先查表，不在網格內才走模型
+PREDICTION_TABLE_RELATIVE_DIR = os.path.join('model', 'prediction_table')
+PREDICTION_TABLE_ENABLED = os.getenv("PREDICTION_TABLE_MODE", "0") == "1"
+# 連續欄位分桶使查表成為近似；manifest 記錄的抽樣誤差超過上限就不啟用，改走模型推論
+PREDICTION_TABLE_MAX_ABS_ERROR = float(os.getenv("PREDICTION_TABLE_MAX_ABS_ERROR", "0.01"))
+PREDICTION_TABLE_MAX_LABEL_MISMATCH = float(os.getenv("PREDICTION_TABLE_MAX_LABEL_MISMATCH", "0"))
 
 def get_absolute_model_path() -> str:
     """回傳模型的絕對路徑。單一職責：只負責算路徑。"""
     current_directory = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(current_directory, MODEL_RELATIVE_PATH)
 
+def get_absolute_artifact_root() -> str:
+    """回傳匯出格式根目錄的絕對路徑。"""
+    current_directory = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_directory, MODEL_ARTIFACT_RELATIVE_DIR)
+
+def resolve_current_artifact_dir() -> Optional[str]:
+    """依 CURRENT 指標找出目前的匯出目錄；不存在或不完整（沒有 manifest）時回傳 None。"""
+    artifact_root = get_absolute_artifact_root()
+    try:
+        with open(os.path.join(artifact_root, ARTIFACT_POINTER_FILENAME), 'r', encoding='utf-8') as file:
+            artifact_name = file.read().strip()
+    except FileNotFoundError:
+        return None
+    artifact_dir = os.path.join(artifact_root, artifact_name)
+    return artifact_dir if os.path.exists(os.path.join(artifact_dir, MANIFEST_FILENAME)) else None
+
+def get_absolute_table_dir() -> str:
+    """回傳查表目錄的絕對路徑。"""
+    current_directory = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_directory, PREDICTION_TABLE_RELATIVE_DIR)
+
+def model_source_sha256() -> str:
+    """.pgz 的 SHA-256；匯出格式與查表都記錄它，用來確認衍生檔案與模型是同一版。"""
+    with open(get_absolute_model_path(), 'rb') as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
 def extract_estimator_from_artifact(artifact: Any) -> Any:
     """單一職責：從多種封裝形式取出具有 predict/predict_proba 的估計器。"""
+    from sklearn.pipeline import Pipeline  # 延遲載入：import model 不必先載入 sklearn
+
     # 1) 如果是字典，嘗試常見鍵位
     if isinstance(artifact, dict):
         for candidate_key in ("model", "estimator", "clf"):
@@ -35,9 +85,75 @@ def extract_estimator_from_artifact(artifact: Any) -> Any:
     # 3) 其他情形：直接回傳給後續做屬性檢查
     return artifact
 
-@lru_cache(maxsize=1)
-def load_trained_model() -> Any:
-    """Lazy load + 快取，支援多種封裝形式。"""
+def to_numpy_2d(array_like: Sequence[float]) -> np.ndarray:
+    """
+    將輸入轉為 shape=(1, n_features) 的 2D numpy 陣列。
+    單一職責：只負責轉型與形狀保證。
+    """
+    input_array = np.asarray(array_like, dtype=float)
+    if input_array.ndim == 1:
+        return input_array.reshape(1, -1)
+    return input_array
+
+def get_positive_class_index(model: Any, positive_label: int) -> int:
+    """
+    依據指定陽性標籤，回傳在 classes_ 中的索引。
+    單一職責：只負責找出正確的機率欄位索引。
+    """
+    classes_list = list(model.classes_)
+    if positive_label not in classes_list:
+        raise ValueError(f"Positive label {positive_label} not found in model classes: {classes_list}")
+    return classes_list.index(positive_label)
+
+class TrainedModelPredictor:
+    """
+    推論包裝：模型載入時建立一次，快取陽性類別索引、classes_ 與 n_features_in_。
+    - 單筆與批次共用同一條路徑：一次 predict_proba，標籤由機率取 argmax 對回 classes_
+      （與 RandomForest.predict 的定義一致），不再把整片森林走兩次。
+    - compiled=True 時以 CompiledForest 取代 estimator.predict_proba；編譯失敗或結果不一致則沿用 sklearn。
+    """
+
+    def __init__(self, estimator: Any, positive_label: int = POSITIVE_LABEL, compiled: bool = False) -> None:
+        self.estimator = estimator
+        self.engine = compile_engine(estimator) if compiled else estimator
+        self.classes = np.asarray(estimator.classes_)
+        self.positive_index = get_positive_class_index(estimator, positive_label)
+        n_features_in = getattr(estimator, "n_features_in_", None)
+        self.n_features_in_: Optional[int] = int(n_features_in) if n_features_in is not None else None
+        self.table: Optional[PredictionTable] = None  # 查表模式時由 load_predictor_from_disk 掛上
+
+    def predict_batch(self, feature_matrix: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """回傳 (predicted_labels, positive_probabilities)，皆為長度 n_rows 的陣列。"""
+        input_array_2d = to_numpy_2d(feature_matrix)
+        probabilities = self.engine.predict_proba(input_array_2d)
+        predicted_labels = self.classes.take(np.argmax(probabilities, axis=1))
+        return predicted_labels.astype(int), probabilities[:, self.positive_index].astype(float)
+
+    def predict_one(self, feature_values: Sequence[float]) -> Tuple[int, float]:
+        """單筆推論，回傳 Python 原生型別，避免 JSON 序列化問題。查表命中時不進模型。"""
+        if self.table is not None:
+            table_result = self.table.lookup(feature_values)
+            if table_result is not None:
+                return table_result
+        predicted_labels, positive_probabilities = self.predict_batch(feature_values)
+        return int(predicted_labels[0]), float(positive_probabilities[0])
+
+    @property
+    def engine_name(self) -> str:
+        return "compiled" if isinstance(self.engine, CompiledForest) else "sklearn"
+
+
+def compile_engine(estimator: Any) -> Any:
+    """嘗試編譯森林；不支援的模型或一致性檢查失敗時記錄原因並回傳原 estimator。"""
+    try:
+        return compile_with_parity_check(estimator)
+    except (TypeError, ValueError, AttributeError) as ex:
+        logger.warning("編譯式推論停用，改用 sklearn：%s", ex)
+        return estimator
+
+
+def load_estimator_from_pickle() -> Any:
+    """解壓並反序列化 .pgz，取出估計器並做能力檢查（predict / predict_proba）。"""
     model_path = get_absolute_model_path()
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model file not found at: {model_path}")
@@ -53,45 +169,177 @@ def load_trained_model() -> Any:
     if not hasattr(estimator, "predict_proba"):
         # 若是二元分類器但沒有 predict_proba，常見是用 regressor 或版本不符
         raise AttributeError("Loaded artifact does not provide 'predict_proba'.")
-
     return estimator
 
-def to_numpy_2d(array_like: Sequence[float]) -> np.ndarray:
+
+def load_predictor_from_disk() -> TrainedModelPredictor:
     """
-    將輸入轉為 shape=(1, n_features) 的 2D numpy 陣列。
-    單一職責：只負責轉型與形狀保證。
+    依 MODEL_ARTIFACT_FORMAT 從磁碟建立推論包裝（每次呼叫都重新讀檔，供 registry 載入 / 重載）。
+    - 匯出格式以 mmap 載入，不經 sklearn；一致性已在匯出時檢查過
+    - 匯出格式必須由目前的 .pgz 產生（manifest 的 source_sha256）：.pgz 換過但尚未重新匯出時，
+      auto 改讀 .pgz，npy 拒絕載入；否則重載會回報成功卻繼續用舊的陣列
+    - .pgz 路徑維持原行為，MODEL_COMPILED_INFERENCE=1 時另外在記憶體內編譯
     """
-    input_array = np.asarray(array_like, dtype=float)
-    if input_array.ndim == 1:
-        return input_array.reshape(1, -1)
-    return input_array
+    model_path = get_absolute_model_path()
+    source_sha256 = model_source_sha256() if os.path.exists(model_path) else None
+    artifact_dir = resolve_current_artifact_dir() if MODEL_ARTIFACT_FORMAT != "pickle" else None
+    if artifact_dir is None and MODEL_ARTIFACT_FORMAT == "npy":
+        raise FileNotFoundError(f"Exported model artifact not found under: {get_absolute_artifact_root()}")
+
+    predictor: Optional[TrainedModelPredictor] = None
+    if artifact_dir is not None:
+        forest = CompiledForest.load(artifact_dir, mmap=True)
+        artifact_sha256 = forest.manifest.get("source_sha256")
+        if source_sha256 is None or artifact_sha256 == source_sha256:
+            logger.info("載入匯出格式：%s（source_sha256=%s）", artifact_dir, artifact_sha256)
+            predictor = TrainedModelPredictor(forest)
+            source_sha256 = artifact_sha256
+        elif MODEL_ARTIFACT_FORMAT == "npy":
+            raise ValueError(
+                f"Exported model artifact {artifact_dir} was built from {artifact_sha256}, "
+                f"but {model_path} is {source_sha256}; re-run export_forest_artifact.py"
+            )
+        else:
+            logger.warning(
+                "匯出格式 %s 與目前的 .pgz 不符（%s ≠ %s），改讀 .pgz；請重新執行 export_forest_artifact.py",
+                artifact_dir, artifact_sha256, source_sha256,
+            )
+
+    if predictor is None:
+        logger.info("載入 .pgz：%s（source_sha256=%s）", model_path, source_sha256)
+        predictor = TrainedModelPredictor(load_estimator_from_pickle(), compiled=COMPILED_INFERENCE_ENABLED)
+
+    if PREDICTION_TABLE_ENABLED:
+        predictor.table = load_matching_prediction_table(source_sha256)
+    return predictor
+
+
+def load_matching_prediction_table(source_sha256: Optional[str]) -> Optional[PredictionTable]:
+    """載入查表；不存在、不是由同一份模型建出來的、或近似誤差超過上限就不用（記錄警告，改走模型推論）。"""
+    table_dir = get_absolute_table_dir()
+    if not os.path.exists(os.path.join(table_dir, TABLE_MANIFEST_FILENAME)):
+        logger.warning("查表模式已啟用但找不到 %s，改用模型推論", table_dir)
+        return None
+    try:
+        table = PredictionTable.load(table_dir, mmap=True)
+    except ValueError as ex:
+        logger.warning("查表無法載入（%s），改用模型推論；請重新執行 build_prediction_table.py", ex)
+        return None
+    if table.manifest.get("source_sha256") != source_sha256:
+        logger.warning("查表與目前模型版本不符，改用模型推論；請重新執行 build_prediction_table.py")
+        return None
+    violation = table.error_bound_violation(PREDICTION_TABLE_MAX_ABS_ERROR, PREDICTION_TABLE_MAX_LABEL_MISMATCH)
+    if violation:
+        logger.warning("查表近似誤差超過上限（%s），改用模型推論；請增加桶數後重新建表", violation)
+        return None
+    return table
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def model_source_fingerprint() -> Tuple[Any, ...]:
+    """模型來源檔案（.pgz、匯出指標、查表）的 (mtime, size)；任何一個改變即視為模型更新。"""
+    return (
+        _file_signature(get_absolute_model_path()),
+        _file_signature(os.path.join(get_absolute_artifact_root(), ARTIFACT_POINTER_FILENAME)),
+        _file_signature(os.path.join(get_absolute_table_dir(), TABLE_MANIFEST_FILENAME)),
+    )
+
+
+# 取代 @lru_cache(maxsize=1)：可重載、有版本號；MODEL_RELOAD_POLL_SECONDS > 0 時由 app 啟動檔案監看
+model_registry = ModelRegistry(
+    loader=load_predictor_from_disk,
+    fingerprint=model_source_fingerprint,
+    poll_seconds=float(os.getenv("MODEL_RELOAD_POLL_SECONDS", "0")),
+)
+
 
-def get_positive_class_index(model: RandomForestClassifier, positive_label: int) -> int:
+def load_trained_model() -> TrainedModelPredictor:
+    """Lazy load，回傳目前版本的推論包裝（registry 重載後自動換成新模型）。"""
+    return model_registry.current()
+
+
+# 單筆預測快取：訪客輸入多為離散值（CDR 0.5 級距、MMSE 整數），重複輸入很常見。
+# key = (模型版本, 正規化後的特徵向量)；模型重載時整個清空。PREDICTION_CACHE_SIZE=0 停用。
+prediction_cache = TTLCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "3600")),
+)
+model_registry.add_reload_listener(lambda version: prediction_cache.clear())
+
+
+def canonical_feature_key(feature_values: Sequence[float]) -> bytes:
     """
-    依據指定陽性標籤，回傳在 classes_ 中的索引。
-    單一職責：只負責找出正確的機率欄位索引。
+    正規化特徵向量作為快取 key。
+    - 轉 float32：模型比較前同樣轉 float32，float32 相同的輸入必得相同結果
+    - + 0.0 把 -0.0 併入 0.0
     """
-    classes_list = list(model.classes_)
-    if positive_label not in classes_list:
-        raise ValueError(f"Positive label {positive_label} not found in model classes: {classes_list}")
-    return classes_list.index(positive_label)
+    canonical = np.asarray(feature_values, dtype=np.float32).ravel() + np.float32(0.0)
+    return canonical.tobytes()
+
+
+def export_compiled_artifact(keep: int = 2) -> str:
+    """
+    由 .pgz 匯出攤平後的 .npy 格式並切換 CURRENT，回傳新版本目錄。
+    - 先通過與 sklearn 的一致性檢查才寫出
+    - 寫入新目錄 → 寫 CURRENT.tmp → os.replace，執行中的 worker 不會讀到半套檔案
+    - 只保留最新 keep 個版本目錄（已 mmap 舊檔的 worker 在 Linux 上不受刪除影響）
+    """
+    estimator = load_estimator_from_pickle()
+    compiled = compile_with_parity_check(estimator)
+    source_sha256 = model_source_sha256()
+
+    artifact_root = get_absolute_artifact_root()
+    artifact_name = f"{time.strftime('%Y%m%dT%H%M%S')}-{source_sha256[:8]}"
+    artifact_dir = os.path.join(artifact_root, artifact_name)
+    sample = parity_sample(compiled.n_features_in_ or int(compiled.feature.max()) + 1)
+    compiled.save(artifact_dir, extra_manifest={
+        "source": MODEL_RELATIVE_PATH,
+        "source_sha256": source_sha256,
+        "exported_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "max_parity_error": max_parity_error(compiled, estimator, sample),
+    })
+
+    pointer_path = os.path.join(artifact_root, ARTIFACT_POINTER_FILENAME)
+    with open(pointer_path + '.tmp', 'w', encoding='utf-8') as file:
+        file.write(artifact_name)
+    os.replace(pointer_path + '.tmp', pointer_path)
+
+    versions = sorted(
+        name for name in os.listdir(artifact_root)
+        if os.path.isdir(os.path.join(artifact_root, name)) and name != artifact_name
+    )
+    for stale_name in versions[:max(0, len(versions) - (keep - 1))]:
+        shutil.rmtree(os.path.join(artifact_root, stale_name), ignore_errors=True)
+    return artifact_dir
+
 
 def predict_with_probability(feature_values: Sequence[float]) -> Tuple[int, float]:
     """
     使用已載入的模型進行預測，並回傳 (predicted_label, positive_probability)。
     - 單一職責：只負責推論與機率抽取。
     - 符合 Early Return：遇到不符條件即拋錯，由呼叫端接住。
+    - 先查 prediction_cache；模型與版本同一次取得，重載期間不會把新結果記在舊版本下。
     """
-    model = load_trained_model()
-    input_array_2d = to_numpy_2d(feature_values)
-
-    predicted_label = model.predict(input_array_2d)[0]
-    positive_index = get_positive_class_index(model, POSITIVE_LABEL)
-    positive_probability = float(model.predict_proba(input_array_2d)[0][positive_index])
+    predictor, version = model_registry.current_with_version()
+    if not prediction_cache.enabled:
+        return predictor.predict_one(feature_values)
 
-    # 轉為 Python 原生型別，避免 JSON 序列化問題
-    if hasattr(predicted_label, "item"):
-        predicted_label = predicted_label.item()
+    cache_key = (version, canonical_feature_key(feature_values))
+    cached = prediction_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = predictor.predict_one(feature_values)
+    prediction_cache.set(cache_key, result)
+    return result
 
-    return int(predicted_label), positive_probability
 
+def predict_batch_with_probability(feature_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """整批推論：只呼叫一次 predict_proba，回傳 (predicted_labels, positive_probabilities)。"""
+    return load_trained_model().predict_batch(feature_matrix)
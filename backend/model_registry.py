@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# =========================
+# 模型登錄：可熱重載的「目前模型」
+# =========================
+# 取代 @lru_cache(maxsize=1)（一旦載入就無法失效）：
+# - current() 延遲載入，之後只是讀一個參考，不加鎖
+# - reload() 在鎖內載入新模型，成功後以單一賦值換上 (model, version)；
+#   進行中的請求繼續用舊模型完成，載入失敗則保留舊模型
+# - 每次換模型 version + 1，快取等可用 version 當 key 的一部分，或註冊 reload listener 清除
+# - fingerprint()（例如檔案 mtime/size）改變時，watcher 執行緒自動重載
+
+ReloadListener = Callable[[int], None]  # listener(new_version)
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        loader: Callable[[], Any],
+        fingerprint: Callable[[], Hashable],
+        poll_seconds: float = 0.0,
+    ) -> None:
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self.poll_seconds = poll_seconds
+
+        self._active: Optional[Tuple[Any, int]] = None
+        self._loaded_fingerprint: Hashable = None
+        self._load_lock = threading.Lock()
+        self._listeners: List[ReloadListener] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._loaded_at: Optional[float] = None
+        self._load_seconds: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._reloads = 0
+
+    # ---------- 讀取 ----------
+    def current(self) -> Any:
+        return self.current_with_version()[0]
+
+    def current_with_version(self) -> Tuple[Any, int]:
+        """同時取得模型與其 version（同一次讀取，不會拿到新模型配舊版號）。"""
+        active = self._active
+        if active is None:
+            self.reload(force=False)
+            active = self._active
+        return active
+
+    @property
+    def version(self) -> int:
+        active = self._active
+        return active[1] if active is not None else 0
+
+    # ---------- 重載 ----------
+    def add_reload_listener(self, listener: ReloadListener) -> None:
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = True) -> bool:
+        """
+        載入並原子替換模型，回傳是否真的換了。
+        force=False 時，已載入且 fingerprint 未變就不動作（供延遲載入與 watcher 使用）。
+        載入失敗會拋出例外，原本的模型保持不變。
+        """
+        with self._load_lock:
+            fingerprint = self._fingerprint()
+            if not force and self._active is not None and fingerprint == self._loaded_fingerprint:
+                return False
+
+            started = time.perf_counter()
+            try:
+                model = self._loader()
+            except Exception as ex:
+                self._last_error = repr(ex)
+                raise
+
+            version = self.version + 1
+            self._active = (model, version)
+            self._loaded_fingerprint = fingerprint
+            self._loaded_at = time.time()
+            self._load_seconds = time.perf_counter() - started
+            self._last_error = None
+            self._reloads += int(version > 1)
+
+        # 在 lock 外通知，避免 listener 反過來讀 registry 時死結
+        for listener in self._listeners:
+            listener(version)
+        return True
+
+    def start_watcher(self) -> None:
+        """poll_seconds > 0 時啟動背景執行緒，偵測到 fingerprint 變更就重載；尚未載入過則不主動載入。"""
+        if self._watcher is not None or self.poll_seconds <= 0:
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(self.poll_seconds)
+                if self._active is None:
+                    continue
+                try:
+                    if self._fingerprint() != self._loaded_fingerprint:
+                        self.reload(force=False)
+                except Exception:
+                    logging.exception("Model hot reload failed; keeping the current model")
+
+        self._watcher = threading.Thread(target=loop, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._active is not None,
+            "version": self.version,
+            "reloads": self._reloads,
+            "loaded_at": self._loaded_at,
+            "load_seconds": self._load_seconds,
+            "last_error": self._last_error,
+            "poll_seconds": self.poll_seconds,
+        }
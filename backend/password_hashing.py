@@ -0,0 +1,215 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Optional
+
+# =========================
+# 密碼雜湊
+# =========================
+# 取代 Patient.password 的明文比對：
+# - 演算法依序選用 argon2id（argon2-cffi）→ bcrypt → 標準庫 scrypt；前兩者為選用套件
+# - 驗證時依雜湊字串的完整格式辨識演算法；不符合任何格式的舊資料視為明文，以 hmac.compare_digest 比對
+#   （只看前綴的話，剛好以 $argon2 / $2b$ 開頭的明文密碼會被當成雜湊而永遠無法登入）
+# - needs_rehash()：明文、演算法或成本參數與目前設定不同時回傳 True，登入成功後即改存新雜湊
+# - 雜湊在有上限的 thread pool 執行：同時進行的雜湊數固定，不會把 Flask 請求執行緒的 CPU 吃光
+# 成本參數以環境變數設定，數值請用 bench_password_hashing.py 依每次登入的延遲預算挑選。
+
+SCHEMES = ("argon2", "bcrypt", "scrypt")
+
+_B64 = r"[A-Za-z0-9+/]+"
+_HASH_FORMATS = (
+    ("argon2", re.compile(rf"\$argon2(?:id|i|d)(?:\$v=\d+)?\$m=\d+,t=\d+,p=\d+\${_B64}\${_B64}")),
+    ("bcrypt", re.compile(r"\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}")),
+    ("scrypt", re.compile(rf"\$scrypt\$n=\d+,r=\d+,p=\d+\${_B64}\${_B64}")),
+)
+
+
+class PasswordHashingBusy(RuntimeError):
+    """等待雜湊的工作已達上限或逾時；呼叫端應回 503，而不是讓請求無限排隊。"""
+
+
+def _argon2_module() -> Any:
+    try:
+        import argon2  # 選用套件
+        return argon2
+    except ImportError:
+        return None
+
+
+def _bcrypt_module() -> Any:
+    try:
+        import bcrypt  # 選用套件
+        return bcrypt
+    except ImportError:
+        return None
+
+
+def available_schemes() -> list:
+    modules = {"argon2": _argon2_module(), "bcrypt": _bcrypt_module()}
+    return [scheme for scheme in SCHEMES if scheme == "scrypt" or modules[scheme] is not None]
+
+
+def scheme_of(stored: str) -> Optional[str]:
+    """由雜湊字串的完整格式判斷演算法；None 代表不是任何已知雜湊（舊的明文資料）。"""
+    for scheme, pattern in _HASH_FORMATS:
+        if pattern.fullmatch(stored):
+            return scheme
+    return None
+
+
+class PasswordHasher:
+    """
+    cost 參數（未給的用預設值）：
+    - argon2：time_cost、memory_cost（KiB）、parallelism
+    - bcrypt：rounds
+    - scrypt：n（2 的次方）、r、p
+    """
+
+    def __init__(self, scheme: str = "auto", **cost: int) -> None:
+        if scheme == "auto":
+            scheme = available_schemes()[0]
+        if scheme not in available_schemes():
+            raise ValueError(f"密碼雜湊演算法 {scheme} 不可用（可用：{', '.join(available_schemes())}）")
+        self.scheme = scheme
+        self.cost = cost
+        if scheme == "argon2":
+            argon2 = _argon2_module()
+            self._argon2 = argon2.PasswordHasher(
+                time_cost=cost.get("time_cost", 3),
+                memory_cost=cost.get("memory_cost", 65536),
+                parallelism=cost.get("parallelism", 1),
+            )
+        self._bcrypt_rounds = cost.get("rounds", 12)
+        self._scrypt_params = (cost.get("n", 2 ** 15), cost.get("r", 8), cost.get("p", 1))
+
+    # ---------- 雜湊 ----------
+    def hash(self, password: str) -> str:
+        if self.scheme == "argon2":
+            return self._argon2.hash(password)
+        if self.scheme == "bcrypt":
+            bcrypt = _bcrypt_module()
+            return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self._bcrypt_rounds)).decode("ascii")
+        n, r, p = self._scrypt_params
+        salt = secrets.token_bytes(16)
+        digest = _scrypt(password, salt, n, r, p)
+        return f"$scrypt$n={n},r={r},p={p}${_b64(salt)}${_b64(digest)}"
+
+    # ---------- 驗證 ----------
+    def verify(self, stored: Optional[str], password: str) -> bool:
+        if not stored or password is None:
+            return False
+        scheme = scheme_of(stored)
+        if scheme is None:
+            return hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+        if scheme == "argon2":
+            argon2 = _argon2_module()
+            if argon2 is None:
+                raise RuntimeError("資料庫中有 argon2 雜湊，但未安裝 argon2-cffi")
+            try:
+                return argon2.PasswordHasher().verify(stored, password)
+            except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+                return False
+        if scheme == "bcrypt":
+            bcrypt = _bcrypt_module()
+            if bcrypt is None:
+                raise RuntimeError("資料庫中有 bcrypt 雜湊，但未安裝 bcrypt")
+            return bcrypt.checkpw(password.encode("utf-8"), stored.encode("ascii"))
+
+        try:
+            _, _, params, salt, digest = stored.split("$")
+            n, r, p = (int(part.split("=")[1]) for part in params.split(","))
+            expected = _unb64(digest)
+            actual = _scrypt(password, _unb64(salt), n, r, p, dklen=len(expected))
+        except (ValueError, IndexError):
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, stored: Optional[str]) -> bool:
+        """明文、演算法不同或成本參數與目前設定不同時需要改存。"""
+        if not stored or scheme_of(stored) != self.scheme:
+            return True
+        if self.scheme == "argon2":
+            return self._argon2.check_needs_rehash(stored)
+        if self.scheme == "bcrypt":
+            return int(stored.split("$")[2]) != self._bcrypt_rounds
+        n, r, p = self._scrypt_params
+        return stored.split("$")[2] != f"n={n},r={r},p={p}"
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, dklen: int = 32) -> bytes:
+    # maxmem 需涵蓋 128 * n * r bytes，否則 OpenSSL 會拒絕較高的 n
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=dklen)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+
+def load_hasher_from_env(environ: Optional[Dict[str, str]] = None) -> PasswordHasher:
+    environ = os.environ if environ is None else environ
+    cost_env = {
+        "time_cost": "PASSWORD_ARGON2_TIME_COST",
+        "memory_cost": "PASSWORD_ARGON2_MEMORY_KIB",
+        "parallelism": "PASSWORD_ARGON2_PARALLELISM",
+        "rounds": "PASSWORD_BCRYPT_ROUNDS",
+        "n": "PASSWORD_SCRYPT_N",
+        "r": "PASSWORD_SCRYPT_R",
+        "p": "PASSWORD_SCRYPT_P",
+    }
+    cost = {name: int(environ[key]) for name, key in cost_env.items() if environ.get(key)}
+    return PasswordHasher(environ.get("PASSWORD_HASH_SCHEME", "auto"), **cost)
+
+
+class PasswordHashingPool:
+    """
+    固定 worker 數的雜湊執行池；排隊中的工作超過 max_pending 即拋 PasswordHashingBusy。
+    argon2 / bcrypt / scrypt 計算時都會釋放 GIL，worker 數即同時佔用的 CPU 核心上限。
+    """
+
+    def __init__(self, hasher: PasswordHasher, workers: int = 2, max_pending: int = 32) -> None:
+        self.hasher = hasher
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._dummy_hash: Optional[str] = None
+        self._dummy_lock = threading.Lock()
+
+    def _submit(self, fn: Any, *args: Any, timeout: Optional[float]) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy("密碼雜湊佇列已滿")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # 工作仍在 worker 中執行完（並佔著名額），只是這個請求不再等它
+            raise PasswordHashingBusy("密碼雜湊逾時") from None
+
+    def verify(self, stored: Optional[str], password: str, timeout: Optional[float] = None) -> bool:
+        return self._submit(self.hasher.verify, stored, password, timeout=timeout)
+
+    def hash(self, password: str, timeout: Optional[float] = None) -> str:
+        return self._submit(self.hasher.hash, password, timeout=timeout)
+
+    def dummy_hash(self, timeout: Optional[float] = None) -> str:
+        """
+        隨機密碼的雜湊（查無帳號時驗證用），第一次用到才計算，之後共用同一個。
+        - 以 lock 保護：同時到達的請求只算一次；計算逾時（PasswordHashingBusy）不留結果，下一個請求重算
+        """
+        if self._dummy_hash is None:
+            with self._dummy_lock:
+                if self._dummy_hash is None:
+                    self._dummy_hash = self.hash(os.urandom(16).hex(), timeout=timeout)
+        return self._dummy_hash
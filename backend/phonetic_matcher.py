@@ -0,0 +1,176 @@
+import itertools
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# =========================
+# 同音／近音字的模糊比對（拼音）
+# =========================
+# Whisper 以 beam_size=1、無 prompt 辨識長者口語時，常把詞辨識成同音字（例如「大象」→「大像」），
+# Aho-Corasick 精確比對因此漏掉有效答案。補一段拼音比對：
+# - 詞庫每個表面詞轉成拼音音節（含多音字的各種讀法），做正規化（捲舌 zh/ch/sh → z/c/s、前後鼻音、n/l 不分，常見於台灣口音）
+# - 逐字稿只掃「精確命中之間的空白段」，對每個起點、每種詞長取一個視窗
+# - 索引：完整拼音 → 詞（同音），以及「遮住一個音節」的拼音 → 詞（近音）；每個視窗只需 O(音節數) 次 dict 查詢，
+#   與詞庫大小無關
+# - 每個命中帶信心值：原字 1.0、同音 0.9、正規化後同音 0.85，近音再依不同音節的字母編輯距離遞減；低於門檻者捨棄
+# 一般口語也常湊出同音詞（「媽媽以前」→ 螞蟻、「四季都有」→ 雉雞），近音命中只另外回報供人工複核，不計入分數。
+# 預設停用；SPEECH_FUZZY_MATCH=1 且安裝 pypinyin（選用套件）時才啟用。
+
+FUZZY_MATCH_ENABLED = os.getenv("SPEECH_FUZZY_MATCH", "0") == "1"
+FUZZY_MIN_CONFIDENCE = float(os.getenv("SPEECH_FUZZY_MIN_CONFIDENCE", "0.8"))
+MIN_FUZZY_SYLLABLES = 2          # 單音節詞（熊、牛、蟬…）同音字太多，不做模糊比對
+MIN_NEAR_SYLLABLES = 3           # 兩音節詞只接受同音；換掉一個音節就是另一個詞的機率太高
+MAX_READINGS_PER_TERM = 8        # 多音字展開的讀法上限
+
+HOMOPHONE_CONFIDENCE = 0.9        # 無聲調拼音完全相同
+NORMALIZED_CONFIDENCE = 0.85      # 正規化後拼音相同；也是近音信心值的基準
+
+# 依序套用；韻母規則只作用於音節結尾
+_INITIAL_RULES = (("zh", "z"), ("ch", "c"), ("sh", "s"), ("n", "l"))
+_FINAL_RULES = (("ing", "in"), ("eng", "en"), ("ang", "an"))
+_MASK = "*"
+
+
+class PinyinReader:
+    """包裝 pypinyin：逐字稿取單一（依上下文）讀法，詞庫詞展開多音字的所有讀法。"""
+
+    def __init__(self) -> None:
+        from pypinyin import Style, lazy_pinyin, pinyin  # 選用套件
+        self._style = Style.NORMAL
+        self._lazy_pinyin = lazy_pinyin
+        self._pinyin = pinyin
+
+    def syllables(self, text: str) -> List[str]:
+        """每個字一個音節；非漢字為空字串，長度與輸入相同。"""
+        syllables = self._lazy_pinyin(text, style=self._style, errors=lambda chars: [""] * len(chars))
+        if len(syllables) != len(text):
+            # 罕見情況（詞組拆分與字數對不上）退回逐字轉換，確保位置對齊
+            syllables = [self._lazy_pinyin(char, style=self._style, errors=lambda chars: [""])[0] for char in text]
+        return syllables
+
+    def readings(self, term: str) -> List[Tuple[str, ...]]:
+        """詞的所有讀法（多音字展開，最多 MAX_READINGS_PER_TERM 種）；含非漢字時回傳空串列。"""
+        options = self._pinyin(term, style=self._style, heteronym=True, errors=lambda chars: [[""]] * len(chars))
+        if len(options) != len(term) or not all(all(option) for option in options):
+            return []
+        return list(itertools.islice(itertools.product(*options), MAX_READINGS_PER_TERM))
+
+
+def load_pinyin_reader() -> Optional[PinyinReader]:
+    try:
+        return PinyinReader()
+    except ImportError:
+        return None
+
+
+def normalize_syllable(syllable: str) -> str:
+    for source, target in _INITIAL_RULES:
+        if syllable.startswith(source):
+            syllable = target + syllable[len(source):]
+            break
+    for source, target in _FINAL_RULES:
+        if syllable.endswith(source):
+            return syllable[: -len(source)] + target
+    return syllable
+
+
+def edit_distance(a: str, b: str) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class PhoneticMatch(NamedTuple):
+    start: int
+    end: int
+    surface: str        # 對應到的詞庫表面詞（不是逐字稿中的字）
+    confidence: float
+
+
+class PhoneticMatcher:
+    def __init__(self, terms: Iterable[str], reader: PinyinReader, min_confidence: float = FUZZY_MIN_CONFIDENCE) -> None:
+        self.reader = reader
+        self.min_confidence = min_confidence
+        self._plain: Dict[Tuple[str, ...], str] = {}        # 無聲調拼音 → 表面詞
+        self._normalized: Dict[Tuple[str, ...], str] = {}   # 正規化拼音 → 表面詞
+        self._masked: Dict[Tuple[str, ...], List[Tuple[Tuple[str, ...], str]]] = {}  # 遮一個音節 → [(正規化拼音, 表面詞)]
+        self._lengths = set()
+        for term in sorted(terms):  # 排序讓拼音相同的詞固定對到同一個
+            if len(term) < MIN_FUZZY_SYLLABLES:
+                continue
+            for reading in reader.readings(term):  # 含非漢字（如「A菜」）時沒有讀法
+                normalized = tuple(normalize_syllable(syllable) for syllable in reading)
+                self._plain.setdefault(reading, term)
+                self._normalized.setdefault(normalized, term)
+                self._lengths.add(len(reading))
+                if len(reading) >= MIN_NEAR_SYLLABLES:
+                    for masked in self._masked_keys(normalized):
+                        self._masked.setdefault(masked, []).append((normalized, term))
+
+    @staticmethod
+    def _masked_keys(normalized: Tuple[str, ...]) -> List[Tuple[str, ...]]:
+        return [normalized[:i] + (_MASK,) + normalized[i + 1:] for i in range(len(normalized))]
+
+    def __len__(self) -> int:
+        return len(set(self._normalized.values()))
+
+    def _best_for_window(self, syllables: Tuple[str, ...], normalized: Tuple[str, ...]) -> Optional[Tuple[str, float]]:
+        term = self._plain.get(syllables)
+        if term is not None:
+            return term, HOMOPHONE_CONFIDENCE
+        term = self._normalized.get(normalized)
+        if term is not None:
+            return term, NORMALIZED_CONFIDENCE
+        if len(normalized) < MIN_NEAR_SYLLABLES:
+            return None
+
+        # 只差一個音節：信心值依該音節的字母編輯距離占整個拼音長度的比例遞減
+        best: Optional[Tuple[str, float]] = None
+        window_letters = sum(map(len, normalized))
+        for i, masked in enumerate(self._masked_keys(normalized)):
+            for candidate, candidate_term in self._masked.get(masked, ()):
+                distance = edit_distance(normalized[i], candidate[i])
+                letters = max(window_letters, sum(map(len, candidate)))
+                confidence = NORMALIZED_CONFIDENCE * (1 - distance / letters)
+                if confidence >= self.min_confidence and (best is None or confidence > best[1]):
+                    best = (candidate_term, confidence)
+        return best
+
+    def find_all(self, text: str, protected: Sequence[Tuple[int, int]] = ()) -> List[PhoneticMatch]:
+        """
+        不重疊的近音命中，依出現順序。
+        - protected：不可被近音改寫的 (start, end)（擋字詞、多字精確命中）；與其重疊（含整個包住）的候選一律捨棄
+        - 候選以「信心值高 → 詞長 → 位置靠左」的順序挑選，重疊者捨棄
+        """
+        if not self._lengths or not text:
+            return []
+        syllables = self.reader.syllables(text)
+        normalized = [normalize_syllable(syllable) for syllable in syllables]
+        candidates = []
+        for start in range(len(text)):
+            if not syllables[start]:
+                continue
+            for length in self._lengths:
+                window = tuple(syllables[start:start + length])
+                if len(window) < length or not all(window):
+                    continue
+                end = start + length
+                if any(span_start < end and start < span_end for span_start, span_end in protected):
+                    continue
+                best = self._best_for_window(window, tuple(normalized[start:end]))
+                if best is not None:
+                    candidates.append(PhoneticMatch(start, end, best[0], round(best[1], 3)))
+
+        selected: List[PhoneticMatch] = []
+        taken = [False] * len(text)
+        for match in sorted(candidates, key=lambda m: (-m.confidence, -(m.end - m.start), m.start)):
+            if any(taken[match.start:match.end]):
+                continue
+            taken[match.start:match.end] = [True] * (match.end - match.start)
+            selected.append(match)
+        return sorted(selected, key=lambda m: m.start)
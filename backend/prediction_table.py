@@ -0,0 +1,266 @@
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# =========================
+# 離散特徵網格的預先計算查表
+# =========================
+# 訪客流程的 CDR_SUM / CDR_GLOB / CDR_MEMORY / MMSE 都只有少數合法值（見 guest_routes 的驗證），
+# MEMORY_DECLINE 為 0/1。離線把森林在這些值的完整網格上算一遍，其餘連續欄位（Trail A/B 秒數、
+# 類別詞數）分桶，結果存成緊湊的 NumPy 表；/predict 在查表模式下以陣列索引回答。
+# - 離散欄位必須完全命中網格值，否則回傳 None 交回模型推論（不做近似）
+# - 連續欄位的桶界取自森林本身的分岔門檻：門檻數不超過桶數時該欄位完全無損
+# - 連續欄位只在 CONTINUOUS_DOMAINS 的範圍內查表；超出範圍（負值、詞數 > 30、秒數過大）同樣交回模型推論，
+#   抽樣量測的誤差因此涵蓋所有會由查表回答的輸入
+# - 近似誤差以隨機抽樣量測，寫進 manifest；載入端超過上限（或沒有量測紀錄）就不啟用查表
+
+TABLE_FORMAT_VERSION = 2  # 2：連續欄位記錄 domain
+MANIFEST_FILENAME = "manifest.json"
+PROBABILITY_SCALE = 65535  # 機率以 uint16 定點儲存，量化誤差 < 1e-5
+
+# 與 app.REQUIRED_FIELDS_IN_ORDER 相同順序（app 啟用查表時會比對）
+TABLE_FIELD_ORDER: List[str] = [
+    "CDR_SUM",
+    "MMSE",
+    "MEMORY_DECLINE",
+    "VEGETABLE_COUNT",
+    "ANIMAL_COUNT",
+    "TRAIL_B_SECONDS",
+    "TRAIL_A_SECONDS",
+    "CDR_GLOB",
+    "CDR_MEMORY",
+]
+
+_CDR_SCORES = [0.0, 0.5, 1.0, 2.0, 3.0]
+DISCRETE_DOMAINS: Dict[str, List[float]] = {
+    "CDR_SUM": [step / 2 for step in range(37) if step / 2 not in (16.5, 17.5)],
+    "MMSE": [float(score) for score in range(31)],
+    "MEMORY_DECLINE": [0.0, 1.0],
+    "CDR_GLOB": _CDR_SCORES,
+    "CDR_MEMORY": _CDR_SCORES,
+}
+# 連續欄位的查表範圍（含兩端）；超出範圍的輸入不查表
+CONTINUOUS_DOMAINS: Dict[str, Tuple[float, float]] = {
+    "VEGETABLE_COUNT": (0.0, 30.0),
+    "ANIMAL_COUNT": (0.0, 30.0),
+    "TRAIL_A_SECONDS": (0.0, 300.0),
+    "TRAIL_B_SECONDS": (0.0, 600.0),
+}
+INTEGER_FIELDS = {"VEGETABLE_COUNT", "ANIMAL_COUNT"}
+DEFAULT_BUCKETS = 4
+
+
+class TableAxis:
+    """
+    表格的一個維度。
+    - edges 為 None：離散欄位，輸入必須等於 values 其中之一
+    - edges 不為 None：連續欄位，第 i 桶為 (edges[i-1], edges[i]]（與森林 x <= t 走左一致），
+      values 為各桶的代表值（建表時送進模型的值）；domain (low, high) 之外不在網格內
+    """
+
+    def __init__(
+        self,
+        name: str,
+        values: Sequence[float],
+        edges: Optional[Sequence[float]] = None,
+        domain: Optional[Sequence[float]] = None,
+    ) -> None:
+        self.name = name
+        self.values = np.asarray(values, dtype=float)
+        self.edges = None if edges is None else np.asarray(edges, dtype=float)
+        self.domain = None if domain is None else (float(domain[0]), float(domain[1]))
+        if self.edges is not None and self.domain is None:
+            raise ValueError(f"連續欄位 {name} 缺少 domain")
+
+    def indices(self, column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """回傳 (索引, 是否在網格內)。"""
+        if self.edges is not None:
+            low, high = self.domain
+            in_domain = np.isfinite(column) & (column >= low) & (column <= high)
+            return np.searchsorted(self.edges, column, side="left"), in_domain
+        positions = np.minimum(np.searchsorted(self.values, column), len(self.values) - 1)
+        return positions, self.values[positions] == column
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "values": self.values.tolist(),
+            "edges": None if self.edges is None else self.edges.tolist(),
+            "domain": None if self.domain is None else list(self.domain),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TableAxis":
+        return cls(data["name"], data["values"], data["edges"], data.get("domain"))
+
+
+def bucket_axis(name: str, thresholds: np.ndarray, low: float, high: float, buckets: int) -> TableAxis:
+    """
+    以森林的分岔門檻決定桶界：門檻不多於 buckets-1 個時全部採用，否則等距挑選其中幾個。
+    - 門檻等於 low 時保留為桶界（x == low 自成一桶，與森林 x <= t 走左一致）
+    - 門檻 >= high 不影響範圍內的輸入，不需要
+    """
+    inside = thresholds[(thresholds >= low) & (thresholds < high)]
+    if len(inside) > buckets - 1:
+        picks = np.round(np.linspace(0, len(inside) - 1, buckets + 1)[1:-1]).astype(int)
+        inside = np.unique(inside[picks])
+    bounds = np.concatenate([[low], inside, [high]])
+    return TableAxis(name, (bounds[:-1] + bounds[1:]) / 2, edges=inside, domain=(low, high))
+
+
+class PredictionTable:
+    def __init__(
+        self,
+        axes: List[TableAxis],
+        probabilities: np.ndarray,
+        labels: np.ndarray,
+        classes: np.ndarray,
+        manifest: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.axes = axes
+        self.shape = tuple(len(axis.values) for axis in axes)
+        self.probabilities = probabilities  # uint16，扁平化（C order）
+        self.labels = labels                # uint8，classes 的索引
+        self.classes = np.asarray(classes)
+        self.manifest = manifest or {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def field_order(self) -> List[str]:
+        return [axis.name for axis in self.axes]
+
+    def lookup_batch(self, feature_matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """回傳 (labels, positive_probabilities, 是否命中)；未命中的列數值無意義。"""
+        matrix = np.asarray(feature_matrix, dtype=float).reshape(-1, len(self.axes))
+        per_axis = [axis.indices(matrix[:, column]) for column, axis in enumerate(self.axes)]
+        in_grid = np.logical_and.reduce([ok for _, ok in per_axis])
+        flat = np.ravel_multi_index(tuple(index for index, _ in per_axis), self.shape, mode="clip")
+        labels = self.classes.take(self.labels[flat])
+        probabilities = self.probabilities[flat].astype(float) / PROBABILITY_SCALE
+        return labels, probabilities, in_grid
+
+    def lookup(self, feature_values: Sequence[float]) -> Optional[Tuple[int, float]]:
+        """單筆查表；不在網格內回傳 None（呼叫端改走模型）。"""
+        labels, probabilities, in_grid = self.lookup_batch(np.asarray(feature_values, dtype=float))
+        if not in_grid[0]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return int(labels[0]), float(probabilities[0])
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "cells": int(np.prod(self.shape)),
+            "bytes": int(self.probabilities.nbytes + self.labels.nbytes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "error": self.manifest.get("error"),
+        }
+
+    def error_bound_violation(self, max_abs_error: float, max_label_mismatch: float) -> Optional[str]:
+        """manifest 的抽樣誤差超過上限時回傳原因；沒有量測紀錄視為超過。"""
+        error = self.manifest.get("error")
+        if not error:
+            return "manifest 沒有誤差量測紀錄"
+        if error["max_abs_error"] > max_abs_error:
+            return f"max_abs_error={error['max_abs_error']:.4g} > {max_abs_error:g}"
+        if error["label_mismatch_rate"] > max_label_mismatch:
+            return f"label_mismatch_rate={error['label_mismatch_rate']:.4g} > {max_label_mismatch:g}"
+        return None
+
+    # ---------- 儲存 / 載入 ----------
+    def save(self, directory: str) -> None:
+        """寫到暫存目錄後整個換上；載入端若剛好遇到切換空窗，會視為沒有表而改走模型。"""
+        staging = f"{directory}.tmp-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, "probabilities.npy"), self.probabilities)
+        np.save(os.path.join(staging, "labels.npy"), self.labels)
+        manifest = {
+            **self.manifest,
+            "format_version": TABLE_FORMAT_VERSION,
+            "axes": [axis.to_dict() for axis in self.axes],
+            "classes": self.classes.tolist(),
+        }
+        with open(os.path.join(staging, MANIFEST_FILENAME), "w", encoding="utf-8") as file:
+            json.dump(manifest, file, ensure_ascii=False, indent=2)
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(staging, directory)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "PredictionTable":
+        with open(os.path.join(directory, MANIFEST_FILENAME), "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        if manifest.get("format_version") != TABLE_FORMAT_VERSION:
+            raise ValueError(f"不支援的查表格式版本：{manifest.get('format_version')}")
+        mmap_mode = "r" if mmap else None
+        return cls(
+            axes=[TableAxis.from_dict(axis) for axis in manifest["axes"]],
+            probabilities=np.load(os.path.join(directory, "probabilities.npy"), mmap_mode=mmap_mode),
+            labels=np.load(os.path.join(directory, "labels.npy"), mmap_mode=mmap_mode),
+            classes=np.asarray(manifest["classes"]),
+            manifest=manifest,
+        )
+
+
+def build_table_axes(forest: Any, buckets: Optional[Dict[str, int]] = None) -> List[TableAxis]:
+    """forest 為 CompiledForest（取分岔門檻用）；buckets 可逐欄覆寫桶數。"""
+    buckets = buckets or {}
+    axes = []
+    for feature_index, name in enumerate(TABLE_FIELD_ORDER):
+        if name in DISCRETE_DOMAINS:
+            axes.append(TableAxis(name, DISCRETE_DOMAINS[name]))
+            continue
+        low, high = CONTINUOUS_DOMAINS[name]
+        axes.append(bucket_axis(
+            name, forest.split_thresholds(feature_index), low, high, buckets.get(name, DEFAULT_BUCKETS)
+        ))
+    return axes
+
+
+def build_prediction_table(predictor: Any, axes: List[TableAxis], chunk_rows: int = 65536) -> PredictionTable:
+    """以 predictor.predict_batch 逐塊算完整網格；predictor 為 model.TrainedModelPredictor。"""
+    shape = tuple(len(axis.values) for axis in axes)
+    total = int(np.prod(shape))
+    probabilities = np.empty(total, dtype=np.uint16)
+    labels = np.empty(total, dtype=np.uint8)
+    for start in range(0, total, chunk_rows):
+        flat = np.arange(start, min(total, start + chunk_rows))
+        grid_indices = np.unravel_index(flat, shape)
+        matrix = np.column_stack([axis.values[index] for axis, index in zip(axes, grid_indices)])
+        predicted_labels, positive_probabilities = predictor.predict_batch(matrix)
+        probabilities[flat] = np.round(positive_probabilities * PROBABILITY_SCALE).astype(np.uint16)
+        labels[flat] = np.searchsorted(predictor.classes, predicted_labels).astype(np.uint8)
+    return PredictionTable(axes, probabilities, labels, predictor.classes)
+
+
+def sample_feature_rows(rows: int, seed: int = 0) -> np.ndarray:
+    """在合法輸入空間隨機抽樣：離散欄位取合法值，連續欄位在範圍內均勻抽（詞數取整數）。"""
+    rng = np.random.default_rng(seed)
+    columns = []
+    for name in TABLE_FIELD_ORDER:
+        if name in DISCRETE_DOMAINS:
+            columns.append(rng.choice(DISCRETE_DOMAINS[name], size=rows))
+            continue
+        low, high = CONTINUOUS_DOMAINS[name]
+        column = rng.uniform(low, high, size=rows)
+        columns.append(np.round(column) if name in INTEGER_FIELDS else column)
+    return np.column_stack(columns)
+
+
+def measure_table_error(table: PredictionTable, predictor: Any, rows: int = 20000, seed: int = 0) -> Dict[str, Any]:
+    """抽樣比較查表與模型：最大 / 平均機率誤差與標籤不一致比例。"""
+    samples = sample_feature_rows(rows, seed)
+    table_labels, table_probabilities, _ = table.lookup_batch(samples)
+    model_labels, model_probabilities = predictor.predict_batch(samples)
+    errors = np.abs(table_probabilities - model_probabilities)
+    return {
+        "samples": rows,
+        "max_abs_error": float(errors.max()),
+        "mean_abs_error": float(errors.mean()),
+        "label_mismatch_rate": float(np.mean(table_labels != model_labels)),
+    }
@@ -0,0 +1,136 @@
+import threading
+from typing import Any, Dict, Optional
+
+from category_lexicon import Category
+
+# =========================
+# 上傳期間的即時計分
+# =========================
+# 原本要等 finalize 把所有 chunk 文字串起來才比對，finalize 延遲隨錄音長度增加，前端也無法顯示即時數量。
+# 改為每個 chunk 的文字一到就比對，維護每段錄音「已答出的標準詞」集合：
+# - chunk 依索引排序後才送入（非同步轉錄可能亂序完成），缺號時先暫存後面的 chunk
+# - 跨 chunk 邊界的詞：尾端 (最長詞長 - 1) 個字內開始的命中（含擋字詞）先不確定，保留到下一段文字接上再判斷；
+#   結果與 finalize 時對整段文字做最左最長比對完全相同
+# - 拼音近音比對只在「兩個 anchor 精確命中之間的空白段」進行；空白段在下一個 anchor 確定時才完整，屆時再比對，
+#   結果同樣與整段比對（Category.concept_scores）一致；近音命中只進 fuzzy，不計入 total
+# - finalize 只需 finish() 收尾剩下的一小段尾巴
+
+
+class RunningScore:
+    def __init__(self, category: Category) -> None:
+        self.category = category
+        self._lookahead = max(0, category.max_match_length - 1)
+        self._lock = threading.Lock()
+        self._buffer = ""              # 尚未確定的文字（上一個確定命中之後）
+        self._gap = ""                 # 已確定、尚未遇到下一個 anchor 的空白段
+        self._consumed_chars = 0       # sync_text 模式：已送入的字數
+        self._next_index = 0           # feed_chunk 模式：下一個要送入的 chunk 索引
+        self._pending: Dict[int, str] = {}
+        self._concepts: Dict[str, int] = {}    # 精確答出的標準詞（依答出順序）
+        self._fuzzy: Dict[str, float] = {}     # 近音命中的標準詞 → 最高信心值
+
+    # ---------- 送入文字 ----------
+    def feed_chunk(self, chunk_index: int, text: str) -> None:
+        """逐 chunk 模式：依索引排序後送入；重複的索引（例如重送）忽略。"""
+        with self._lock:
+            if chunk_index < self._next_index or chunk_index in self._pending:
+                return
+            self._pending[chunk_index] = text
+            while self._next_index in self._pending:
+                self._append(self._pending.pop(self._next_index))
+                self._next_index += 1
+
+    def sync_text(self, full_text: str) -> None:
+        """串流模式：傳入目前已提交的完整文字（只會變長），只比對新增的部分。"""
+        with self._lock:
+            if len(full_text) > self._consumed_chars:
+                self._append(full_text[self._consumed_chars:])
+
+    def _append(self, text: str) -> None:
+        self._buffer += text
+        self._consumed_chars += len(text)
+        self._commit(final=False)
+
+    def _commit(self, final: bool) -> None:
+        # start 落在 safe_before 之前的命中，之後接上的文字不可能改變它（更長或更左的詞都放不下）
+        safe_before = len(self._buffer) - self._lookahead
+        cut = 0
+        gap_from = 0
+        for hit in self.category.find_matches(self._buffer):
+            if not final and hit.start >= safe_before:
+                break
+            cut = hit.end
+            if hit.concept:
+                self._concepts.setdefault(hit.concept, 1)
+            if not self.category.is_anchor(hit):
+                continue  # 單字命中與擋字詞的文字留在空白段裡，近音比對時一起看
+            self._gap += self._buffer[gap_from:hit.start]
+            self._close_gap()
+            gap_from = hit.end
+        keep_from = len(self._buffer) if final else max(cut, safe_before, 0)
+        self._gap += self._buffer[gap_from:keep_from]
+        self._buffer = self._buffer[keep_from:]
+        if final:
+            self._close_gap()
+
+    def _close_gap(self) -> None:
+        if self.category.phonetic is not None:
+            for hit in self.category.gap_hits(self._gap):
+                if hit.confidence < 1.0:
+                    self._fuzzy[hit.concept] = max(self._fuzzy.get(hit.concept, 0.0), hit.confidence)
+        self._gap = ""
+
+    # ---------- 讀取 ----------
+    def is_complete(self, chunk_count: int) -> bool:
+        """逐 chunk 模式下，0..chunk_count-1 是否都已送入（沒有缺號）。"""
+        with self._lock:
+            return self._next_index >= chunk_count and not self._pending
+
+    def finish(self) -> Dict[str, Any]:
+        """收尾：確定尾巴中的命中後回傳結果。之後仍可再送入文字。"""
+        with self._lock:
+            self._commit(final=True)
+            return self._snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """目前已確定的結果（尾巴中尚未確定的命中不計入）。"""
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.category.name,
+            "total": len(self._concepts),
+            "detail": dict(self._concepts),
+            "fuzzy": {concept: value for concept, value in self._fuzzy.items() if concept not in self._concepts},
+            "chunks_scored": self._next_index,
+            "chunks_waiting": len(self._pending),
+        }
+
+
+class RunningScoreRegistry:
+    """recording_id → RunningScore；finalize 時 discard 釋放。"""
+
+    def __init__(self) -> None:
+        self._scores: Dict[str, RunningScore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, recording_id: str, category: Category) -> RunningScore:
+        with self._lock:
+            score = self._scores.get(recording_id)
+            if score is None or score.category is not category:
+                score = RunningScore(category)
+                self._scores[recording_id] = score
+            return score
+
+    def find(self, recording_id: str) -> Optional[RunningScore]:
+        with self._lock:
+            return self._scores.get(recording_id)
+
+    def discard(self, recording_id: str) -> None:
+        with self._lock:
+            self._scores.pop(recording_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._scores)
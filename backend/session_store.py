@@ -0,0 +1,692 @@
+import abc
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# =========================
+# 錄音暫存：取代模組層級的 audio_chunks / partial_text_store dict
+# =========================
+# 原本只有 finalize 才會清除，放棄作答的錄音會讓常駐 server 記憶體無限成長。
+# 本模組提供：
+#   - 單一錄音 bytes 上限（超過即拒收該 chunk）
+#   - 全域記憶體預算（超過時先把冷錄音搬到磁碟，無法搬就淘汰最久未使用者）
+#   - 閒置 TTL：背景 sweeper 定期清除久未上傳的錄音
+#   - 淘汰/搬移次數等指標，以及淘汰事件通知（讓解碼器、串流 session 一併釋放）
+# 搬到磁碟的錄音以 mmap 讀回，不再佔用 heap。
+#
+# 後端可抽換（SessionStore 介面）：
+#   - memory：RecordingSessionStore，單一行程內
+#   - sqlite：SQLiteSessionStore，同機多個 gunicorn worker 共用一個檔案
+#   - redis ：RedisSessionStore，跨機器的多個 replica 共用
+
+EvictionListener = Callable[[str, str], None]  # (recording_id, reason)
+
+
+class RecordingTooLarge(ValueError):
+    """單一錄音的 bytes 超過上限。"""
+
+
+class _SpilledChunks:
+    """
+    已搬到磁碟的 chunk：單一檔案，保留 (offset, length) 索引，讀取時以 mmap 切片。
+    - 同一索引重送時依索引覆寫：放得下就寫回原位置，否則附加到檔尾（舊位置成為不再讀取的空間）
+    - size 只計目前有效的 bytes
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.offsets: Dict[int, tuple] = {}
+        self.size = 0
+        self._end = 0  # 檔案長度（下一次附加的 offset）
+
+    def length(self, chunk_index: int) -> int:
+        previous = self.offsets.get(chunk_index)
+        return previous[1] if previous else 0
+
+    def put(self, chunk_index: int, audio_bytes: bytes) -> None:
+        previous = self.offsets.get(chunk_index)
+        if previous is not None and len(audio_bytes) <= previous[1]:
+            with open(self.path, "r+b") as file:
+                file.seek(previous[0])
+                file.write(audio_bytes)
+            offset = previous[0]
+        else:
+            with open(self.path, "ab") as file:
+                file.write(audio_bytes)
+            offset = self._end
+            self._end += len(audio_bytes)
+        self.size += len(audio_bytes) - (previous[1] if previous else 0)
+        self.offsets[chunk_index] = (offset, len(audio_bytes))
+
+    def read_all(self) -> Dict[int, bytes]:
+        if not self._end:
+            return {index: b"" for index in self.offsets}
+        with open(self.path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return {index: mapped[offset:offset + length] for index, (offset, length) in self.offsets.items()}
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _Recording:
+    def __init__(self) -> None:
+        self.chunks: Dict[int, bytes] = {}
+        self.texts: Dict[int, str] = {}
+        self.memory_bytes = 0
+        self.spilled: Optional[_SpilledChunks] = None
+        self.last_access = time.monotonic()
+
+    @property
+    def total_bytes(self) -> int:
+        return self.memory_bytes + (self.spilled.size if self.spilled else 0)
+
+
+class SessionStore(abc.ABC):
+    """
+    錄音暫存介面。chunk bytes 與已轉錄文字皆以 (recording_id, chunk_index) 定位。
+    - 實作須執行緒安全；跨行程的實作由後端本身（SQLite / Redis）保證一致性。
+    - 抽象類別：漏實作任何方法的後端在建立時就失敗，而不是第一次呼叫時。
+    """
+
+    @abc.abstractmethod
+    def put_chunk(self, recording_id: str, chunk_index: int, audio_bytes: bytes) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_chunks(self, recording_id: str) -> Dict[int, bytes]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def put_text(self, recording_id: str, chunk_index: int, text: str) -> None:
+        """
+        寫入已轉錄文字。文字總是在該 chunk 的 bytes 之後寫入，因此不會建立新錄音：
+        錄音已被 discard 或淘汰時（例如 finalize 後才完成的背景轉錄）直接忽略。
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_texts(self, recording_id: str) -> Dict[int, str]:
+        raise NotImplementedError
+
+    def get_text(self, recording_id: str, chunk_index: int) -> str:
+        return self.get_texts(recording_id).get(chunk_index, "")
+
+    @abc.abstractmethod
+    def discard(self, recording_id: str) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def __contains__(self, recording_id: str) -> bool:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_eviction_listener(self, listener: EvictionListener) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def start_sweeper(self) -> None:
+        raise NotImplementedError
+
+
+class _LocalEvictionTracker:
+    """
+    共享後端的淘汰發生在其他行程或伺服器端（例如 Redis key 過期）。
+    本行程記住自己碰過的 recording_id，sweep 時發現已不存在就通知 listener，
+    讓本行程的解碼器、串流 session 一併釋放。
+    """
+
+    def __init__(self, sweep_interval_seconds: float) -> None:
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._known: set = set()
+        self._listeners: List[EvictionListener] = []
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def remember(self, recording_id: str) -> None:
+        with self._lock:
+            self._known.add(recording_id)
+
+    def forget(self, recording_id: str) -> None:
+        with self._lock:
+            self._known.discard(recording_id)
+
+    def add_listener(self, listener: EvictionListener) -> None:
+        self._listeners.append(listener)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._known)
+
+    def check(self, exists: Callable[[str], bool]) -> None:
+        with self._lock:
+            known = list(self._known)
+        for recording_id in known:
+            if exists(recording_id):
+                continue
+            self.forget(recording_id)
+            for listener in self._listeners:
+                listener(recording_id, "ttl")
+
+    def start(self, sweep: Callable[[], None]) -> None:
+        if self._sweeper is not None:
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(self.sweep_interval_seconds)
+                try:
+                    sweep()
+                except Exception:
+                    logging.exception("Session store sweep failed")
+
+        self._sweeper = threading.Thread(target=loop, name="session-store-sweeper", daemon=True)
+        self._sweeper.start()
+
+
+class RecordingSessionStore(SessionStore):
+    """
+    記憶體內的錄音暫存（單一行程）。所有時間以 time.monotonic() 計。
+    - spill_dir 為 None 時不搬移到磁碟，超出預算直接淘汰。
+    """
+
+    def __init__(
+        self,
+        max_bytes_per_recording: int = 50 * 1024 * 1024,
+        max_total_bytes: int = 1024 * 1024 * 1024,
+        idle_ttl_seconds: float = 1800.0,
+        sweep_interval_seconds: float = 60.0,
+        spill_dir: Optional[str] = None,
+        spill_after_seconds: float = 120.0,
+    ) -> None:
+        self.max_bytes_per_recording = max_bytes_per_recording
+        self.max_total_bytes = max_total_bytes
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self.spill_dir = spill_dir
+        self.spill_after_seconds = spill_after_seconds
+
+        self._recordings: Dict[str, _Recording] = {}
+        self._memory_bytes = 0
+        self._lock = threading.RLock()
+        self._listeners: List[EvictionListener] = []
+        self._sweeper: Optional[threading.Thread] = None
+        self._metrics = {
+            "evicted_ttl": 0,
+            "evicted_budget": 0,
+            "rejected_chunks": 0,
+            "spilled_recordings": 0,
+        }
+
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    # ---------- 事件 ----------
+    def add_eviction_listener(self, listener: EvictionListener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, evicted: List[tuple]) -> None:
+        # 在 lock 外通知，避免 listener 反過來呼叫 store 時死結
+        for recording_id, reason in evicted:
+            for listener in self._listeners:
+                listener(recording_id, reason)
+
+    # ---------- chunk bytes ----------
+    def put_chunk(self, recording_id: str, chunk_index: int, audio_bytes: bytes) -> None:
+        evicted: List[tuple] = []
+        with self._lock:
+            recording = self._recordings.setdefault(recording_id, _Recording())
+            recording.last_access = time.monotonic()
+
+            if recording.spilled is not None:
+                replaced = recording.spilled.length(chunk_index)
+            else:
+                replaced = len(recording.chunks.get(chunk_index, b""))
+            if recording.total_bytes - replaced + len(audio_bytes) > self.max_bytes_per_recording:
+                self._metrics["rejected_chunks"] += 1
+                raise RecordingTooLarge(
+                    f"錄音 {recording_id} 超過上限 {self.max_bytes_per_recording} bytes"
+                )
+
+            if recording.spilled is not None:
+                recording.spilled.put(chunk_index, audio_bytes)
+            else:
+                recording.chunks[chunk_index] = audio_bytes
+                recording.memory_bytes += len(audio_bytes) - replaced
+                self._memory_bytes += len(audio_bytes) - replaced
+                evicted = self._enforce_budget(protect=recording_id)
+        self._notify(evicted)
+
+    def get_chunks(self, recording_id: str) -> Dict[int, bytes]:
+        with self._lock:
+            recording = self._recordings.get(recording_id)
+            if recording is None:
+                return {}
+            recording.last_access = time.monotonic()
+            chunks = dict(recording.chunks)
+            spilled = recording.spilled
+        if spilled is not None:
+            chunks.update(spilled.read_all())
+        return chunks
+
+    # ---------- 已轉錄文字 ----------
+    def put_text(self, recording_id: str, chunk_index: int, text: str) -> None:
+        with self._lock:
+            recording = self._recordings.get(recording_id)
+            if recording is None:
+                return  # 已 discard / 淘汰：不可讓晚到的文字把錄音復活到 TTL 才清掉
+            recording.last_access = time.monotonic()
+            recording.texts[chunk_index] = text
+
+    def get_texts(self, recording_id: str) -> Dict[int, str]:
+        with self._lock:
+            recording = self._recordings.get(recording_id)
+            return dict(recording.texts) if recording else {}
+
+    def get_text(self, recording_id: str, chunk_index: int) -> str:
+        with self._lock:
+            recording = self._recordings.get(recording_id)
+            return recording.texts.get(chunk_index, "") if recording else ""
+
+    # ---------- 生命週期 ----------
+    def discard(self, recording_id: str) -> None:
+        with self._lock:
+            recording = self._recordings.pop(recording_id, None)
+            if recording is None:
+                return
+            self._memory_bytes -= recording.memory_bytes
+        if recording.spilled is not None:
+            recording.spilled.remove()
+
+    def __contains__(self, recording_id: str) -> bool:
+        with self._lock:
+            return recording_id in self._recordings
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            spilled_bytes = sum(r.spilled.size for r in self._recordings.values() if r.spilled)
+            return {
+                "recordings": len(self._recordings),
+                "memory_bytes": self._memory_bytes,
+                "spilled_bytes": spilled_bytes,
+                **self._metrics,
+            }
+
+    # ---------- 淘汰與搬移 ----------
+    def _spill(self, recording_id: str, recording: _Recording) -> bool:
+        if not self.spill_dir or recording.spilled is not None:
+            return False
+        safe_name = re.sub(r"[^0-9A-Za-z_.-]", "_", recording_id)
+        spilled = _SpilledChunks(os.path.join(self.spill_dir, f"{safe_name}.chunks"))
+        spilled.remove()  # 清掉上次執行殘留的同名檔
+        for chunk_index, audio_bytes in sorted(recording.chunks.items()):
+            spilled.put(chunk_index, audio_bytes)
+        self._memory_bytes -= recording.memory_bytes
+        recording.chunks = {}
+        recording.memory_bytes = 0
+        recording.spilled = spilled
+        self._metrics["spilled_recordings"] += 1
+        return True
+
+    def _evict(self, recording_id: str, reason: str) -> None:
+        recording = self._recordings.pop(recording_id)
+        self._memory_bytes -= recording.memory_bytes
+        if recording.spilled is not None:
+            recording.spilled.remove()
+        self._metrics[f"evicted_{reason}"] += 1
+
+    def _enforce_budget(self, protect: str) -> List[tuple]:
+        """超出全域預算：由最久未使用者開始，先搬到磁碟，無法搬才淘汰。"""
+        evicted: List[tuple] = []
+        if self._memory_bytes <= self.max_total_bytes:
+            return evicted
+        by_age = sorted(self._recordings.items(), key=lambda item: item[1].last_access)
+        for recording_id, recording in by_age:
+            if self._memory_bytes <= self.max_total_bytes:
+                break
+            if recording_id == protect or not recording.memory_bytes:
+                continue
+            if not self._spill(recording_id, recording):
+                self._evict(recording_id, "budget")
+                evicted.append((recording_id, "budget"))
+        return evicted
+
+    def sweep(self) -> None:
+        """清除閒置超過 TTL 的錄音；閒置超過 spill_after_seconds 的搬到磁碟。"""
+        now = time.monotonic()
+        evicted: List[tuple] = []
+        with self._lock:
+            for recording_id, recording in list(self._recordings.items()):
+                idle = now - recording.last_access
+                if idle > self.idle_ttl_seconds:
+                    self._evict(recording_id, "ttl")
+                    evicted.append((recording_id, "ttl"))
+                elif idle > self.spill_after_seconds and recording.memory_bytes:
+                    self._spill(recording_id, recording)
+        self._notify(evicted)
+
+    def start_sweeper(self) -> None:
+        if self._sweeper is not None:
+            return
+
+        def loop() -> None:
+            while True:
+                time.sleep(self.sweep_interval_seconds)
+                try:
+                    self.sweep()
+                except Exception:
+                    logging.exception("Recording store sweep failed")  # sweeper 不可因單次錯誤停止
+
+        self._sweeper = threading.Thread(target=loop, name="recording-store-sweeper", daemon=True)
+        self._sweeper.start()
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    以本機 SQLite 檔案共用的錄音暫存，讓同一台機器上的多個 gunicorn worker 服務同一段錄音。
+    - WAL 模式：讀寫可並行；每個 thread 各自一條連線
+    - 閒置 TTL 以 wall-clock（time.time()）記錄，各行程一致
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes_per_recording: int = 50 * 1024 * 1024,
+        idle_ttl_seconds: float = 1800.0,
+        sweep_interval_seconds: float = 60.0,
+    ) -> None:
+        self.path = path
+        self.max_bytes_per_recording = max_bytes_per_recording
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._local = threading.local()
+        self._tracker = _LocalEvictionTracker(sweep_interval_seconds)
+        self._metrics = {"evicted_ttl": 0, "rejected_chunks": 0}
+
+        connection = self._connection()
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS recordings (
+                recording_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                recording_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (recording_id, chunk_index)
+            );
+            CREATE TABLE IF NOT EXISTS texts (
+                recording_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (recording_id, chunk_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_recordings_last_access ON recordings (last_access);
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _touch(self, connection: sqlite3.Connection, recording_id: str) -> None:
+        connection.execute(
+            "INSERT INTO recordings (recording_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(recording_id) DO UPDATE SET last_access = excluded.last_access",
+            (recording_id, time.time()),
+        )
+        self._tracker.remember(recording_id)
+
+    def put_chunk(self, recording_id: str, chunk_index: int, audio_bytes: bytes) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")  # 上限檢查與寫入須在同一交易內，避免多 worker 競態
+        try:
+            (current_bytes,) = connection.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM chunks WHERE recording_id = ? AND chunk_index != ?",
+                (recording_id, chunk_index),
+            ).fetchone()
+            if current_bytes + len(audio_bytes) > self.max_bytes_per_recording:
+                self._metrics["rejected_chunks"] += 1
+                raise RecordingTooLarge(
+                    f"錄音 {recording_id} 超過上限 {self.max_bytes_per_recording} bytes"
+                )
+            self._touch(connection, recording_id)
+            connection.execute(
+                "INSERT OR REPLACE INTO chunks (recording_id, chunk_index, data) VALUES (?, ?, ?)",
+                (recording_id, chunk_index, sqlite3.Binary(audio_bytes)),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_chunks(self, recording_id: str) -> Dict[int, bytes]:
+        rows = self._connection().execute(
+            "SELECT chunk_index, data FROM chunks WHERE recording_id = ?", (recording_id,)
+        ).fetchall()
+        return {index: bytes(data) for index, data in rows}
+
+    def put_text(self, recording_id: str, chunk_index: int, text: str) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if recording_id not in self:
+                connection.execute("COMMIT")
+                return  # 已 discard / 淘汰
+            self._touch(connection, recording_id)
+            connection.execute(
+                "INSERT OR REPLACE INTO texts (recording_id, chunk_index, text) VALUES (?, ?, ?)",
+                (recording_id, chunk_index, text),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get_texts(self, recording_id: str) -> Dict[int, str]:
+        rows = self._connection().execute(
+            "SELECT chunk_index, text FROM texts WHERE recording_id = ?", (recording_id,)
+        ).fetchall()
+        return dict(rows)
+
+    def _delete(self, connection: sqlite3.Connection, recording_ids: List[str]) -> None:
+        for table in ("chunks", "texts", "recordings"):
+            connection.executemany(f"DELETE FROM {table} WHERE recording_id = ?", [(rid,) for rid in recording_ids])
+
+    def discard(self, recording_id: str) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(connection, [recording_id])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._tracker.forget(recording_id)
+
+    def __contains__(self, recording_id: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM recordings WHERE recording_id = ?", (recording_id,)
+        ).fetchone()
+        return row is not None
+
+    def stats(self) -> Dict[str, int]:
+        connection = self._connection()
+        (recordings,) = connection.execute("SELECT COUNT(*) FROM recordings").fetchone()
+        (stored_bytes,) = connection.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM chunks").fetchone()
+        return {"recordings": recordings, "stored_bytes": stored_bytes, **self._metrics}
+
+    def sweep(self) -> None:
+        connection = self._connection()
+        cutoff = time.time() - self.idle_ttl_seconds
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in connection.execute(
+                "SELECT recording_id FROM recordings WHERE last_access < ?", (cutoff,)
+            ).fetchall()]
+            if expired:
+                self._delete(connection, expired)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._metrics["evicted_ttl"] += len(expired)
+        self._tracker.check(self.__contains__)
+
+    def add_eviction_listener(self, listener: EvictionListener) -> None:
+        self._tracker.add_listener(listener)
+
+    def start_sweeper(self) -> None:
+        self._tracker.start(self.sweep)
+
+
+# 上限檢查、寫入與計數更新必須在同一個原子操作內：分開的 HSTRLEN → INCRBY → HSET 在並行上傳時
+# 會超收或讓計數漂移。以 Lua script 在 Redis 端一次完成。
+# KEYS: chunks, texts, bytes；ARGV: chunk_index, data, max_bytes, ttl_seconds。超過上限回傳 -1。
+_PUT_CHUNK_SCRIPT = """
+local total = tonumber(redis.call('GET', KEYS[3]) or '0')
+    - redis.call('HSTRLEN', KEYS[1], ARGV[1]) + string.len(ARGV[2])
+if total > tonumber(ARGV[3]) then
+    return -1
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('SET', KEYS[3], total)
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[4])
+end
+return total
+"""
+
+# 錄音不存在（已 discard / 過期）時不寫入文字，避免把錄音復活。KEYS 同上；ARGV: chunk_index, text, ttl_seconds。
+_PUT_TEXT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+for _, key in ipairs(KEYS) do
+    redis.call('EXPIRE', key, ARGV[3])
+end
+return 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    以 Redis 共用的錄音暫存，讓多台 replica 服務同一段錄音。
+    - 每段錄音三個 key：chunks（hash）、texts（hash）、bytes（計數）；每次寫入都刷新 EXPIRE，閒置 TTL 由 Redis 處理
+    - 寫入以 Lua script 原子執行（見 _PUT_CHUNK_SCRIPT）
+    - 全域記憶體預算交給 Redis 的 maxmemory 設定
+    - client 可注入（例如測試時用 fakeredis）
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_bytes_per_recording: int = 50 * 1024 * 1024,
+        idle_ttl_seconds: float = 1800.0,
+        sweep_interval_seconds: float = 60.0,
+        key_prefix: str = "speech",
+    ) -> None:
+        self.client = client
+        self.max_bytes_per_recording = max_bytes_per_recording
+        self.idle_ttl_seconds = int(idle_ttl_seconds)
+        self.key_prefix = key_prefix
+        self._tracker = _LocalEvictionTracker(sweep_interval_seconds)
+        self._metrics = {"rejected_chunks": 0}
+        self._put_chunk_script = client.register_script(_PUT_CHUNK_SCRIPT)
+        self._put_text_script = client.register_script(_PUT_TEXT_SCRIPT)
+
+    def _keys(self, recording_id: str) -> tuple:
+        base = f"{self.key_prefix}:{recording_id}"
+        return f"{base}:chunks", f"{base}:texts", f"{base}:bytes"
+
+    def put_chunk(self, recording_id: str, chunk_index: int, audio_bytes: bytes) -> None:
+        total = self._put_chunk_script(
+            keys=self._keys(recording_id),
+            args=[chunk_index, audio_bytes, self.max_bytes_per_recording, self.idle_ttl_seconds],
+        )
+        if total < 0:
+            self._metrics["rejected_chunks"] += 1
+            raise RecordingTooLarge(
+                f"錄音 {recording_id} 超過上限 {self.max_bytes_per_recording} bytes"
+            )
+        self._tracker.remember(recording_id)
+
+    def get_chunks(self, recording_id: str) -> Dict[int, bytes]:
+        chunks_key, _, _ = self._keys(recording_id)
+        return {int(index): bytes(data) for index, data in self.client.hgetall(chunks_key).items()}
+
+    def put_text(self, recording_id: str, chunk_index: int, text: str) -> None:
+        written = self._put_text_script(
+            keys=self._keys(recording_id),
+            args=[chunk_index, text.encode("utf-8"), self.idle_ttl_seconds],
+        )
+        if written:
+            self._tracker.remember(recording_id)
+
+    def get_texts(self, recording_id: str) -> Dict[int, str]:
+        _, texts_key, _ = self._keys(recording_id)
+        return {int(index): bytes(text).decode("utf-8") for index, text in self.client.hgetall(texts_key).items()}
+
+    def discard(self, recording_id: str) -> None:
+        self.client.delete(*self._keys(recording_id))
+        self._tracker.forget(recording_id)
+
+    def __contains__(self, recording_id: str) -> bool:
+        chunks_key, texts_key, _ = self._keys(recording_id)
+        return bool(self.client.exists(chunks_key, texts_key))
+
+    def stats(self) -> Dict[str, int]:
+        return {"tracked_recordings": len(self._tracker), **self._metrics}
+
+    def add_eviction_listener(self, listener: EvictionListener) -> None:
+        self._tracker.add_listener(listener)
+
+    def sweep(self) -> None:
+        """過期由 Redis 處理；這裡只通知本行程碰過、但 key 已消失的錄音。"""
+        self._tracker.check(self.__contains__)
+
+    def start_sweeper(self) -> None:
+        self._tracker.start(self.sweep)
+
+
+def create_session_store(backend: str, **options: Any) -> SessionStore:
+    """
+    依名稱建立 store。
+    - memory：options 直接傳給 RecordingSessionStore
+    - sqlite：需 path
+    - redis ：需 url（或 client），redis 套件延遲載入
+    """
+    if backend == "memory":
+        return RecordingSessionStore(**options)
+
+    common = {
+        key: options[key]
+        for key in ("max_bytes_per_recording", "idle_ttl_seconds", "sweep_interval_seconds")
+        if key in options
+    }
+    if backend == "sqlite":
+        return SQLiteSessionStore(options["path"], **common)
+    if backend == "redis":
+        client = options.get("client")
+        if client is None:
+            import redis  # 延遲載入，未使用 Redis 時不需安裝
+            client = redis.Redis.from_url(options["url"])
+        return RedisSessionStore(client, **common)
+    raise ValueError(f"未知的 session store 後端: {backend}")
@@ -0,0 +1,153 @@
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# =========================
+# 推論前的語音活動偵測（VAD）
+# =========================
+# 長者作答之間常有長段沉默與呼吸聲，原本整段交給 Whisper 解碼。
+# 在推論前先做輕量 VAD：
+#   - 整段沒有語音 → 直接略過，不進模型
+#   - 有語音 → 裁掉前後靜音（保留 padding，避免切到字頭字尾）
+# 優先使用 webrtcvad（與 assets/code/local_voice.py 相同）；未安裝時退回以能量判斷。
+
+SAMPLE_RATE = 16000
+
+
+class VadResult(NamedTuple):
+    samples: np.ndarray      # 裁切後的音訊；is_silent 時為空陣列
+    input_seconds: float
+    kept_seconds: float
+    is_silent: bool
+
+
+def _load_webrtcvad(aggressiveness: int) -> Optional[object]:
+    try:
+        import webrtcvad  # 選用套件
+    except ImportError:
+        return None
+    vad = webrtcvad.Vad()
+    vad.set_mode(aggressiveness)
+    return vad
+
+
+class SpeechActivityTrimmer:
+    """
+    以固定長度 frame 判斷是否有語音，找出第一個與最後一個語音 frame 後裁切。
+    - frame_ms 須為 10 / 20 / 30（webrtcvad 限制）
+    - min_speech_ms：語音 frame 總長不足此值視為整段靜音（過濾咳嗽、碰撞聲）
+    """
+
+    def __init__(
+        self,
+        aggressiveness: int = 2,
+        frame_ms: int = 30,
+        padding_ms: int = 300,
+        min_speech_ms: int = 240,
+    ) -> None:
+        if frame_ms not in (10, 20, 30):
+            raise ValueError("frame_ms 必須是 10、20 或 30")
+        self.frame_samples = SAMPLE_RATE * frame_ms // 1000
+        self.padding_frames = padding_ms // frame_ms
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self._vad = _load_webrtcvad(aggressiveness)
+        self._lock = threading.Lock()  # webrtcvad.Vad 物件不保證可多執行緒共用
+
+    @property
+    def backend(self) -> str:
+        return "webrtcvad" if self._vad is not None else "energy"
+
+    def _speech_flags(self, frames: np.ndarray) -> np.ndarray:
+        if self._vad is not None:
+            pcm16 = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+            with self._lock:
+                return np.fromiter(
+                    (self._vad.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in pcm16),
+                    dtype=bool,
+                    count=len(pcm16),
+                )
+        # 能量備援：高於整段背景噪音（第 20 百分位）數倍且高於絕對門檻者視為語音
+        rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+        threshold = max(0.01, 3.0 * float(np.percentile(rms, 20)))
+        return rms > threshold
+
+    def trim(self, samples: np.ndarray) -> VadResult:
+        input_seconds = len(samples) / SAMPLE_RATE
+        frame_count = len(samples) // self.frame_samples
+        if frame_count == 0:
+            return VadResult(samples[:0], input_seconds, 0.0, True)
+
+        frames = samples[:frame_count * self.frame_samples].reshape(frame_count, self.frame_samples)
+        flags = self._speech_flags(frames)
+        if int(flags.sum()) < self.min_speech_frames:
+            return VadResult(samples[:0], input_seconds, 0.0, True)
+
+        speech_indices = np.flatnonzero(flags)
+        first_frame = max(0, int(speech_indices[0]) - self.padding_frames)
+        last_frame = min(frame_count, int(speech_indices[-1]) + 1 + self.padding_frames)
+        start = first_frame * self.frame_samples
+        # 最後一個 frame 若延伸到結尾，連同不足一個 frame 的尾巴一起保留
+        end = len(samples) if last_frame == frame_count else last_frame * self.frame_samples
+        trimmed = samples[start:end]
+        return VadResult(trimmed, input_seconds, len(trimmed) / SAMPLE_RATE, False)
+
+
+_VadEntry = Tuple[int, float, float]  # (dropped, input_seconds, kept_seconds)
+
+
+class VadSavingsTracker:
+    """
+    累計每段錄音被 VAD 省下的音訊秒數（即少送進模型的量），finalize 時回報。
+    - 以 chunk 索引記錄：finalize 補轉錄同一個 chunk 時覆寫原紀錄，不重複累計
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._per_recording: Dict[str, Dict[object, _VadEntry]] = {}
+        self._totals = {"chunks": 0, "dropped_chunks": 0, "input_seconds": 0.0, "kept_seconds": 0.0}
+
+    def record(self, recording_id: str, result: VadResult, chunk_index: Optional[int] = None) -> None:
+        entry = (int(result.is_silent), result.input_seconds, result.kept_seconds)
+        with self._lock:
+            entries = self._per_recording.setdefault(recording_id, {})
+            key = chunk_index if chunk_index is not None else ("unindexed", len(entries))
+            previous = entries.get(key)
+            entries[key] = entry
+            if previous is None:
+                self._totals["chunks"] += 1
+            else:
+                self._add(self._totals, previous, -1)
+            self._add(self._totals, entry, 1)
+
+    @staticmethod
+    def _add(bucket: Dict[str, float], entry: _VadEntry, sign: int) -> None:
+        bucket["dropped_chunks"] += sign * entry[0]
+        bucket["input_seconds"] += sign * entry[1]
+        bucket["kept_seconds"] += sign * entry[2]
+
+    @staticmethod
+    def _summarize(bucket: Dict[str, float]) -> Dict[str, float]:
+        saved = bucket["input_seconds"] - bucket["kept_seconds"]
+        return {
+            "chunks": int(bucket["chunks"]),
+            "dropped_chunks": int(bucket["dropped_chunks"]),
+            "input_seconds": round(bucket["input_seconds"], 2),
+            "kept_seconds": round(bucket["kept_seconds"], 2),
+            "saved_seconds": round(saved, 2),
+            "saved_ratio": round(saved / bucket["input_seconds"], 3) if bucket["input_seconds"] else 0.0,
+        }
+
+    def pop(self, recording_id: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            entries = self._per_recording.pop(recording_id, None)
+        if not entries:
+            return None
+        bucket = {"chunks": len(entries), "dropped_chunks": 0, "input_seconds": 0.0, "kept_seconds": 0.0}
+        for entry in entries.values():
+            self._add(bucket, entry, 1)
+        return self._summarize(bucket)
+
+    def totals(self) -> Dict[str, float]:
+        with self._lock:
+            return self._summarize(dict(self._totals))
@@ -0,0 +1,192 @@
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# =========================
+# 串流辨識：每個 recording 一個 session，跨 chunk 保留上下文
+# =========================
+# 問題：各 chunk 獨立轉錄，跨邊界的詞會被切斷或遺漏，finalize 還得重轉錄空白 chunk。
+# 作法（LocalAgreement-2 提交策略）：
+#   - 保留「尚未提交」的尾段 PCM，新 chunk 接在其後一起解碼
+#   - 連續兩次解碼結果的最長共同前綴才提交（committed），其餘視為不穩定尾巴
+#   - 已提交文字的尾端作為 initial_prompt，提供語境
+#   - 提交後把 buffer 裁到最後提交詞的結束點，之後每次只需重解「不穩定尾巴 + 新音訊」
+# finalize 時只需把最後一次假設提交（flush），不必重新推論。
+
+SAMPLE_RATE = 16000
+
+
+class TimedWord(NamedTuple):
+    start: float  # 秒；session 內為絕對時間
+    end: float
+    text: str
+
+
+# transcribe_fn(audio, prompt) → buffer 內相對時間的詞列表
+TranscribeWordsFn = Callable[[np.ndarray, str], List[TimedWord]]
+
+
+def _normalize(word: str) -> str:
+    return word.strip()
+
+
+class StreamingRecognitionSession:
+    """單一錄音的串流辨識狀態；chunk 可亂序送達，內部依 index 順序處理。"""
+
+    def __init__(self, max_buffer_seconds: float = 28.0, prompt_chars: int = 200) -> None:
+        self.max_buffer_seconds = max_buffer_seconds
+        self.prompt_chars = prompt_chars
+
+        self._lock = threading.Lock()
+        self._pending: Dict[int, Optional[np.ndarray]] = {}
+        self._next_index = 0
+        self._seen_indices: set = set()
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0.0         # buffer 第 0 個 sample 的絕對時間
+        self._committed: List[str] = []
+        self._committed_until = 0.0      # 最後提交詞的結束時間
+        self._hypothesis: List[TimedWord] = []  # 上一次解碼中尚未提交的部分
+        self._dirty = False              # buffer 有尚未成功解碼過的音訊
+
+    # ---------- 對外 API ----------
+    @property
+    def committed_text(self) -> str:
+        with self._lock:
+            return "".join(self._committed)
+
+    @property
+    def chunk_count(self) -> int:
+        with self._lock:
+            return len(self._seen_indices)
+
+    def feed(self, chunk_index: int, samples: np.ndarray, transcribe_fn: TranscribeWordsFn) -> str:
+        """送入一個 chunk 的 PCM，回傳本次新提交的文字（可能為空字串）。"""
+        with self._lock:
+            self._seen_indices.add(chunk_index)
+            self._pending[chunk_index] = samples
+            return self._drain_in_order(transcribe_fn)
+
+    def skip(self, chunk_index: int) -> None:
+        """該 chunk 無法解碼：標記為空，避免後續 chunk 因等待它而卡住。"""
+        with self._lock:
+            self._seen_indices.add(chunk_index)
+            self._pending[chunk_index] = None
+
+    def flush(self, transcribe_fn: TranscribeWordsFn) -> str:
+        """錄音結束：處理剩餘 chunk（缺號略過），提交最後的假設，回傳完整文字。"""
+        with self._lock:
+            for chunk_index in sorted(self._pending):
+                self._next_index = max(self._next_index, chunk_index)
+                self._drain_in_order(transcribe_fn)
+
+            if self._dirty and len(self._buffer):
+                # 最後一次解碼失敗過（例如佇列滿），補解一次
+                words = self._transcribe_buffer(transcribe_fn)
+                self._hypothesis = words
+            self._commit(self._hypothesis)
+            self._hypothesis = []
+            return "".join(self._committed)
+
+    # ---------- 內部 ----------
+    def _drain_in_order(self, transcribe_fn: TranscribeWordsFn) -> str:
+        newly_committed: List[str] = []
+        while self._next_index in self._pending:
+            samples = self._pending.pop(self._next_index)
+            self._next_index += 1
+            if samples is None or not len(samples):
+                continue
+            newly_committed.extend(self._process(samples, transcribe_fn))
+        return "".join(newly_committed)
+
+    def _prompt(self) -> str:
+        return "".join(self._committed)[-self.prompt_chars:]
+
+    def _transcribe_buffer(self, transcribe_fn: TranscribeWordsFn) -> List[TimedWord]:
+        relative_words = transcribe_fn(self._buffer, self._prompt())
+        self._dirty = False
+        words = [
+            TimedWord(self._buffer_start + word.start, self._buffer_start + word.end, word.text)
+            for word in relative_words
+        ]
+        # 已提交範圍內的詞（重疊解碼產生）不再計入
+        return [word for word in words if word.end > self._committed_until + 0.01 and _normalize(word.text)]
+
+    def _process(self, samples: np.ndarray, transcribe_fn: TranscribeWordsFn) -> List[str]:
+        self._append_audio(samples)
+        words = self._transcribe_buffer(transcribe_fn)
+
+        # LocalAgreement：與上一次假設的最長共同前綴才提交
+        agreed_count = 0
+        for previous, current in zip(self._hypothesis, words):
+            if _normalize(previous.text) != _normalize(current.text):
+                break
+            agreed_count += 1
+
+        committed_words = words[:agreed_count]
+        self._commit(committed_words)
+        self._hypothesis = words[agreed_count:]
+        self._trim_buffer(self._committed_until)
+        return [word.text for word in committed_words]
+
+    def _commit(self, words: List[TimedWord]) -> None:
+        for word in words:
+            self._committed.append(word.text)
+            self._committed_until = max(self._committed_until, word.end)
+
+    def _append_audio(self, samples: np.ndarray) -> None:
+        max_samples = int(self.max_buffer_seconds * SAMPLE_RATE)
+        if len(self._buffer) + len(samples) > max_samples:
+            # 超過模型視窗：先強制提交上一次假設，再裁掉已提交的音訊
+            self._commit(self._hypothesis)
+            self._hypothesis = []
+            self._trim_buffer(self._committed_until)
+        overflow = len(self._buffer) + len(samples) - max_samples
+        if overflow > 0:
+            # 仍超過（例如長時間無語音）：丟棄最舊的音訊
+            self._buffer = self._buffer[overflow:]
+            self._buffer_start += overflow / SAMPLE_RATE
+        self._buffer = np.concatenate([self._buffer, samples.astype(np.float32, copy=False)])
+        if len(self._buffer) > max_samples:
+            self._buffer_start += (len(self._buffer) - max_samples) / SAMPLE_RATE
+            self._buffer = self._buffer[-max_samples:]
+        self._dirty = True
+
+    def _trim_buffer(self, until_seconds: float) -> None:
+        cut = int((until_seconds - self._buffer_start) * SAMPLE_RATE)
+        if cut <= 0:
+            return
+        cut = min(cut, len(self._buffer))
+        self._buffer = self._buffer[cut:]
+        self._buffer_start += cut / SAMPLE_RATE
+
+
+class StreamingSessionRegistry:
+    """recording_id → StreamingRecognitionSession；finalize 時 discard 釋放。"""
+
+    def __init__(self, max_buffer_seconds: float = 28.0, prompt_chars: int = 200) -> None:
+        self.max_buffer_seconds = max_buffer_seconds
+        self.prompt_chars = prompt_chars
+        self._sessions: Dict[str, StreamingRecognitionSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, recording_id: str) -> StreamingRecognitionSession:
+        with self._lock:
+            session = self._sessions.get(recording_id)
+            if session is None:
+                session = StreamingRecognitionSession(self.max_buffer_seconds, self.prompt_chars)
+                self._sessions[recording_id] = session
+            return session
+
+    def find(self, recording_id: str) -> Optional[StreamingRecognitionSession]:
+        with self._lock:
+            return self._sessions.get(recording_id)
+
+    def discard(self, recording_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(recording_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from category_lexicon import LEXICON_PATH, Category
+from phonetic_matcher import PhoneticMatcher, load_pinyin_reader
+
+
+@pytest.fixture(scope="session")
+def build_categories():
+    """依參數開關拼音比對建出詞庫的所有類別，不受 SPEECH_FUZZY_MATCH 影響。"""
+
+    def build(phonetic):
+        reader = load_pinyin_reader() if phonetic else None
+        if phonetic and reader is None:
+            pytest.skip("需要 pypinyin")
+        with open(LEXICON_PATH, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        categories = {}
+        for name, spec in data["categories"].items():
+            category = Category(name, spec["label"], spec["concepts"], spec.get("blockers", ()))
+            category.phonetic = PhoneticMatcher(category.surface_to_concept, reader) if reader else None
+            categories[name] = category
+        return categories
+    return build
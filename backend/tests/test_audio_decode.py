@@ -0,0 +1,53 @@
+import numpy as np
+
+from audio_decode import EBML_MAGIC, MATROSKA_CLUSTER_ID, MAX_CLUSTER_TAIL_BYTES, RecordingStreamDecoder
+
+
+class _Frame:
+    def __init__(self, samples):
+        self.samples = np.asarray(samples, dtype=np.float32)
+
+    def to_ndarray(self):
+        return self.samples.reshape(1, -1)
+
+
+class _FakeCodec:
+    def decode(self, packet):
+        assert packet is None
+        return [_Frame([0.1, 0.2])]
+
+
+class _FakeResampler:
+    def __init__(self):
+        self.flushed = False
+
+    def resample(self, frame):
+        if frame is None:
+            self.flushed = True
+            return [_Frame([0.3])]
+        return [frame]
+
+
+def test_close_flushes_codec_and_resampler():
+    decoder = RecordingStreamDecoder()
+    resampler = _FakeResampler()
+    decoder._codec, decoder._resampler = _FakeCodec(), resampler
+
+    tail = decoder.close()
+    assert resampler.flushed
+    np.testing.assert_allclose(tail, [0.1, 0.2, 0.3])
+    assert decoder._codec is None and decoder.close().size == 0
+
+
+def test_cluster_tail_is_capped_when_chunks_carry_no_cluster(monkeypatch):
+    decoder = RecordingStreamDecoder()
+    monkeypatch.setattr(decoder, "_demux_and_decode", lambda payload: np.zeros(1, dtype=np.float32))
+    decoder.decode(EBML_MAGIC + b"header" + MATROSKA_CLUSTER_ID + b"blocks", 0)
+
+    chunk = b"\x00" * (MAX_CLUSTER_TAIL_BYTES // 4)
+    sizes = []
+    for index in range(1, 9):  # 同一個 Cluster 延續好幾段，分段裡都沒有 Cluster ID
+        decoder.decode(chunk, index)
+        sizes.append(len(decoder._cluster_tail))
+    assert max(sizes) <= MAX_CLUSTER_TAIL_BYTES
+    assert sizes[0] > 0
@@ -0,0 +1,86 @@
+import logging
+
+import pytest
+
+from category_lexicon import Category, load_lexicon
+from running_score import RunningScore
+
+# 含類別詞、但不是在回答的一般用語：舊的 jieba 斷詞路徑全部計 0 分
+NON_ANSWERS = [
+    ("animals", "我馬上想到"),
+    ("animals", "我印象中還有"),
+    ("animals", "熊熊想不起來"),
+    ("animals", "早上喝牛奶"),
+    ("animals", "過馬路"),
+    ("animals", "我吃豬肉"),
+    ("animals", "電腦的滑鼠"),
+    ("animals", "蜂蜜"),
+    ("animals", "牛肉麵"),
+    ("animals", "雞蛋"),
+    ("animals", "現象"),
+    ("animals", "螺絲"),
+    ("vegetables", "蔥油餅"),
+]
+ANSWERS = [
+    ("animals", "熊貓還有熊", {"熊貓", "熊"}),
+    ("animals", "老虎獅子", {"老虎", "獅子"}),
+    ("animals", "斑馬線", {"斑馬"}),
+    ("animals", "嗯大象然後蜜蜂", {"大象", "蜜蜂"}),
+    ("vegetables", "洋蔥炒蛋", {"洋蔥"}),
+    ("vegetables", "番茄醬還有蕃茄", {"番茄"}),
+]
+
+
+@pytest.fixture(scope="module")
+def lexicon():
+    return load_lexicon()
+
+
+@pytest.fixture(scope="module")
+def jieba_concepts(lexicon):
+    """舊的計分路徑：jieba.lcut 後與詞庫取交集（所有類別詞都 add_word）。"""
+    jieba = pytest.importorskip("jieba")
+    jieba.setLogLevel(logging.ERROR)
+    for category in lexicon.categories.values():
+        for surface in category.surfaces:
+            jieba.add_word(surface)
+
+    def concepts(category, text):
+        return {category.surface_to_concept[word] for word in jieba.lcut(text) if word in category.surface_to_concept}
+    return concepts
+
+
+@pytest.mark.parametrize("name, text", NON_ANSWERS)
+def test_words_inside_everyday_terms_do_not_score(lexicon, jieba_concepts, name, text):
+    category = lexicon.categories[name]
+    assert category.concept_hits(text) == jieba_concepts(category, text) == set()
+
+
+@pytest.mark.parametrize("name, text, expected", ANSWERS)
+def test_answers_match_jieba(lexicon, jieba_concepts, name, text, expected):
+    category = lexicon.categories[name]
+    assert category.concept_hits(text) == jieba_concepts(category, text) == expected
+
+
+def test_blocker_suppresses_every_word_it_covers(lexicon):
+    assert lexicon.categories["animals"].concept_hits("馬馬虎虎") == set()
+
+
+def test_blockers_are_reported_but_not_scored(lexicon):
+    category = lexicon.categories["animals"]
+    matches = category.find_matches("喝牛奶的牛")
+    assert [(hit.surface, hit.concept) for hit in matches] == [("牛奶", ""), ("牛", "牛")]
+    assert [hit.surface for hit in category.find_concepts("喝牛奶的牛")] == ["牛"]
+
+
+def test_blocker_may_not_be_a_category_word():
+    with pytest.raises(ValueError):
+        Category("animals", "動物", {"牛": []}, blockers=["牛"])
+
+
+def test_running_score_waits_for_blocker_split_across_chunks(lexicon):
+    score = RunningScore(lexicon.categories["animals"])
+    score.feed_chunk(0, "我馬")
+    assert score.snapshot()["total"] == 0
+    score.feed_chunk(1, "上想到牛")
+    assert score.finish()["detail"] == {"牛": 1}
@@ -0,0 +1,143 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import db
+
+
+class SqlitePool:
+    """測試用連線池：與 ThreadedConnectionPool 相同，池滿時 getconn 立刻失敗。"""
+
+    def __init__(self, path, maxconn):
+        self.path = path
+        self.maxconn = maxconn
+        self.idle = []
+        self.in_use = 0
+        self.closed = 0
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        with self.lock:
+            if self.in_use >= self.maxconn:
+                raise RuntimeError("connection pool exhausted")
+            self.in_use += 1
+            return self.idle.pop() if self.idle else sqlite3.connect(self.path, check_same_thread=False)
+
+    def putconn(self, connection, close=False):
+        with self.lock:
+            self.in_use -= 1
+            if close:
+                self.closed += 1
+                connection.close()
+            else:
+                self.idle.append(connection)
+
+    def closeall(self):
+        for connection in self.idle:
+            connection.close()
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SqlitePool(str(tmp_path / "test.db"), maxconn=2)
+    db.set_connection_pool(pool)
+    db.write_to_db("CREATE TABLE scores (patient_id TEXT PRIMARY KEY, mmse REAL)")
+    yield pool
+    db.set_connection_pool(None)
+
+
+def test_read_and_write_go_through_the_pool(pool):
+    db.write_to_db("INSERT INTO scores VALUES (?, ?)", ("p1", 28.0))
+    assert db.read_from_db("SELECT * FROM scores") == [("p1", 28.0)]
+    assert pool.in_use == 0
+    assert len(pool.idle) == 1
+
+
+def test_failed_block_rolls_back_and_returns_connection(pool):
+    with pytest.raises(sqlite3.IntegrityError):
+        db.write_many_to_db("INSERT INTO scores VALUES (?, ?)", [("p1", 1.0), ("p1", 2.0)])
+    assert db.read_from_db("SELECT COUNT(*) FROM scores") == [(0,)]
+    assert pool.in_use == 0
+
+
+def test_write_many_uses_one_transaction(pool):
+    db.write_many_to_db("INSERT INTO scores VALUES (?, ?)", [(f"p{i}", float(i)) for i in range(50)])
+    assert db.read_from_db("SELECT COUNT(*), SUM(mmse) FROM scores") == [(50, 1225.0)]
+
+
+def test_dead_connection_is_replaced(pool, monkeypatch):
+    monkeypatch.setattr(db, "DB_POOL_PING_IDLE_SECONDS", 0.0)
+    dead = sqlite3.connect(pool.path, check_same_thread=False)
+    dead.close()
+    pool.idle.append(dead)
+    assert db.read_from_db("SELECT COUNT(*) FROM scores") == [(0,)]
+    assert pool.closed == 1
+
+
+def test_checkout_waits_for_a_free_connection_instead_of_failing(pool):
+    release = threading.Event()
+
+    def hold():
+        with db.pooled_connection():
+            release.wait()
+
+    holders = [threading.Thread(target=hold) for _ in range(pool.maxconn)]
+    for holder in holders:
+        holder.start()
+    while pool.in_use < pool.maxconn:
+        time.sleep(0.01)
+    threading.Timer(0.2, release.set).start()
+    assert db.read_from_db("SELECT COUNT(*) FROM scores") == [(0,)]
+    for holder in holders:
+        holder.join()
+    assert pool.in_use == 0
+
+
+def test_checkout_times_out_when_pool_stays_exhausted(pool, monkeypatch):
+    monkeypatch.setattr(db, "DB_POOL_WAIT_SECONDS", 0.1)
+    with db.pooled_connection(), db.pooled_connection():
+        with pytest.raises(TimeoutError):
+            db.read_from_db("SELECT 1")
+    assert db.read_from_db("SELECT 1") == [(1,)]
+
+
+def test_copy_rows_writes_all_rows_including_nulls(pool):
+    written = db.copy_rows_to_table("scores", ["patient_id", "mmse"], ((f"p{i}", None if i % 2 else float(i)) for i in range(10)))
+    assert written == 10
+    assert db.read_from_db("SELECT COUNT(*), COUNT(mmse) FROM scores") == [(10, 5)]
+    assert pool.in_use == 0
+
+
+def test_read_in_batches_returns_connection_when_exhausted(pool):
+    db.write_many_to_db("INSERT INTO scores VALUES (?, ?)", [(f"p{i:02d}", float(i)) for i in range(25)])
+    batches = list(db.read_in_batches("SELECT patient_id FROM scores ORDER BY patient_id", batch_size=10))
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert batches[0][0] == ("p00",)
+    assert pool.in_use == 0
+
+
+def test_read_in_batches_releases_connection_when_closed_early(pool):
+    db.write_many_to_db("INSERT INTO scores VALUES (?, ?)", [(f"p{i}", float(i)) for i in range(5)])
+    batches = db.read_in_batches("SELECT * FROM scores WHERE mmse >= ?", (0,), batch_size=2)
+    assert len(next(batches)) == 2
+    assert pool.in_use == 1
+    batches.close()
+    assert pool.in_use == 0
+
+
+def test_health_check_reports_pool_state(pool):
+    health = db.check_db_health()
+    assert health["ok"] is True
+    assert health["pool_max"] == pool.maxconn
+    assert health["latency_ms"] >= 0
+
+
+def test_health_check_reports_failure(pool, monkeypatch):
+    def refuse():
+        raise RuntimeError("database is down")
+    monkeypatch.setattr(pool, "getconn", refuse)
+    health = db.check_db_health()
+    assert health["ok"] is False
+    assert "database is down" in health["error"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_compiler import CompiledForest, compile_with_parity_check, max_parity_error, parity_sample
+
+
+@pytest.fixture(scope="module")
+def estimator():
+    rng = np.random.default_rng(0)
+    features = np.abs(rng.standard_normal((400, 9))) * rng.choice([1.0, 30.0, 300.0], size=(400, 9))
+    labels = (features[:, 1] < 24) | (features[:, 5] > 200)
+    return RandomForestClassifier(n_estimators=20, random_state=0).fit(features, labels.astype(int))
+
+
+def test_compiled_forest_matches_sklearn(estimator):
+    compiled = compile_with_parity_check(estimator)
+    samples = parity_sample(9, rows=2000, seed=1)
+    assert max_parity_error(compiled, estimator, samples) <= 1e-12
+    np.testing.assert_array_equal(compiled.predict(samples), estimator.predict(samples))
+
+
+def test_compiled_forest_handles_single_row_and_large_batches(estimator):
+    compiled = CompiledForest.from_estimator(estimator)
+    samples = parity_sample(9, rows=5000, seed=2)  # 超過分塊大小
+    np.testing.assert_allclose(compiled.predict_proba(samples[0]), estimator.predict_proba(samples[:1]))
+    np.testing.assert_allclose(compiled.predict_proba(samples), estimator.predict_proba(samples))
+
+
+def test_saved_artifact_round_trips(estimator, tmp_path):
+    compiled = CompiledForest.from_estimator(estimator)
+    manifest = compiled.save(str(tmp_path), extra_manifest={"source_sha256": "abc"})
+    loaded = CompiledForest.load(str(tmp_path), mmap=True)
+    samples = parity_sample(9, seed=3)
+    assert loaded.manifest == manifest
+    np.testing.assert_array_equal(loaded.predict_proba(samples), compiled.predict_proba(samples))
+    np.testing.assert_array_equal(loaded.classes_, estimator.classes_)
+
+
+def test_rejects_estimator_without_trees():
+    with pytest.raises(TypeError):
+        CompiledForest.from_estimator(object())
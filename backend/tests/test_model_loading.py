@@ -0,0 +1,53 @@
+import gzip
+import pickle
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import RandomForestClassifier
+
+import model
+from forest_compiler import CompiledForest
+
+
+def _write_forest(path, seed):
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(200, 9))
+    labels = (features[:, 0] + features[:, 1] > 0).astype(int)
+    estimator = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=seed).fit(features, labels)
+    with gzip.open(path, "wb") as file:
+        pickle.dump(estimator, file)
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    model_path = tmp_path / "random_forest_model.pgz"
+    monkeypatch.setattr(model, "get_absolute_model_path", lambda: str(model_path))
+    monkeypatch.setattr(model, "get_absolute_artifact_root", lambda: str(tmp_path / "compiled_forest"))
+    monkeypatch.setattr(model, "PREDICTION_TABLE_ENABLED", False)
+    _write_forest(model_path, seed=1)
+    model.export_compiled_artifact()
+    return model_path
+
+
+def test_auto_uses_artifact_exported_from_current_pickle(model_dir, monkeypatch):
+    monkeypatch.setattr(model, "MODEL_ARTIFACT_FORMAT", "auto")
+    predictor = model.load_predictor_from_disk()
+    assert isinstance(predictor.estimator, CompiledForest)
+    assert predictor.estimator.manifest["source_sha256"] == model.model_source_sha256()
+
+
+def test_auto_falls_back_to_pickle_when_pickle_replaced(model_dir, monkeypatch, caplog):
+    monkeypatch.setattr(model, "MODEL_ARTIFACT_FORMAT", "auto")
+    _write_forest(model_dir, seed=2)
+    predictor = model.load_predictor_from_disk()
+    assert not isinstance(predictor.estimator, CompiledForest)
+    assert "不符" in caplog.text
+
+
+def test_npy_refuses_stale_artifact(model_dir, monkeypatch):
+    monkeypatch.setattr(model, "MODEL_ARTIFACT_FORMAT", "npy")
+    _write_forest(model_dir, seed=2)
+    with pytest.raises(ValueError):
+        model.load_predictor_from_disk()
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from password_hashing import PasswordHasher, PasswordHashingBusy, PasswordHashingPool, scheme_of
+
+# 測試用低成本參數
+FAST_SCRYPT = {"n": 2 ** 4, "r": 1, "p": 1}
+
+
+@pytest.fixture
+def hasher():
+    return PasswordHasher("scrypt", **FAST_SCRYPT)
+
+
+def test_scrypt_round_trip(hasher):
+    stored = hasher.hash("correct horse")
+    assert scheme_of(stored) == "scrypt"
+    assert hasher.verify(stored, "correct horse")
+    assert not hasher.verify(stored, "wrong")
+    assert not hasher.needs_rehash(stored)
+    assert PasswordHasher("scrypt", n=2 ** 5, r=1, p=1).needs_rehash(stored)
+
+
+def test_legacy_plaintext_is_compared_and_flagged_for_rehash(hasher):
+    assert hasher.verify("1234", "1234")
+    assert not hasher.verify("1234", "12345")
+    assert hasher.needs_rehash("1234")
+
+
+@pytest.mark.parametrize("plaintext", ["$argon2secret", "$2b$hunter2", "$scrypt$pass", "$argon2id$v=19$m=1"])
+def test_plaintext_that_looks_like_a_hash_prefix_still_verifies(hasher, plaintext):
+    assert scheme_of(plaintext) is None
+    assert hasher.verify(plaintext, plaintext)
+    assert hasher.needs_rehash(plaintext)
+
+
+@pytest.mark.parametrize("stored, scheme", [
+    ("$argon2id$v=19$m=65536,t=3,p=1$c29tZXNhbHQ$RdescudvJCsgt3ub+b+dWRWJTmaaJObG", "argon2"),
+    ("$2b$12$EXRkfkdmXn2gzds2SSitu.MW9.gAVqa9eLS1//RYtYCmB1eLHg.9q", "bcrypt"),
+    ("$scrypt$n=16,r=1,p=1$c2FsdA$ZGlnZXN0", "scrypt"),
+])
+def test_scheme_of_recognizes_full_hash_formats(stored, scheme):
+    assert scheme_of(stored) == scheme
+
+
+def test_pool_timeout_raises_busy():
+    release = threading.Event()
+
+    class SlowHasher:
+        def verify(self, stored, password):
+            release.wait()
+            return True
+
+    pool = PasswordHashingPool(SlowHasher(), workers=1, max_pending=0)
+    try:
+        with pytest.raises(PasswordHashingBusy):
+            pool.verify("stored", "password", timeout=0.05)
+        with pytest.raises(PasswordHashingBusy):  # 逾時的工作仍佔著名額
+            pool.verify("stored", "password")
+    finally:
+        release.set()
+
+
+def test_dummy_hash_is_computed_once_under_concurrency(hasher):
+    calls = []
+
+    class CountingHasher:
+        def hash(self, password):
+            calls.append(password)
+            return hasher.hash(password)
+
+    pool = PasswordHashingPool(CountingHasher(), workers=4, max_pending=16)
+    start = threading.Barrier(8)
+    results = []
+
+    def login():
+        start.wait()
+        results.append(pool.dummy_hash(timeout=5))
+
+    threads = [threading.Thread(target=login) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert len(set(results)) == 1 and len(results) == 8
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from category_lexicon import Category
+from phonetic_matcher import FUZZY_MATCH_ENABLED, PhoneticMatcher, edit_distance, normalize_syllable
+
+# 辨識成同音字的真實答案：只出現在 fuzzy，不計入 detail / total
+TRUE_POSITIVES = [
+    ("animals", "大像", {}, {"大象"}),
+    ("animals", "無偉熊", {"熊": 1}, {"無尾熊"}),
+    ("animals", "然後有大像還有河馬", {"河馬": 1}, {"大象"}),
+    ("vegetables", "高力菜", {}, {"高麗菜"}),
+]
+# 一般口語湊出的同音詞：不可以計分
+FALSE_POSITIVES = [
+    ("animals", "我媽媽以前會煮"),
+    ("animals", "再想一個"),
+    ("animals", "一年四季都有"),
+    ("vegetables", "一年四季都有"),
+    ("vegetables", "上次我去動物園"),
+]
+
+
+@pytest.fixture(scope="module")
+def categories(build_categories):
+    return build_categories(True)
+
+
+@pytest.mark.skipif("SPEECH_FUZZY_MATCH" in os.environ, reason="環境變數覆寫了預設值")
+def test_fuzzy_matching_is_off_by_default():
+    assert not FUZZY_MATCH_ENABLED
+
+
+@pytest.mark.parametrize("name, text, detail, fuzzy", TRUE_POSITIVES)
+def test_homophones_are_reported_separately(categories, name, text, detail, fuzzy):
+    scores = categories[name].concept_scores(text)
+    assert scores.detail == detail
+    assert set(scores.fuzzy) == fuzzy
+    assert all(0 < confidence < 1 for confidence in scores.fuzzy.values())
+
+
+@pytest.mark.parametrize("name, text", FALSE_POSITIVES)
+def test_everyday_phrases_never_score(categories, build_categories, name, text):
+    plain = build_categories(False)[name]
+    assert categories[name].concept_scores(text).detail == plain.concept_scores(text).detail == {}
+    assert plain.concept_scores(text).fuzzy == {}
+
+
+def test_exact_answer_is_not_repeated_in_fuzzy(categories):
+    assert categories["animals"].concept_scores("大像大象").fuzzy == {}
+
+
+def test_blocker_inside_a_longer_homophone_run_is_never_rewritten(categories):
+    # 「偉熊」當擋字詞：整個包住它的三音節近音候選「無尾熊」也不可以採用
+    category = Category("test", "測試", {"無尾熊": [], "熊": []}, blockers=["偉熊"])
+    category.phonetic = PhoneticMatcher(category.surface_to_concept, categories["animals"].phonetic.reader)
+    assert category.phonetic.find_all("無偉熊") != []
+    assert category.phonetic.find_all("無偉熊", [(1, 3)]) == []
+    assert category.phonetic.find_all("無偉熊", [(0, 1)]) == []
+    assert category.concept_scores("無偉熊") == ({}, {})
+
+
+def test_syllable_helpers():
+    assert normalize_syllable("zhang") == "zan"
+    assert normalize_syllable("ning") == "lin"
+    assert edit_distance("xiang", "xian") == 1
@@ -0,0 +1,90 @@
+import gzip
+import pickle
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+from sklearn.ensemble import RandomForestClassifier
+
+import model
+from forest_compiler import CompiledForest
+from prediction_table import PredictionTable, TableAxis, bucket_axis, build_prediction_table
+
+
+@pytest.fixture
+def predictor(tmp_path, monkeypatch):
+    model_path = tmp_path / "random_forest_model.pgz"
+    rng = np.random.default_rng(0)
+    features = rng.uniform(0, 30, size=(300, 9))
+    labels = (features[:, 0] + features[:, 3] > 30).astype(int)
+    estimator = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(features, labels)
+    with gzip.open(model_path, "wb") as file:
+        pickle.dump(estimator, file)
+    monkeypatch.setattr(model, "get_absolute_model_path", lambda: str(model_path))
+    monkeypatch.setattr(model, "get_absolute_table_dir", lambda: str(tmp_path / "prediction_table"))
+    return model.TrainedModelPredictor(CompiledForest.from_estimator(estimator))
+
+
+def _save_table(predictor, error):
+    axes = [TableAxis(f"F{index}", [0.0, 15.0, 30.0]) for index in range(9)]
+    table = build_prediction_table(predictor, axes)
+    table.manifest.update({"source_sha256": model.model_source_sha256(), "error": error})
+    table.save(model.get_absolute_table_dir())
+    return table
+
+
+def _error(max_abs_error, label_mismatch_rate):
+    return {"samples": 100, "max_abs_error": max_abs_error, "mean_abs_error": 0.0, "label_mismatch_rate": label_mismatch_rate}
+
+
+def test_table_matches_forest_on_grid_points(predictor):
+    table = _save_table(predictor, _error(0.0, 0.0))
+    grid = np.array(np.meshgrid(*[[0.0, 15.0, 30.0]] * 9, indexing="ij")).reshape(9, -1).T
+    table_labels, table_probabilities, in_grid = table.lookup_batch(grid)
+    model_labels, model_probabilities = predictor.predict_batch(grid)
+    assert in_grid.all()
+    np.testing.assert_array_equal(table_labels, model_labels)
+    np.testing.assert_allclose(table_probabilities, model_probabilities, atol=1e-4)
+
+
+def test_accepts_table_within_error_bounds(predictor):
+    _save_table(predictor, _error(0.005, 0.0))
+    assert model.load_matching_prediction_table(model.model_source_sha256()) is not None
+
+
+@pytest.mark.parametrize("error", [_error(0.38, 0.0), _error(0.0, 0.0094), None])
+def test_refuses_table_exceeding_error_bounds(predictor, caplog, error):
+    _save_table(predictor, error)
+    assert model.load_matching_prediction_table(model.model_source_sha256()) is None
+    assert "誤差" in caplog.text
+
+
+def test_bounds_are_configurable(predictor, monkeypatch):
+    _save_table(predictor, _error(0.38, 0.0094))
+    monkeypatch.setattr(model, "PREDICTION_TABLE_MAX_ABS_ERROR", 0.5)
+    monkeypatch.setattr(model, "PREDICTION_TABLE_MAX_LABEL_MISMATCH", 0.01)
+    assert model.load_matching_prediction_table(model.model_source_sha256()) is not None
+
+
+
+def test_out_of_domain_continuous_values_fall_back_to_the_model(predictor, tmp_path):
+    grid = [0.0, 15.0, 30.0]
+    axes = [TableAxis(f"F{index}", grid) for index in range(9)]
+    axes[3] = bucket_axis("F3", predictor.estimator.split_thresholds(3), 0.0, 30.0, buckets=1000)
+    build_prediction_table(predictor, axes).save(str(tmp_path / "table"))
+    predictor.table = PredictionTable.load(str(tmp_path / "table"))  # domain 需隨 manifest 保存
+
+    for value in (-5.0, 30.5, 45.0):
+        row = [15.0, 15.0, 15.0, value, 15.0, 15.0, 15.0, 15.0, 15.0]
+        labels, probabilities = predictor.predict_batch(row)
+        assert predictor.table.lookup(row) is None
+        assert predictor.predict_one(row) == (int(labels[0]), float(probabilities[0]))
+
+    # 範圍內（含兩端）仍由查表回答；桶界取完所有門檻時與模型一致
+    for value in (0.0, 12.3, 30.0):
+        row = [15.0, 15.0, 15.0, value, 15.0, 15.0, 15.0, 15.0, 15.0]
+        labels, probabilities = predictor.predict_batch(row)
+        table_label, table_probability = predictor.table.lookup(row)
+        assert table_label == labels[0]
+        assert table_probability == pytest.approx(probabilities[0], abs=1e-4)
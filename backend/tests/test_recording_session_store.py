@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from session_store import RecordingSessionStore, RecordingTooLarge
+
+
+def test_rejects_chunk_over_per_recording_cap():
+    store = RecordingSessionStore(max_bytes_per_recording=10)
+    store.put_chunk("r1", 0, b"x" * 6)
+    with pytest.raises(RecordingTooLarge):
+        store.put_chunk("r1", 1, b"x" * 5)
+    store.put_chunk("r1", 0, b"x" * 10)  # 覆寫同一索引只算新的大小
+    assert store.get_chunks("r1") == {0: b"x" * 10}
+    assert store.stats()["rejected_chunks"] == 1
+
+
+def test_text_written_after_discard_does_not_recreate_recording():
+    store = RecordingSessionStore()
+    store.put_chunk("r1", 0, b"audio")
+    store.discard("r1")
+    store.put_text("r1", 0, "高麗菜")
+    assert "r1" not in store
+    assert store.get_texts("r1") == {}
+    assert store.stats()["recordings"] == 0
+
+
+def test_idle_recordings_expire_and_notify_listeners():
+    store = RecordingSessionStore(idle_ttl_seconds=0.01)
+    evicted = []
+    store.add_eviction_listener(lambda recording_id, reason: evicted.append((recording_id, reason)))
+    store.put_chunk("r1", 0, b"audio")
+    time.sleep(0.02)
+    store.sweep()
+    assert "r1" not in store
+    assert evicted == [("r1", "ttl")]
+
+
+def test_spilled_chunks_are_overwritten_by_index(tmp_path):
+    store = RecordingSessionStore(max_total_bytes=8, spill_dir=str(tmp_path), max_bytes_per_recording=100)
+    store.put_chunk("cold", 0, b"aaaa")
+    store.put_chunk("cold", 1, b"bbbb")
+    store.put_chunk("hot", 0, b"cccc")  # 超出預算：最久未使用的 cold 搬到磁碟
+    assert store.stats()["spilled_recordings"] == 1
+
+    store.put_chunk("cold", 1, b"BB")        # 放得下：寫回原位置
+    store.put_chunk("cold", 0, b"AAAAAAAA")  # 放不下：附加到檔尾
+    assert store.get_chunks("cold") == {0: b"AAAAAAAA", 1: b"BB"}
+    assert store.stats()["spilled_bytes"] == 10
+
+    with pytest.raises(RecordingTooLarge):
+        store.put_chunk("cold", 2, b"x" * 91)
+    store.put_chunk("cold", 2, b"x" * 90)
+
+    store.discard("cold")
+    assert not list(tmp_path.iterdir())
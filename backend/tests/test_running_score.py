@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from running_score import RunningScore, RunningScoreRegistry
+
+FILLERS = ["嗯", "然後", "還有", "那個", "我想想", "對", "就是", "馬上", "早上喝牛奶", "大像", "無偉熊", "好像"]
+
+
+def _result(result):
+    return result["detail"], result["fuzzy"]
+
+
+def _transcript(category, rng):
+    terms = sorted(category.surfaces | category.blockers)
+    return "".join(rng.choice(terms) if rng.random() < 0.5 else rng.choice(FILLERS) for _ in range(rng.randint(5, 40)))
+
+
+def _split(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 8)))) if len(text) > 1 else []
+    return [text[start:end] for start, end in zip([0, *cuts], [*cuts, len(text)])]
+
+
+@pytest.mark.parametrize("phonetic", [False, True])
+def test_chunked_scoring_matches_batch_scoring(build_categories, phonetic):
+    rng = random.Random(20240601)
+    for category in build_categories(phonetic).values():
+        for _ in range(150):
+            text = _transcript(category, rng)
+            chunks = _split(text, rng)
+            order = list(enumerate(chunks))
+            rng.shuffle(order)  # 非同步轉錄會亂序完成
+            score = RunningScore(category)
+            for index, chunk in order:
+                score.feed_chunk(index, chunk)
+            assert score.is_complete(len(chunks))
+            assert _result(score.finish()) == tuple(category.concept_scores(text)), text
+
+
+@pytest.mark.parametrize("phonetic", [False, True])
+def test_streaming_sync_matches_batch_scoring(build_categories, phonetic):
+    rng = random.Random(7)
+    for category in build_categories(phonetic).values():
+        for _ in range(100):
+            text = _transcript(category, rng)
+            score = RunningScore(category)
+            committed = 0
+            while committed < len(text):
+                committed = min(len(text), committed + rng.randint(1, 6))
+                score.sync_text(text[:committed])
+            assert _result(score.finish()) == tuple(category.concept_scores(text)), text
+
+
+def test_snapshot_only_counts_settled_hits(build_categories):
+    category = build_categories(False)["animals"]
+    score = RunningScore(category)
+    score.feed_chunk(1, "老虎")
+    assert score.snapshot() == {
+        "type": "animals", "total": 0, "detail": {}, "fuzzy": {}, "chunks_scored": 0, "chunks_waiting": 1,
+    }
+    score.feed_chunk(0, "大象" + "嗯" * category.max_match_length)
+    score.feed_chunk(0, "重送的 chunk 不影響")
+    assert score.snapshot()["detail"] == {"大象": 1}
+    assert score.finish()["total"] == 2
+
+
+def test_registry_replaces_score_when_category_changes(build_categories):
+    categories = build_categories(False)
+    vegetables, animals = categories["vegetables"], categories["animals"]
+    registry = RunningScoreRegistry()
+    first = registry.get("rec", animals)
+    assert registry.get("rec", animals) is first
+    assert registry.get("rec", vegetables) is not first
+    registry.discard("rec")
+    assert registry.find("rec") is None and len(registry) == 0
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from session_store import RecordingTooLarge, RedisSessionStore, SessionStore, SQLiteSessionStore
+
+CAP = 100
+
+
+def _sqlite_pair(tmp_path, ttl):
+    path = str(tmp_path / "sessions.db")
+    return (
+        SQLiteSessionStore(path, max_bytes_per_recording=CAP, idle_ttl_seconds=ttl),
+        SQLiteSessionStore(path, max_bytes_per_recording=CAP, idle_ttl_seconds=ttl),
+    )
+
+
+def _redis_pair(tmp_path, ttl):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # fakeredis 執行 Lua script 需要
+    server = fakeredis.FakeServer()
+    return (
+        RedisSessionStore(fakeredis.FakeRedis(server=server), max_bytes_per_recording=CAP, idle_ttl_seconds=ttl),
+        RedisSessionStore(fakeredis.FakeRedis(server=server), max_bytes_per_recording=CAP, idle_ttl_seconds=ttl),
+    )
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def make_pair(request, tmp_path):
+    factory = _sqlite_pair if request.param == "sqlite" else _redis_pair
+    return lambda ttl=1800: factory(tmp_path, ttl)
+
+
+def test_writes_are_visible_across_instances(make_pair):
+    first, second = make_pair()
+    first.put_chunk("r1", 0, b"audio-0")
+    second.put_chunk("r1", 1, b"audio-1")
+    second.put_text("r1", 0, "大象")
+    assert "r1" in first and "r1" in second
+    assert first.get_chunks("r1") == {0: b"audio-0", 1: b"audio-1"}
+    assert first.get_texts("r1") == {0: "大象"}
+
+
+def test_cap_is_enforced_across_instances(make_pair):
+    first, second = make_pair()
+    first.put_chunk("r1", 0, b"x" * 60)
+    with pytest.raises(RecordingTooLarge):
+        second.put_chunk("r1", 1, b"x" * 41)
+    second.put_chunk("r1", 0, b"x" * 100)  # 覆寫同一索引只算新的大小
+    assert first.get_chunks("r1") == {0: b"x" * 100}
+
+
+def test_concurrent_uploads_never_exceed_cap(make_pair):
+    first, second = make_pair()
+    errors = []
+
+    def upload(store, index):
+        try:
+            store.put_chunk("r1", index, b"x" * 30)
+        except RecordingTooLarge:
+            errors.append(index)
+
+    threads = [threading.Thread(target=upload, args=((first, second)[i % 2], i)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    chunks = first.get_chunks("r1")
+    assert len(chunks) == 3 and len(errors) == 7
+    assert sum(map(len, chunks.values())) <= CAP
+    if isinstance(first, RedisSessionStore):
+        assert int(first.client.get(first._keys("r1")[2])) == 90
+
+
+def test_discard_removes_everything_and_blocks_late_text(make_pair):
+    first, second = make_pair()
+    first.put_chunk("r1", 0, b"audio")
+    first.put_text("r1", 0, "老虎")
+    second.discard("r1")
+    first.put_text("r1", 0, "老虎")
+    assert "r1" not in first
+    assert first.get_chunks("r1") == {} and first.get_texts("r1") == {}
+    first.put_chunk("r1", 0, b"x" * CAP)  # 計數也一併清除
+
+
+def test_idle_recordings_expire_and_notify(make_pair):
+    first, _ = make_pair(ttl=1)
+    evicted = []
+    first.add_eviction_listener(lambda recording_id, reason: evicted.append((recording_id, reason)))
+    first.put_chunk("r1", 0, b"audio")
+    time.sleep(1.2)
+    first.sweep()
+    assert "r1" not in first
+    assert evicted == [("r1", "ttl")]
+
+
+def test_incomplete_backend_fails_at_construction():
+    class TextOnlyStore(SessionStore):
+        def put_text(self, recording_id, chunk_index, text):
+            pass
+
+        def get_texts(self, recording_id):
+            return {}
+
+    with pytest.raises(TypeError, match="abstract"):
+        TextOnlyStore()
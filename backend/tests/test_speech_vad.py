@@ -0,0 +1,30 @@
+import numpy as np
+
+from speech_vad import VadResult, VadSavingsTracker
+
+
+def _result(input_seconds, kept_seconds):
+    return VadResult(np.zeros(0, dtype=np.float32), input_seconds, kept_seconds, kept_seconds == 0)
+
+
+def test_retranscribed_chunk_is_counted_once():
+    tracker = VadSavingsTracker()
+    tracker.record("rid", _result(10.0, 4.0), 0)
+    tracker.record("rid", _result(5.0, 0.0), 1)
+    tracker.record("rid", _result(10.0, 4.0), 0)  # finalize 補轉錄同一個 chunk
+
+    report = tracker.pop("rid")
+    assert report["chunks"] == 2
+    assert report["dropped_chunks"] == 1
+    assert report["input_seconds"] == 15.0
+    assert report["saved_seconds"] == 11.0
+    assert tracker.totals() == report
+    assert tracker.pop("rid") is None
+
+
+def test_unindexed_results_are_all_counted():
+    tracker = VadSavingsTracker()
+    tracker.record("rid", _result(2.0, 1.0))
+    tracker.record("rid", _result(2.0, 1.0))
+    assert tracker.pop("rid")["chunks"] == 2
+    assert tracker.totals()["input_seconds"] == 4.0
@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+
+from transcription_batcher import (
+    COMPRESSION_RATIO_THRESHOLD,
+    MicroBatchTranscriber,
+    compression_ratio,
+    screen_result,
+)
+
+
+class _Options:
+    language = "zh"
+    beam_size = 1
+    use_vad = False
+
+
+class _RecordingPool:
+    def __init__(self) -> None:
+        self.keys = []
+
+    def submit(self, recording_id, job):
+        self.keys.append(recording_id)
+
+
+def test_disabled_by_default():
+    batcher = MicroBatchTranscriber(_RecordingPool())
+    assert not batcher.enabled
+    assert not batcher.is_batchable(np.zeros(16000, dtype=np.float32), _Options())
+
+
+def test_screen_result_passes_confident_text():
+    assert screen_result("高麗菜菠菜", token_count=5, cumulative_logprob=-1.0, no_speech_prob=0.01) == "高麗菜菠菜"
+
+
+def test_screen_result_drops_silence():
+    assert screen_result("謝謝觀看", token_count=4, cumulative_logprob=-8.0, no_speech_prob=0.9) == ""
+
+
+def test_screen_result_rejects_low_logprob_and_repetition():
+    assert screen_result("大象", token_count=2, cumulative_logprob=-6.0, no_speech_prob=0.1) is None
+    repeated = "老虎" * 60
+    assert compression_ratio(repeated) > COMPRESSION_RATIO_THRESHOLD
+    assert screen_result(repeated, token_count=120, cumulative_logprob=-5.0, no_speech_prob=0.0) is None
+
+
+def test_batch_takes_one_chunk_per_recording_and_uses_own_queue_key():
+    pool = _RecordingPool()
+    batcher = MicroBatchTranscriber(pool, max_batch_size=4, max_wait_ms=0)
+    samples = np.zeros(1600, dtype=np.float32)
+    for recording_id in ("a", "a", "a", "b"):
+        threading.Thread(target=batcher.transcribe, args=(recording_id, samples, _Options()), daemon=True).start()
+    while True:
+        with batcher._condition:
+            if len(batcher._pending) == 4:
+                break
+
+    first = batcher._collect_batch()
+    assert [item.recording_id for item in first] == ["a", "b"]
+    assert [item.recording_id for item in batcher._pending] == ["a", "a"]
+
+    batcher._dispatch(first, "zh", 1)
+    assert pool.keys and pool.keys[0] not in ("a", "b")
@@ -0,0 +1,223 @@
+import itertools
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from transcription_pool import TranscriptionWorkerPool
+
+# =========================
+# 微批次轉錄：把同時到達的多個 PCM chunk 合併成一次 batched inference
+# =========================
+# 作法：collector thread 收集 max_wait_ms 內（或湊滿 max_batch_size）的請求，
+# 依 (language, beam_size) 分組後，以一個 pool job 執行：
+#   各 chunk 各自算 log-mel → pad/trim 到 30 秒視窗 → 疊成 [batch, n_mels, frames]
+#   → CTranslate2 Whisper.generate 一次解碼 → 每個呼叫端拿回自己的文字。
+# chunk 由前端每 20 秒輪替一次 MediaRecorder，天然落在單一 30 秒視窗內；
+# 超過 30 秒或需要 VAD 的請求直接走一般 transcribe。
+# 直接呼叫 generate 會繞過 WhisperModel.transcribe 的防護（溫度 fallback、壓縮率 / 平均 logprob / no-speech 門檻），
+# 因此每筆結果都依同樣門檻檢查：判定為靜音回傳空字串，可疑者回傳 None，由呼叫端改走一般 transcribe 重做。
+# 預設停用（SPEECH_BATCH_MAX_SIZE=1），需明確開啟。
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+MAX_DECODE_LENGTH = 448  # Whisper decoder 的 token 上限
+
+# 與 faster-whisper transcribe() 的預設門檻相同
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOG_PROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+class _BatchRequest:
+    def __init__(self, recording_id: str, samples: np.ndarray, options: Any) -> None:
+        self.recording_id = recording_id
+        self.samples = samples
+        self.options = options
+        self.future: Future = Future()
+
+
+def _pad_or_trim_frames(features: np.ndarray, frame_count: int) -> np.ndarray:
+    """單一職責：把 [n_mels, frames] 補零或截斷到固定 frame 數（模型輸入需等長）。"""
+    if features.shape[-1] > frame_count:
+        return features[:, :frame_count]
+    if features.shape[-1] < frame_count:
+        pad_width = frame_count - features.shape[-1]
+        return np.pad(features, ((0, 0), (0, pad_width)))
+    return features
+
+
+def compression_ratio(text: str) -> float:
+    """重複、幻覺輸出的壓縮率特別高（與 faster-whisper 相同算法）。"""
+    text_bytes = text.encode("utf-8")
+    return len(text_bytes) / len(zlib.compress(text_bytes)) if text_bytes else 0.0
+
+
+def screen_result(text: str, token_count: int, cumulative_logprob: float, no_speech_prob: float) -> Optional[str]:
+    """
+    依 transcribe() 的門檻檢查單筆 greedy 結果。
+    - 靜音（no_speech 高且 logprob 低）→ 空字串，與 transcribe() 丟掉該段一致
+    - 壓縮率或平均 logprob 超標 → None，需要溫度 fallback，交回呼叫端重做
+    """
+    avg_logprob = cumulative_logprob / (token_count + 1)
+    if no_speech_prob > NO_SPEECH_THRESHOLD and avg_logprob < LOG_PROB_THRESHOLD:
+        return ""
+    if compression_ratio(text) > COMPRESSION_RATIO_THRESHOLD or avg_logprob < LOG_PROB_THRESHOLD:
+        return None
+    return text
+
+
+def transcribe_pcm_batch(model: Any, batch: List[np.ndarray], language: str, beam_size: int) -> List[Optional[str]]:
+    """在 worker 內執行：一次 generate 解完整批 PCM，回傳與輸入同序的文字；未通過門檻者為 None。"""
+    import ctranslate2
+    from faster_whisper.tokenizer import Tokenizer
+
+    extractor = model.feature_extractor
+    features = np.stack([
+        _pad_or_trim_frames(extractor(samples), extractor.nb_max_frames).astype(np.float32)
+        for samples in batch
+    ])
+
+    tokenizer = Tokenizer(
+        model.hf_tokenizer,
+        model.model.is_multilingual,
+        task="transcribe",
+        language=language,
+    )
+    prompt = list(tokenizer.sot_sequence) + [tokenizer.no_timestamps]
+
+    results = model.model.generate(
+        ctranslate2.StorageView.from_array(np.ascontiguousarray(features)),
+        [prompt] * len(batch),
+        beam_size=beam_size,
+        max_length=MAX_DECODE_LENGTH,
+        suppress_blank=True,
+        return_scores=True,
+        return_no_speech_prob=True,
+    )
+    texts = []
+    for result in results:
+        tokens = result.sequences_ids[0]
+        # scores 為長度正規化後的 logprob（length_penalty=1）；還原成累計值
+        texts.append(screen_result(tokenizer.decode(tokens), len(tokens), result.scores[0] * len(tokens), result.no_speech_prob))
+    return texts
+
+
+class MicroBatchTranscriber:
+    """
+    微批次排程器。transcribe() 對呼叫端是同步介面；內部由 collector thread 湊批後交給 worker pool。
+    - max_batch_size <= 1 視為停用，直接以單筆 job 交給 pool。
+    - 每批同一個 recording 最多一筆，其餘留到下一批；整批以獨立的佇列 key 交給 pool，
+      不會排在任何一段錄音自己的工作後面，也不會佔用某段錄音的輪詢順位。
+    """
+
+    def __init__(self, pool: TranscriptionWorkerPool, max_batch_size: int = 1, max_wait_ms: float = 10.0) -> None:
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000.0
+
+        self._pending: List[_BatchRequest] = []
+        self._condition = threading.Condition()
+        self._batches = 0
+        self._batched_items = 0
+        self._rejected_items = 0
+        self._batch_ids = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._collector_loop, name="transcribe-batcher", daemon=True)
+        self._thread.start()
+
+    def is_batchable(self, samples: np.ndarray, options: Any) -> bool:
+        return self.enabled and not options.use_vad and len(samples) <= SAMPLE_RATE * WINDOW_SECONDS
+
+    def transcribe(self, recording_id: str, samples: np.ndarray, options: Any) -> Optional[str]:
+        """回傳文字；None 表示結果未通過品質門檻，呼叫端應改走一般 transcribe。"""
+        request_item = _BatchRequest(recording_id, samples, options)
+        with self._condition:
+            self._pending.append(request_item)
+            self._condition.notify()
+        return request_item.future.result()
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            average = self._batched_items / self._batches if self._batches else 0.0
+            return {
+                "batches": self._batches,
+                "items": self._batched_items,
+                "avg_batch_size": average,
+                "fallbacks": self._rejected_items,
+            }
+
+    # ---------- 內部：收集與分派 ----------
+    def _pending_recordings(self) -> int:
+        return len({item.recording_id for item in self._pending})
+
+    def _collect_batch(self) -> List[_BatchRequest]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = time.monotonic() + self.max_wait_seconds
+            while self._pending_recordings() < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            # 每個 recording 取最早的一筆；同 recording 的後續 chunk 依原順序留在佇列
+            batch: List[_BatchRequest] = []
+            remaining_items: List[_BatchRequest] = []
+            seen = set()
+            for item in self._pending:
+                if len(batch) < self.max_batch_size and item.recording_id not in seen:
+                    batch.append(item)
+                    seen.add(item.recording_id)
+                else:
+                    remaining_items.append(item)
+            self._pending = remaining_items
+            return batch
+
+    def _collector_loop(self) -> None:
+        while True:
+            batch = self._collect_batch()
+            groups: Dict[Tuple[str, int], List[_BatchRequest]] = {}
+            for item in batch:
+                groups.setdefault((item.options.language, item.options.beam_size), []).append(item)
+            for (language, beam_size), items in groups.items():
+                self._dispatch(items, language, beam_size)
+
+    def _dispatch(self, items: List[_BatchRequest], language: str, beam_size: int) -> None:
+        def job(model: Any) -> None:
+            try:
+                texts = transcribe_pcm_batch(model, [item.samples for item in items], language, beam_size)
+            except BaseException as ex:
+                for item in items:
+                    item.future.set_exception(ex)
+                return
+            rejected = 0
+            for item, text in zip(items, texts):
+                rejected += text is None
+                item.future.set_result(text)
+            with self._condition:
+                self._rejected_items += rejected
+
+        try:
+            # 整批只佔用一個 worker，以自己的 key 排隊
+            self.pool.submit(f"batch:{next(self._batch_ids)}", job)
+        except Exception as ex:  # 例如 TranscriptionPoolSaturated：讓每個呼叫端自行降級
+            for item in items:
+                item.future.set_exception(ex)
+            return
+
+        with self._condition:
+            self._batches += 1
+            self._batched_items += len(items)
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# =========================
+# 轉錄工作池：多個 worker 共享 N 份 WhisperModel，依 recording 輪詢排程
+# =========================
+# 取代原本單一 transcribe_lock：
+# - worker 數量可設定（預設依 CPU 核心數），吞吐量隨核心數擴展
+# - 等待佇列有上限，超過時立即拒絕（呼叫端降級處理，不讓請求無限堆積）
+# - 每個 recording_id 各自排隊，worker 以 round-robin 取件，避免單一長錄音霸佔所有 worker
+# - 模型延遲載入：第一次 submit（或 warm-up）才建立 replica，import 不再被模型載入拖慢
+
+DEFAULT_POOL_SIZE = max(1, min(4, os.cpu_count() or 1))
+
+
+class TranscriptionPoolSaturated(RuntimeError):
+    """等待中的工作已達上限。呼叫端應降級（例如留待 finalize 補轉錄），而非阻塞等待。"""
+
+
+class TranscriptionWorkerPool:
+    """
+    固定數量的 worker thread，每個 worker 綁定一份模型 replica。
+    - model_factory(num_workers) 建立一份模型；同一份模型可被多個 worker 共用
+      （faster-whisper 的 num_workers 允許同一模型被多執行緒同時呼叫）。
+    - submit(recording_id, job) 回傳 Future；job 會以 job(model) 形式在 worker 內執行。
+    """
+
+    def __init__(
+        self,
+        model_factory: Callable[[int], Any],
+        size: int = DEFAULT_POOL_SIZE,
+        replicas: int = 1,
+        max_pending: int = 64,
+    ) -> None:
+        if size < 1:
+            raise ValueError("pool size 必須 >= 1")
+        if replicas < 1 or replicas > size:
+            raise ValueError("replicas 需介於 1 與 pool size 之間")
+
+        self.size = size
+        self.replicas = replicas
+        self.max_pending = max_pending
+
+        self._model_factory = model_factory
+        self._models: List[Any] = []
+        self._queues: "OrderedDict[str, Deque[Tuple[Callable[[Any], Any], Future]]]" = OrderedDict()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._rejected = 0
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+        # 載入狀態另用一把 lock，載入期間 stats() / load_status() 仍可即時回應
+        self._start_lock = threading.Lock()
+        self._state = "idle"  # idle → loading → ready / failed
+        self._load_seconds: Optional[float] = None
+        self._load_error: Optional[str] = None
+
+    # ---------- 生命週期 ----------
+    def start(self) -> None:
+        """建立模型 replica 並啟動 worker；執行緒安全、重複呼叫無副作用。載入失敗時下次呼叫會重試。"""
+        if self._state == "ready":
+            return
+        with self._start_lock:
+            if self._state == "ready":
+                return
+            self._state = "loading"
+            started = time.perf_counter()
+            try:
+                workers_per_replica = -(-self.size // self.replicas)  # ceil
+                models = [self._model_factory(workers_per_replica) for _ in range(self.replicas)]
+            except Exception as ex:
+                self._state = "failed"
+                self._load_error = repr(ex)
+                raise
+
+            with self._condition:
+                self._models = models
+                for worker_index in range(self.size):
+                    thread = threading.Thread(
+                        target=self._worker_loop,
+                        args=(self._models[worker_index % self.replicas],),
+                        name=f"transcribe-worker-{worker_index}",
+                        daemon=True,
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+            self._load_seconds = time.perf_counter() - started
+            self._load_error = None
+            self._state = "ready"
+
+    @property
+    def ready(self) -> bool:
+        return self._state == "ready"
+
+    def load_status(self) -> Dict[str, Any]:
+        return {"state": self._state, "load_seconds": self._load_seconds, "error": self._load_error}
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    # ---------- 對外 API ----------
+    def submit(self, recording_id: str, job: Callable[[Any], Any]) -> Future:
+        self.start()  # 延遲載入：第一個請求觸發
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("transcription pool 已關閉")
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise TranscriptionPoolSaturated(
+                    f"轉錄佇列已滿（pending={self._pending}, max={self.max_pending}）"
+                )
+            self._queues.setdefault(recording_id, deque()).append((job, future))
+            self._pending += 1
+            self._condition.notify()
+        return future
+
+    def run(self, recording_id: str, job: Callable[[Any], Any], timeout: Optional[float] = None) -> Any:
+        """submit 後同步等待結果；job 內的例外會原樣拋回呼叫端。"""
+        return self.submit(recording_id, job).result(timeout=timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "size": self.size,
+                "replicas": self.replicas,
+                "pending": self._pending,
+                "running": self._running,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "recordings_waiting": len(self._queues),
+            }
+
+    # ---------- 內部：排程 ----------
+    def _next_job(self) -> Optional[Tuple[Callable[[Any], Any], Future]]:
+        """Round-robin：取最久未被服務的 recording 的第一個工作，該 recording 若仍有工作則排到隊尾。"""
+        while not self._queues and not self._closed:
+            self._condition.wait()
+        if not self._queues:
+            return None
+
+        recording_id, jobs = self._queues.popitem(last=False)
+        job_and_future = jobs.popleft()
+        if jobs:
+            self._queues[recording_id] = jobs
+        self._pending -= 1
+        self._running += 1
+        return job_and_future
+
+    def _worker_loop(self, model: Any) -> None:
+        while True:
+            with self._condition:
+                item = self._next_job()
+            if item is None:
+                return
+
+            job, future = item
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(job(model))
+                    except BaseException as ex:  # 交由呼叫端決定如何處理
+                        future.set_exception(ex)
+            finally:
+                with self._condition:
+                    self._running -= 1
+                    self._completed += 1
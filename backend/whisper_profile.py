@@ -0,0 +1,105 @@
+import os
+from typing import Any, Dict, Optional
+
+# =========================
+# Whisper 模型設定檔（profile）
+# =========================
+# 原本寫死 compute_type="float16"（為 4060 GPU 調校），在純 CPU 節點會失敗或退回慢速路徑。
+# profile 集中 device / compute_type / 模型大小 / cpu_threads / num_workers；
+# device 與 compute_type 為 "auto" 時依硬體決定：有 CUDA 用 float16，CPU 用 int8。
+
+VALID_DEVICES = ("auto", "cpu", "cuda")
+VALID_COMPUTE_TYPES = ("auto", "int8", "int8_float16", "int8_float32", "float16", "float32")
+
+
+class WhisperProfile:
+    def __init__(
+        self,
+        model_size: str = "medium",
+        device: str = "auto",
+        compute_type: str = "auto",
+        cpu_threads: int = 0,
+        num_workers: int = 0,
+    ) -> None:
+        if device not in VALID_DEVICES:
+            raise ValueError(f"device 必須是 {VALID_DEVICES} 之一，收到 {device}")
+        if compute_type not in VALID_COMPUTE_TYPES:
+            raise ValueError(f"compute_type 必須是 {VALID_COMPUTE_TYPES} 之一，收到 {compute_type}")
+        self.model_size = model_size
+        self.device = device
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads    # 0 = 交給 CTranslate2 自動決定
+        self.num_workers = num_workers    # 0 = 由 worker pool 依大小決定
+
+    def resolved(self) -> "WhisperProfile":
+        """把 auto 換成實際值；單一職責：只做硬體判斷，不載入模型。"""
+        device = self.device
+        if device == "auto":
+            device = "cuda" if cuda_device_count() > 0 else "cpu"
+
+        compute_type = self.compute_type
+        if compute_type == "auto":
+            compute_type = "float16" if device == "cuda" else "int8"
+
+        return WhisperProfile(self.model_size, device, compute_type, self.cpu_threads, self.num_workers)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model_size": self.model_size,
+            "device": self.device,
+            "compute_type": self.compute_type,
+            "cpu_threads": self.cpu_threads,
+            "num_workers": self.num_workers,
+        }
+
+    def __repr__(self) -> str:
+        return f"WhisperProfile({self.to_dict()})"
+
+
+# 常用組合；以 WHISPER_PROFILE 選用，個別欄位仍可再用環境變數覆寫
+PRESET_PROFILES: Dict[str, WhisperProfile] = {
+    "auto": WhisperProfile(),
+    "gpu-fp16": WhisperProfile(device="cuda", compute_type="float16"),
+    "gpu-int8": WhisperProfile(device="cuda", compute_type="int8_float16"),
+    "cpu-int8": WhisperProfile(device="cpu", compute_type="int8"),
+    "cpu-fp32": WhisperProfile(device="cpu", compute_type="float32"),
+    "cpu-small-int8": WhisperProfile(model_size="small", device="cpu", compute_type="int8"),
+}
+
+
+def cuda_device_count() -> int:
+    """以 CTranslate2 偵測 GPU，不必為此載入 torch。"""
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count()
+    except Exception:
+        return 0
+
+
+def load_profile_from_env(environ: Optional[Dict[str, str]] = None) -> WhisperProfile:
+    environ = os.environ if environ is None else environ
+    preset_name = environ.get("WHISPER_PROFILE", "auto")
+    if preset_name not in PRESET_PROFILES:
+        raise ValueError(f"未知的 WHISPER_PROFILE: {preset_name}（可用：{', '.join(PRESET_PROFILES)}）")
+    preset = PRESET_PROFILES[preset_name]
+    return WhisperProfile(
+        model_size=environ.get("WHISPER_MODEL_SIZE", preset.model_size),
+        device=environ.get("WHISPER_DEVICE", preset.device),
+        compute_type=environ.get("WHISPER_COMPUTE_TYPE", preset.compute_type),
+        cpu_threads=int(environ.get("WHISPER_CPU_THREADS", preset.cpu_threads)),
+        num_workers=int(environ.get("WHISPER_NUM_WORKERS", preset.num_workers)),
+    )
+
+
+def create_whisper_model(profile: WhisperProfile, num_workers: int = 1) -> Any:
+    """依 profile 建立 WhisperModel；profile.num_workers > 0 時優先於呼叫端給的值。"""
+    from faster_whisper import WhisperModel  # 延遲載入
+
+    resolved = profile.resolved()
+    return WhisperModel(
+        model_size_or_path=resolved.model_size,
+        device=resolved.device,
+        compute_type=resolved.compute_type,
+        cpu_threads=resolved.cpu_threads,
+        num_workers=resolved.num_workers or num_workers,
+    )
@@ -2,4 +2,5 @@ export interface VerbalFluencyResult {
   total: number;
   detail: Record<string, number>;
   chunks: number;
+  fuzzy?: Record<string, number>; // 後端啟用近音比對時的候選詞與信心值，不計入 total
 }